@@ -0,0 +1,61 @@
+"""
+Measure the cost of updating and rendering metrics.
+
+Times counter increments, histogram observations and a full /metrics render of
+the process registry (with every instrumented module imported), and relates the
+per-move cost to the motion thread's move rate: the motion thread makes one
+histogram observation and two perf_counter() calls per move.
+
+Usage (from the repository root):
+    python benchmarks/bench_metrics.py [--iterations 200000] [--moves-per-second 400]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.core.metrics import MetricsRegistry, metrics
+from modules.core import cache_manager, pattern_manager, preview_renderer  # noqa: F401 (register their metrics)
+
+
+def per_call(function, iterations):
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - t0) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--moves-per-second', type=float, default=400,
+                        help="Move rate to relate the per-move cost to")
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    counter = registry.counter('bench_total', 'Counter')
+    labelled = registry.counter('bench_labelled_total', 'Labelled counter', ['result']).labels('hit')
+    histogram = registry.histogram('bench_seconds', 'Histogram')
+
+    empty = per_call(lambda: None, args.iterations)
+    results = {
+        'counter.inc': per_call(counter.inc, args.iterations) - empty,
+        'labelled.inc': per_call(labelled.inc, args.iterations) - empty,
+        'histogram.observe': per_call(lambda: histogram.observe(0.003), args.iterations) - empty,
+        'perf_counter': per_call(time.perf_counter, args.iterations) - empty,
+    }
+    for name, seconds in results.items():
+        print(f"{name:<18} {seconds * 1e9:8.0f} ns")
+
+    per_move = results['histogram.observe'] + 2 * results['perf_counter']
+    print(f"per move: {per_move * 1e6:.2f} us = {100 * per_move * args.moves_per_second:.3f}% "
+          f"of one core at {args.moves_per_second:.0f} moves/s")
+
+    render = per_call(metrics.render, 200)
+    print(f"/metrics render: {render * 1e3:.2f} ms ({len(metrics.render().splitlines())} lines)")
+
+
+if __name__ == '__main__':
+    main()
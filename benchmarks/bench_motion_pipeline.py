@@ -0,0 +1,361 @@
+"""
+Benchmark the motion pipeline end to end, stage by stage.
+
+Runs patterns through pattern_manager.run_theta_rho_file against the simulated
+FluidNC controller and times every stage a move passes through:
+
+    load        compiled_patterns.load_coordinates (parse or memory-map), per pattern
+    plan        machine targets + coalescing (_plan_machine_targets, or the cached
+                clear pattern plan), per plan
+    queue_hop   batch submitted -> motion thread starts it, per batch
+    format      motion thread enters _send_grbl_coordinates_sync -> G-code ready, per line
+    rx_wait     waiting for room in the controller's RX buffer (streaming only), per line
+    write       connection send(), per line
+    ack         line written -> its 'ok' reaches the reader thread, per line
+
+and reports percentiles per stage, throughput in moves/s and the CPU time the
+process used (the simulator runs in-process and is included). The instrumentation
+wraps functions from the outside; nothing in modules/ changes.
+
+Results can be written as JSON and compared with an earlier run:
+
+    python benchmarks/bench_motion_pipeline.py --output before.json
+    (change something)
+    python benchmarks/bench_motion_pipeline.py --output after.json --compare before.json
+
+Usage (from the repository root):
+    python benchmarks/bench_motion_pipeline.py [--limit 5] [--patterns a.thr b.thr]
+        [--time-scale 1000] [--no-streaming] [--tolerance 0.5] [--output results.json]
+
+Execution times are not logged and state.json is not written during the run.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.connection.fluidnc_simulator import SimulatedFluidNCConnection
+from modules.core import compiled_patterns
+from modules.core.clear_pattern_plans import clear_pattern_plans
+from modules.core import pattern_manager
+from modules.core.pattern_manager import THETA_RHO_DIR, list_theta_rho_files
+from modules.core.state import state
+
+STAGES = ('load', 'plan', 'queue_hop', 'format', 'rx_wait', 'write', 'ack')
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(p / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples):
+    """Percentiles, mean and max of a list of durations, in milliseconds."""
+    values = sorted(samples)
+    if not values:
+        return {'count': 0}
+    summary = {'count': len(values), 'mean_ms': 1000 * sum(values) / len(values), 'max_ms': 1000 * values[-1]}
+    for p in PERCENTILES:
+        summary[f'p{p}_ms'] = 1000 * percentile(values, p)
+    return summary
+
+
+class StageRecorder:
+    """Collects stage durations from the wrapped functions of the motion pipeline."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.lines_written = 0
+        self._lock = threading.Lock()
+        self._format_started = None  # Set when the motion thread enters _send_grbl_coordinates_sync
+        self._rx_wait_started = None
+        self._unacknowledged = deque()  # Write times of lines waiting for their 'ok'
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def install(self, conn):
+        """Wrap the pipeline functions. Returns a callable that restores them."""
+        recorder = self
+        motion = pattern_manager.motion_controller
+        originals = {
+            'load_coordinates': compiled_patterns.load_coordinates,
+            'plan': pattern_manager._plan_machine_targets,
+            'clear_plan': clear_pattern_plans.plan,
+            'put': motion.command_queue.put,
+            'execute_batch': motion._execute_batch,
+            'send_coordinates': motion._send_grbl_coordinates_sync,
+            'stream': motion._stream_gcode_sync,
+            'conn_send': conn.send,
+            'dispatch': conn.reader._dispatch,
+        }
+
+        def load_coordinates(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return originals['load_coordinates'](*args, **kwargs)
+            finally:
+                recorder.add('load', time.perf_counter() - t0)
+
+        def timed_plan(original):
+            def plan(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    recorder.add('plan', time.perf_counter() - t0)
+            return plan
+
+        def put(command, *args, **kwargs):
+            if command.batch is not None:
+                command.batch.queued_at = time.perf_counter()
+            return originals['put'](command, *args, **kwargs)
+
+        def execute_batch(batch):
+            queued_at = getattr(batch, 'queued_at', None)
+            if queued_at is not None:
+                recorder.add('queue_hop', time.perf_counter() - queued_at)
+            return originals['execute_batch'](batch)
+
+        def send_coordinates(*args, **kwargs):
+            recorder._format_started = time.perf_counter()
+            return originals['send_coordinates'](*args, **kwargs)
+
+        def stream(gcode):
+            now = time.perf_counter()
+            recorder._end_format(now)
+            recorder._rx_wait_started = now
+            return originals['stream'](gcode)
+
+        def conn_send(data):
+            t0 = time.perf_counter()
+            is_move = data.startswith('G1')
+            if is_move:
+                # The status poller sends '?' from its own thread; only moves end these stages
+                recorder._end_format(t0)
+                if recorder._rx_wait_started is not None:
+                    recorder.add('rx_wait', t0 - recorder._rx_wait_started)
+                    recorder._rx_wait_started = None
+            originals['conn_send'](data)
+            t1 = time.perf_counter()
+            if data.endswith('\n'):
+                # Every line, motion or not, gets exactly one acknowledgement, in order
+                with recorder._lock:
+                    recorder._unacknowledged.append(t1)
+                if is_move:
+                    recorder.lines_written += 1
+                    recorder.add('write', t1 - t0)
+
+        def dispatch(line):
+            if line and (line.lower() == 'ok' or line.lower().startswith('error')):
+                now = time.perf_counter()
+                with recorder._lock:
+                    written_at = recorder._unacknowledged.popleft() if recorder._unacknowledged else None
+                if written_at is not None:
+                    recorder.add('ack', now - written_at)
+            return originals['dispatch'](line)
+
+        compiled_patterns.load_coordinates = load_coordinates
+        pattern_manager._plan_machine_targets = timed_plan(originals['plan'])
+        clear_pattern_plans.plan = timed_plan(originals['clear_plan'])
+        motion.command_queue.put = put
+        motion._execute_batch = execute_batch
+        motion._send_grbl_coordinates_sync = send_coordinates
+        motion._stream_gcode_sync = stream
+        conn.send = conn_send
+        conn.reader._dispatch = dispatch
+
+        def restore():
+            compiled_patterns.load_coordinates = originals['load_coordinates']
+            pattern_manager._plan_machine_targets = originals['plan']
+            del clear_pattern_plans.plan
+            del motion.command_queue.put
+            del motion._execute_batch
+            del motion._send_grbl_coordinates_sync
+            del motion._stream_gcode_sync
+            del conn.send
+            del conn.reader._dispatch
+        return restore
+
+    def _end_format(self, now):
+        if self._format_started is not None:
+            self.add('format', now - self._format_started)
+            self._format_started = None
+
+
+def select_patterns(args):
+    if args.patterns:
+        return [os.path.join(THETA_RHO_DIR, name) for name in args.patterns]
+    files = [os.path.join(THETA_RHO_DIR, f) for f in list_theta_rho_files()]
+    files = [f for f in files if not pattern_manager.is_clear_pattern(f)]
+    files.sort(key=os.path.getsize)
+    if not args.limit or args.limit >= len(files):
+        return files
+    # Spread the selection over the size range
+    step = (len(files) - 1) / max(1, args.limit - 1)
+    return [files[round(i * step)] for i in range(args.limit)]
+
+
+async def run_pattern(file_path, args):
+    conn = SimulatedFluidNCConnection(
+        time_scale=args.time_scale,
+        response_latency=args.latency,
+        latency_jitter=args.jitter,
+        seed=0
+    )
+    state.conn = conn
+    state.stop_requested = state.skip_requested = state.pause_requested = False
+    state.current_theta = state.current_rho = 0.0
+    state.machine_x = state.machine_y = 0.0
+
+    moves = len(compiled_patterns.load_coordinates(file_path))
+    recorder = StageRecorder()
+    restore = recorder.install(conn)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        await pattern_manager.run_theta_rho_file(file_path)
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        restore()
+        state.conn = None
+        conn.close()
+
+    return recorder, wall, cpu, moves, conn.stats
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def print_comparison(result, baseline):
+    print(f"\ncompared with {baseline.get('commit') or 'baseline'} ({baseline.get('timestamp')}):")
+    old_rate, new_rate = baseline['total']['moves_per_second'], result['total']['moves_per_second']
+    if old_rate and new_rate:
+        print(f"  throughput {old_rate:,.0f} -> {new_rate:,.0f} moves/s ({100 * (new_rate / old_rate - 1):+.1f}%)")
+    for stage in STAGES:
+        old, new = baseline['stages'].get(stage, {}), result['stages'].get(stage, {})
+        if not old.get('count') or not new.get('count'):
+            continue
+        print(f"  {stage:<10} p50 {old['p50_ms']:.3f} -> {new['p50_ms']:.3f} ms   "
+              f"p99 {old['p99_ms']:.3f} -> {new['p99_ms']:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--patterns', nargs='*', help="Pattern files relative to patterns/")
+    parser.add_argument('--limit', type=int, default=5, help="Number of patterns, spread over the size range")
+    parser.add_argument('--time-scale', type=float, default=1000.0, help="Simulator speed-up factor")
+    parser.add_argument('--latency', type=float, default=0.002, help="Simulated response latency (seconds)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Simulated latency jitter (seconds)")
+    parser.add_argument('--speed', type=int, default=500, help="Feed rate")
+    parser.add_argument('--no-streaming', action='store_true', help="Wait for every 'ok' instead of streaming")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="Coalescing tolerance in motor steps")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--compare', help="Earlier JSON results to compare with")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    state.table_type = 'dune_weaver'
+    state.x_steps_per_mm = 256
+    state.y_steps_per_mm = 180
+    state.gear_ratio = 10
+    state.speed = args.speed
+    state.gcode_streaming = not args.no_streaming
+    state.coalesce_tolerance_steps = args.tolerance
+    # Keep benchmark runs out of the execution log and state.json
+    pattern_manager.log_execution_time = lambda *a, **kw: None
+    state.save = state.save_debounced = state.save_position = lambda *a, **kw: None
+
+    files = select_patterns(args)
+    samples = defaultdict(list)
+    patterns = []
+    total_moves = total_lines = 0
+    total_wall = total_cpu = 0.0
+    for file_path in files:
+        recorder, wall, cpu, moves, stats = asyncio.run(run_pattern(file_path, args))
+        pattern_manager.motion_controller.stop()
+        for stage, values in recorder.samples.items():
+            samples[stage].extend(values)
+        patterns.append({
+            'pattern': os.path.relpath(file_path, THETA_RHO_DIR),
+            'moves': moves,
+            'lines': recorder.lines_written,
+            'seconds': wall,
+            'cpu_seconds': cpu,
+            'moves_per_second': moves / wall if wall else None,
+            'planner_starved_seconds': stats['planner_starved_seconds'],
+            'rx_overflows': stats['rx_overflows'],
+            'stages': {stage: summarize(recorder.samples.get(stage, [])) for stage in STAGES}
+        })
+        total_moves += moves
+        total_lines += recorder.lines_written
+        total_wall += wall
+        total_cpu += cpu
+        print(f"{patterns[-1]['pattern']}: {moves} moves, {recorder.lines_written} lines in {wall:.2f}s "
+              f"({moves / wall:,.0f} moves/s, CPU {100 * cpu / wall:.0f}%)")
+
+    result = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {
+            'time_scale': args.time_scale, 'latency': args.latency, 'jitter': args.jitter,
+            'speed': args.speed, 'streaming': state.gcode_streaming, 'tolerance': args.tolerance
+        },
+        'total': {
+            'patterns': len(patterns),
+            'moves': total_moves,
+            'lines': total_lines,
+            'seconds': total_wall,
+            'cpu_seconds': total_cpu,
+            'cpu_percent': 100 * total_cpu / total_wall if total_wall else None,
+            'moves_per_second': total_moves / total_wall if total_wall else None
+        },
+        'stages': {stage: summarize(samples.get(stage, [])) for stage in STAGES},
+        'patterns': patterns
+    }
+
+    print(f"\n{len(patterns)} patterns, {total_moves} moves, {total_lines} lines in {total_wall:.2f}s: "
+          f"{result['total']['moves_per_second']:,.0f} moves/s, CPU {result['total']['cpu_percent']:.0f}%")
+    print(f"{'stage':<10} {'count':>8} {'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}  (ms)")
+    for stage in STAGES:
+        summary = result['stages'][stage]
+        if not summary['count']:
+            print(f"{stage:<10} {0:>8}")
+            continue
+        print(f"{stage:<10} {summary['count']:>8} {summary['mean_ms']:>9.3f} {summary['p50_ms']:>9.3f} "
+              f"{summary['p90_ms']:>9.3f} {summary['p99_ms']:>9.3f} {summary['max_ms']:>9.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nresults written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(result, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
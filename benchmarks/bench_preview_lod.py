@@ -0,0 +1,126 @@
+"""
+Compare the level-of-detail preview renderer with the previous full-resolution renderer.
+
+The previous renderer (kept below as legacy_draw_preview) drew every coordinate with a
+2 px stroke on a 2048x2048 canvas, downsampled it to 512x512 with LANCZOS and rotated
+it 180 degrees. preview.draw_preview decimates the polyline to one point per
+supersampled pixel and draws it at twice the display size.
+
+For every pattern in patterns/ this reports the render time of both and the difference
+of their alpha channels (the lines are black on a transparent background):
+
+- mean: mean absolute difference over all pixels, 0-255
+- p99:  99th percentile absolute difference over pixels either renderer drew on
+- tone: mean difference of the average alpha of 8x8 pixel blocks, i.e. how much
+        darker or lighter areas look, ignoring sub-pixel placement of the lines
+
+Dense spirals have line spacing close to one display pixel; both renderers show
+moire there, in different places, which dominates their tone difference.
+
+Usage (from the repository root):
+    python benchmarks/bench_preview_lod.py [--limit 20] [--save-dir /tmp/previews]
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from modules.core import preview
+from modules.core.pattern_manager import THETA_RHO_DIR, list_theta_rho_files, parse_theta_rho_file
+
+# Fail if the tone difference of any pattern exceeds this (0-255)
+MAX_TONE_DIFF = 12.0
+TONE_BLOCK = 8
+
+
+def legacy_draw_preview(coordinates):
+    """The renderer as it was before level-of-detail rendering."""
+    render_size = 2048
+    display_size = 512
+    img = Image.new('RGBA', (render_size, render_size), (255, 255, 255, 0))
+    draw = ImageDraw.Draw(img)
+    center = render_size / 2.0
+    scale_factor = (render_size / 2.0) - 10.0
+
+    points_to_draw = []
+    for theta, rho in coordinates:
+        x = center - rho * scale_factor * math.cos(theta)
+        y = center - rho * scale_factor * math.sin(theta)
+        points_to_draw.append((x, y))
+
+    if len(points_to_draw) > 1:
+        draw.line(points_to_draw, fill="black", width=2, joint="curve")
+    img = img.resize((display_size, display_size), Image.Resampling.LANCZOS)
+    return img.rotate(180)
+
+
+def alpha(img):
+    return np.asarray(img.getchannel('A'), dtype=np.int16)
+
+
+def block_tone(values):
+    size = values.shape[0] // TONE_BLOCK
+    return values.reshape(size, TONE_BLOCK, size, TONE_BLOCK).mean(axis=(1, 3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--limit', type=int, default=0, help="Only compare the N largest patterns")
+    parser.add_argument('--save-dir', help="Write side-by-side PNGs (legacy | LOD) here")
+    args = parser.parse_args()
+
+    files = [os.path.join(THETA_RHO_DIR, f) for f in list_theta_rho_files()]
+    files.sort(key=os.path.getsize, reverse=True)
+    if args.limit:
+        files = files[:args.limit]
+    if args.save_dir:
+        os.makedirs(args.save_dir, exist_ok=True)
+
+    legacy_total = lod_total = 0.0
+    worst = (0.0, None)
+    print(f"{'pattern':<48} {'points':>7} {'legacy':>8} {'lod':>8} {'mean':>6} {'p99':>5} {'tone':>6}")
+    for file_path in files:
+        coordinates = parse_theta_rho_file(file_path)
+        if len(coordinates) < 2:
+            continue
+
+        t0 = time.perf_counter()
+        legacy = legacy_draw_preview(coordinates)
+        t1 = time.perf_counter()
+        lod = preview.draw_preview(coordinates)
+        t2 = time.perf_counter()
+        legacy_total += t1 - t0
+        lod_total += t2 - t1
+
+        legacy_alpha, lod_alpha = alpha(legacy), alpha(lod)
+        diff = np.abs(legacy_alpha - lod_alpha)
+        drawn = (legacy_alpha > 0) | (lod_alpha > 0)
+        p99 = np.percentile(diff[drawn], 99) if drawn.any() else 0
+        tone = np.abs(block_tone(legacy_alpha) - block_tone(lod_alpha)).mean()
+        if tone > worst[0]:
+            worst = (tone, file_path)
+
+        name = os.path.relpath(file_path, THETA_RHO_DIR)
+        print(f"{name[:48]:<48} {len(coordinates):>7} {t1 - t0:>7.3f}s {t2 - t1:>7.3f}s "
+              f"{diff.mean():>6.2f} {p99:>5.0f} {tone:>6.2f}")
+
+        if args.save_dir:
+            side_by_side = Image.new('RGBA', (1024, 512), (255, 255, 255, 255))
+            side_by_side.alpha_composite(legacy, (0, 0))
+            side_by_side.alpha_composite(lod, (512, 0))
+            side_by_side.save(os.path.join(args.save_dir, name.replace('/', '_') + '.png'))
+
+    print(f"\nlegacy: {legacy_total:.2f}s  lod: {lod_total:.2f}s  speedup: {legacy_total / lod_total:.1f}x")
+    print(f"largest tone difference: {worst[0]:.2f} ({worst[1]})")
+    if worst[0] > MAX_TONE_DIFF:
+        sys.exit(f"Tone difference above {MAX_TONE_DIFF}")
+
+
+if __name__ == '__main__':
+    main()
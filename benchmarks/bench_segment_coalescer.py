@@ -0,0 +1,104 @@
+"""
+Measure how many G-code lines segment coalescing saves, and check that it keeps the path.
+
+For every pattern in patterns/ this computes the machine targets, runs
+segment_coalescer.coalesce_moves on them and verifies that every dropped target
+lies within the tolerance (in motor steps) of the polyline through the sent
+ones. Fails on the first target that doesn't.
+
+Usage (from the repository root):
+    python benchmarks/bench_segment_coalescer.py [--tolerance 0.5] [--table dune_weaver_mini] [--limit 20]
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.core import theta_rho_engine
+from modules.core.pattern_manager import THETA_RHO_DIR, list_theta_rho_files
+from modules.core.segment_coalescer import coalesce_moves
+from modules.core.state import state
+
+
+def segment_distance(px, py, ax, ay, bx, by):
+    """Distance from point p to the segment a-b."""
+    dx, dy = bx - ax, by - ay
+    length_squared = dx * dx + dy * dy
+    t = 0.0 if length_squared == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_squared))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def max_deviation(x, y, start, keep):
+    """Largest distance, in steps, of a dropped target from the move that replaced it."""
+    scale_x, scale_y = state.x_steps_per_mm, state.y_steps_per_mm
+    anchor = (start[0] * scale_x, start[1] * scale_y)
+    dropped = []
+    worst = 0.0
+    for i in range(len(x)):
+        point = (x[i] * scale_x, y[i] * scale_y)
+        if not keep[i]:
+            dropped.append(point)
+            continue
+        for px, py in dropped:
+            worst = max(worst, segment_distance(px, py, *anchor, *point))
+        dropped = []
+        anchor = point
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tolerance', type=float, default=0.5, help="Coalescing tolerance in motor steps")
+    parser.add_argument('--table', default='dune_weaver', help="Table type to transform for")
+    parser.add_argument('--limit', type=int, default=0, help="Only benchmark the N largest patterns")
+    args = parser.parse_args()
+
+    if not theta_rho_engine.NUMPY_AVAILABLE:
+        sys.exit("NumPy is not installed")
+
+    state.table_type = args.table
+    state.x_steps_per_mm = 256
+    state.y_steps_per_mm = 180
+    state.gear_ratio = 6.25 if args.table == 'dune_weaver_mini' else 10
+    start = (0.0, 0.0, 0.0, 0.0)
+
+    files = [os.path.join(THETA_RHO_DIR, f) for f in list_theta_rho_files()]
+    files.sort(key=os.path.getsize, reverse=True)
+    if args.limit:
+        files = files[:args.limit]
+
+    total_moves = 0
+    total_sent = 0
+    elapsed = 0.0
+    worst = 0.0
+    for file_path in files:
+        coordinates = theta_rho_engine.parse_theta_rho_array(file_path)
+        if len(coordinates) == 0:
+            continue
+        x, y = theta_rho_engine.compute_machine_targets(
+            coordinates, *start, state.table_type, state.x_steps_per_mm, state.y_steps_per_mm, state.gear_ratio
+        )
+        x, y = x.tolist(), y.tolist()
+        t0 = time.perf_counter()
+        keep = coalesce_moves(x, y, start[2], start[3], state.x_steps_per_mm, state.y_steps_per_mm, args.tolerance)
+        elapsed += time.perf_counter() - t0
+
+        deviation = max_deviation(x, y, start[2:], keep)
+        if deviation > args.tolerance + 1e-9:
+            sys.exit(f"{file_path}: dropped target {deviation:.3f} steps off the path (tolerance {args.tolerance})")
+        worst = max(worst, deviation)
+        total_moves += len(x)
+        total_sent += sum(keep)
+
+    saved = total_moves - total_sent
+    print(f"{len(files)} patterns, {total_moves} moves, table {args.table}, tolerance {args.tolerance} steps")
+    print(f"sent: {total_sent}, saved: {saved} G-code lines ({100.0 * saved / max(1, total_moves):.1f}%)")
+    print(f"largest deviation: {worst:.3f} steps")
+    print(f"coalescing: {elapsed:.3f}s ({total_moves / max(elapsed, 1e-9):,.0f} moves/s)")
+
+
+if __name__ == '__main__':
+    main()
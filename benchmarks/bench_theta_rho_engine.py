@@ -0,0 +1,115 @@
+"""
+Benchmark the vectorized theta-rho engine against the per-point Python path.
+
+For every pattern in patterns/ this parses the file and produces the G-code for the
+whole pattern twice:
+
+- legacy: parse_theta_rho_file + MotionControlThread._move_polar_sync per point
+- engine: theta_rho_engine.parse_theta_rho_array + compute_machine_targets + format_gcode
+
+and fails if the two G-code streams differ in a single byte. Engine timings are split
+by stage: during a run the motion thread still rounds and formats one line at a time,
+so parse + transform is what a pattern start actually saves.
+
+Usage (from the repository root):
+    python benchmarks/bench_theta_rho_engine.py [--table dune_weaver_mini] [--limit 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.core import theta_rho_engine
+from modules.core.pattern_manager import THETA_RHO_DIR, MotionControlThread, list_theta_rho_files, parse_theta_rho_file
+from modules.core.state import state
+
+SPEED = 500
+
+
+class RecordingMotionThread(MotionControlThread):
+    """Motion thread that records G-code instead of talking to a controller."""
+
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def _send_grbl_coordinates_sync(self, x, y, speed=600, timeout=2, home=False, stream=False):
+        self.lines.append(f"G1 X{x} Y{y} F{speed}")
+
+
+def run_legacy(file_path, start):
+    state.current_theta, state.current_rho, state.machine_x, state.machine_y = start
+    motion = RecordingMotionThread()
+    coordinates = parse_theta_rho_file(file_path)
+    for theta, rho in coordinates:
+        motion._move_polar_sync(theta, rho, SPEED)
+    return motion.lines
+
+
+def run_engine(file_path, start, timings):
+    t0 = time.perf_counter()
+    coordinates = theta_rho_engine.parse_theta_rho_array(file_path)
+    t1 = time.perf_counter()
+    x, y = theta_rho_engine.compute_machine_targets(
+        coordinates, *start, state.table_type, state.x_steps_per_mm, state.y_steps_per_mm, state.gear_ratio
+    )
+    t2 = time.perf_counter()
+    lines = theta_rho_engine.format_gcode(x, y, SPEED)
+    t3 = time.perf_counter()
+    timings['parse'] += t1 - t0
+    timings['transform'] += t2 - t1
+    timings['format'] += t3 - t2
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', default='dune_weaver', help="Table type to transform for")
+    parser.add_argument('--limit', type=int, default=0, help="Only benchmark the N largest patterns")
+    args = parser.parse_args()
+
+    if not theta_rho_engine.NUMPY_AVAILABLE:
+        sys.exit("NumPy is not installed")
+
+    state.table_type = args.table
+    state.x_steps_per_mm = 256
+    state.y_steps_per_mm = 180
+    state.gear_ratio = 6.25 if args.table == 'dune_weaver_mini' else 10
+    # A start position with fractional parts so rounding is exercised
+    start = (1.2345, 0.5, 12.3456, -3.21)
+
+    files = [os.path.join(THETA_RHO_DIR, f) for f in list_theta_rho_files()]
+    files.sort(key=os.path.getsize, reverse=True)
+    if args.limit:
+        files = files[:args.limit]
+
+    legacy_total = 0.0
+    timings = {'parse': 0.0, 'transform': 0.0, 'format': 0.0}
+    total_points = 0
+    for file_path in files:
+        t0 = time.perf_counter()
+        legacy_lines = run_legacy(file_path, start)
+        t1 = time.perf_counter()
+        engine_lines = run_engine(file_path, start, timings)
+
+        if legacy_lines != engine_lines:
+            index = next((i for i, (a, b) in enumerate(zip(legacy_lines, engine_lines)) if a != b),
+                         min(len(legacy_lines), len(engine_lines)))
+            sys.exit(f"G-code mismatch in {file_path} at line {index}")
+
+        legacy_total += t1 - t0
+        total_points += len(legacy_lines)
+
+    print(f"{len(files)} patterns, {total_points} points, table {args.table}: G-code identical")
+    print(f"legacy: {legacy_total:.3f}s ({total_points / legacy_total:,.0f} points/s)")
+    engine_total = sum(timings.values())
+    print(f"engine: {engine_total:.3f}s ({total_points / engine_total:,.0f} points/s)")
+    for stage, seconds in timings.items():
+        print(f"  {stage:<10} {seconds:.3f}s")
+    print(f"speedup: {legacy_total / engine_total:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -121,6 +121,7 @@ class Backend(QObject):
         self.ws.disconnected.connect(self._on_ws_disconnected)
         self.ws.errorOccurred.connect(self._on_ws_error)
         self.ws.textMessageReceived.connect(self._on_ws_message)
+        self._last_status = None  # Last status from /ws/status, with deltas merged in
         
         # WebSocket reconnection management
         self._reconnect_timer = QTimer()
@@ -295,7 +296,8 @@ class Backend(QObject):
             self.ws.close()
         
         # Attempt new connection - derive WebSocket URL from base URL
-        ws_url = self.base_url.replace("http://", "ws://").replace("https://", "wss://") + "/ws/status"
+        ws_url = self.base_url.replace("http://", "ws://").replace("https://", "wss://") + "/ws/status?deltas=1"
+        self._last_status = None
         self.ws.open(ws_url)
     
     @Slot()
@@ -310,8 +312,12 @@ class Backend(QObject):
     def _on_ws_message(self, message):
         try:
             data = json.loads(message)
+            if data.get("type") == "status_delta" and self._last_status is not None:
+                # Only the changed keys; merge them into the last full update
+                data = {"type": "status_update", "data": {**self._last_status, **data.get("data", {})}}
             if data.get("type") == "status_update":
                 status = data.get("data", {})
+                self._last_status = status
                 new_file = status.get("current_file", "")
 
                 # Detect pattern change and emit executionStarted signal
@@ -65,6 +65,10 @@ class PngCacheManager:
         def _scan_webp():
             webp_files = []
             for webp_file in self.cache_dir.rglob("*.webp"):
+                # by_hash/ holds the content-addressed originals; the name-based
+                # links to them are converted instead
+                if "by_hash" in webp_file.relative_to(self.cache_dir).parts:
+                    continue
                 # Check if corresponding PNG exists
                 png_file = webp_file.with_suffix(".png")
                 if not png_file.exists():
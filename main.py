@@ -1,5 +1,5 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect, Request
-from fastapi.responses import JSONResponse, FileResponse, Response
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
@@ -10,7 +10,8 @@ import logging
 from datetime import datetime, time
 from modules.connection import connection_manager
 from modules.core import pattern_manager
-from modules.core.pattern_manager import parse_theta_rho_file, THETA_RHO_DIR
+from modules.core.pattern_manager import THETA_RHO_DIR
+from modules.core.compiled_patterns import load_coordinates
 from modules.core import playlist_manager
 from modules.update import update_manager
 from modules.core.state import state
@@ -23,14 +24,15 @@ from modules.led.led_controller import LEDController, effect_idle
 from modules.led.led_interface import LEDInterface
 from modules.led.idle_timeout_manager import idle_timeout_manager
 import math
-from modules.core.cache_manager import generate_all_image_previews, get_cache_path, generate_image_preview, get_pattern_metadata
+from modules.core.cache_manager import generate_all_image_previews, get_content_cache_path, get_content_hash, generate_image_preview, get_pattern_metadata
+from modules.core.preview_renderer import preview_renderer
 from modules.core.version_manager import version_manager
+from modules.core.metrics import metrics
+from modules.core.status_publisher import status_publisher
 import json
 import base64
 import time
 import argparse
-from concurrent.futures import ProcessPoolExecutor
-import multiprocessing
 import subprocess
 import platform
 
@@ -38,13 +40,6 @@ import platform
 log_level_str = os.getenv('LOG_LEVEL', 'INFO').upper()
 log_level = getattr(logging, log_level_str, logging.INFO)
 
-# Create a process pool for CPU-intensive tasks
-# Limit to reasonable number of workers for embedded systems
-cpu_count = multiprocessing.cpu_count()
-# Maximum 3 workers (leaving 1 for motion), minimum 1
-process_pool_size = min(3, max(1, cpu_count - 1))
-process_pool = None  # Will be initialized in lifespan
-
 logging.basicConfig(
     level=log_level,
     format='%(asctime)s - %(name)s:%(lineno)d - %(levelname)s - %(message)s',
@@ -99,11 +94,6 @@ async def lifespan(app: FastAPI):
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
 
-    # Initialize process pool for CPU-intensive tasks
-    global process_pool
-    process_pool = ProcessPoolExecutor(max_workers=process_pool_size)
-    logger.info(f"Initialized process pool with {process_pool_size} workers (detected {cpu_count} cores total)")
-
     try:
         connection_manager.connect_device()
     except Exception as e:
@@ -238,6 +228,14 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Failed to initialize MQTT: {str(e)}")
     
+    # Index the pattern library and keep it current; changed patterns get their
+    # metadata and previews regenerated without a full rescan
+    try:
+        from modules.core.cache_manager import update_pattern_caches
+        await asyncio.to_thread(pattern_manager.pattern_library.start, update_pattern_caches, asyncio.get_running_loop())
+    except Exception as e:
+        logger.warning(f"Failed to start pattern library watcher: {str(e)}")
+
     # Schedule cache generation check for later (non-blocking startup)
     async def delayed_cache_check():
         """Check and generate cache in background."""
@@ -309,18 +307,35 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down Dune Weaver application...")
 
-    # Shutdown process pool
-    if process_pool:
-        process_pool.shutdown(wait=True)
-        logger.info("Process pool shutdown complete")
+    # Shutdown preview worker processes
+    preview_renderer.shutdown()
+
+    # Stop watching the pattern library
+    pattern_manager.pattern_library.stop()
+
+    # Write pending state saves
+    state.flush()
 
 app = FastAPI(lifespan=lifespan)
 templates = Jinja2Templates(directory="templates")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Pydantic models for request/response validation
+class SimulatorOptions(BaseModel):
+    time_scale: Optional[float] = None
+    response_latency: Optional[float] = None
+    latency_jitter: Optional[float] = None
+    acceleration: Optional[float] = None
+    junction_deviation: Optional[float] = None
+    rx_buffer_size: Optional[int] = None
+    planner_blocks: Optional[int] = None
+    x_steps_per_mm: Optional[float] = None
+    y_steps_per_mm: Optional[float] = None
+    seed: Optional[int] = None
+
 class ConnectRequest(BaseModel):
     port: Optional[str] = None
+    simulator: Optional[SimulatorOptions] = None  # Only used with port "simulator"
 
 class auto_playModeRequest(BaseModel):
     enabled: bool
@@ -431,6 +446,13 @@ class HomingSettingsUpdate(BaseModel):
     auto_home_enabled: Optional[bool] = None
     auto_home_after_patterns: Optional[int] = None
 
+class MotionSettingsUpdate(BaseModel):
+    gcode_streaming: Optional[bool] = None
+    rx_buffer_size: Optional[int] = None
+    coalesce_tolerance_steps: Optional[float] = None
+    status_poll_interval: Optional[float] = None
+    seamless_playlist: Optional[bool] = None
+
 class DwLedSettingsUpdate(BaseModel):
     num_leds: Optional[int] = None
     gpio_pin: Optional[int] = None
@@ -468,55 +490,41 @@ class SettingsUpdate(BaseModel):
     auto_play: Optional[AutoPlaySettingsUpdate] = None
     scheduled_pause: Optional[ScheduledPauseSettingsUpdate] = None
     homing: Optional[HomingSettingsUpdate] = None
+    motion: Optional[MotionSettingsUpdate] = None
     led: Optional[LedSettingsUpdate] = None
     mqtt: Optional[MqttSettingsUpdate] = None
 
 # Store active WebSocket connections
-active_status_connections = set()
 active_cache_progress_connections = set()
 
-@app.websocket("/ws/status")
-async def websocket_status_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    active_status_connections.add(websocket)
+async def _receive_until_disconnect(websocket: WebSocket):
     try:
         while True:
-            status = pattern_manager.get_status()
-            try:
-                await websocket.send_json({
-                    "type": "status_update",
-                    "data": status
-                })
-            except RuntimeError as e:
-                if "close message has been sent" in str(e):
-                    break
-                raise
-            await asyncio.sleep(1)
+            await websocket.receive_text()
     except WebSocketDisconnect:
         pass
+
+@app.websocket("/ws/status")
+async def websocket_status_endpoint(websocket: WebSocket):
+    """
+    Status updates pushed by status_publisher. Connect with ?deltas=1 to get
+    status_delta messages (changed keys only) between full status_update messages.
+    """
+    await websocket.accept()
+    deltas = websocket.query_params.get("deltas", "").lower() in ("1", "true")
+    writer = status_publisher.subscribe(websocket, websocket.send_text, deltas=deltas)
+    receiver = asyncio.create_task(_receive_until_disconnect(websocket))
+    try:
+        # Ends when the client disconnects or the publisher drops it for falling behind
+        await asyncio.wait({writer, receiver}, return_when=asyncio.FIRST_COMPLETED)
     finally:
-        active_status_connections.discard(websocket)
+        receiver.cancel()
+        status_publisher.unsubscribe(websocket)
         try:
             await websocket.close()
-        except RuntimeError:
+        except (RuntimeError, WebSocketDisconnect):
             pass
 
-async def broadcast_status_update(status: dict):
-    """Broadcast status update to all connected clients."""
-    disconnected = set()
-    for websocket in active_status_connections:
-        try:
-            await websocket.send_json({
-                "type": "status_update",
-                "data": status
-            })
-        except WebSocketDisconnect:
-            disconnected.add(websocket)
-        except RuntimeError:
-            disconnected.add(websocket)
-    
-    active_status_connections.difference_update(disconnected)
-
 @app.websocket("/ws/cache-progress")
 async def websocket_cache_progress_endpoint(websocket: WebSocket):
     from modules.core.cache_manager import get_cache_progress
@@ -600,6 +608,13 @@ async def get_all_settings():
             "auto_home_enabled": state.auto_home_enabled,
             "auto_home_after_patterns": state.auto_home_after_patterns
         },
+        "motion": {
+            "gcode_streaming": state.gcode_streaming,
+            "rx_buffer_size": state.grbl_rx_buffer_size,
+            "coalesce_tolerance_steps": state.coalesce_tolerance_steps,
+            "status_poll_interval": state.status_poll_interval,
+            "seamless_playlist": state.seamless_playlist
+        },
         "led": {
             "provider": state.led_provider,
             "wled_ip": state.wled_ip,
@@ -700,12 +715,10 @@ async def update_settings(settings_update: SettingsUpdate):
         if sp.timezone is not None:
             # Empty string means use system default (store as None)
             state.scheduled_pause_timezone = sp.timezone if sp.timezone else None
-            # Clear cached timezone in pattern_manager so it picks up the new setting
-            from modules.core import pattern_manager
-            pattern_manager._cached_timezone = None
-            pattern_manager._cached_zoneinfo = None
         if sp.time_slots is not None:
             state.scheduled_pause_time_slots = [slot.model_dump() for slot in sp.time_slots]
+        # Recompile the schedule and re-evaluate running pauses with the new settings
+        pattern_manager.invalidate_pause_schedule()
         updated_categories.append("scheduled_pause")
 
     # Homing settings
@@ -721,6 +734,27 @@ async def update_settings(settings_update: SettingsUpdate):
             state.auto_home_after_patterns = h.auto_home_after_patterns
         updated_categories.append("homing")
 
+    # Motion settings
+    if settings_update.motion:
+        mo = settings_update.motion
+        if mo.gcode_streaming is not None:
+            state.gcode_streaming = mo.gcode_streaming
+        if mo.rx_buffer_size is not None:
+            if mo.rx_buffer_size < 64:
+                raise HTTPException(status_code=400, detail="rx_buffer_size must be at least 64 bytes")
+            state.grbl_rx_buffer_size = mo.rx_buffer_size
+        if mo.coalesce_tolerance_steps is not None:
+            if mo.coalesce_tolerance_steps < 0:
+                raise HTTPException(status_code=400, detail="coalesce_tolerance_steps must not be negative")
+            state.coalesce_tolerance_steps = mo.coalesce_tolerance_steps
+        if mo.status_poll_interval is not None:
+            if not 0.05 <= mo.status_poll_interval <= 5:
+                raise HTTPException(status_code=400, detail="status_poll_interval must be between 0.05 and 5 seconds")
+            state.status_poll_interval = mo.status_poll_interval
+        if mo.seamless_playlist is not None:
+            state.seamless_playlist = mo.seamless_playlist
+        updated_categories.append("motion")
+
     # LED settings
     if settings_update.led:
         led = settings_update.led
@@ -890,10 +924,8 @@ async def set_scheduled_pause(request: ScheduledPauseRequest):
         state.scheduled_pause_time_slots = [slot.model_dump() for slot in request.time_slots]
         state.save()
 
-        # Clear cached timezone so it picks up the new setting
-        from modules.core import pattern_manager
-        pattern_manager._cached_timezone = None
-        pattern_manager._cached_zoneinfo = None
+        # Recompile the schedule and re-evaluate running pauses with the new settings
+        pattern_manager.invalidate_pause_schedule()
 
         wled_msg = " (with WLED control)" if request.control_wled else ""
         finish_msg = " (finish pattern first)" if request.finish_pattern else ""
@@ -968,6 +1000,17 @@ async def connect(request: ConnectRequest):
         logger.info('Successfully connected to websocket ws://fluidnc.local:81')
         return {"success": True}
 
+    if request.port == connection_manager.SIMULATOR_PORT:
+        options = request.simulator.model_dump(exclude_none=True) if request.simulator else {}
+        try:
+            connection_manager.connect_simulator(**options)
+            connection_manager.device_init()
+            logger.info('Successfully connected to the FluidNC simulator')
+            return {"success": True}
+        except Exception as e:
+            logger.error(f'Failed to start the FluidNC simulator: {str(e)}')
+            raise HTTPException(status_code=500, detail=str(e))
+
     try:
         state.conn = connection_manager.SerialConnection(request.port)
         connection_manager.device_init()
@@ -1009,12 +1052,20 @@ async def list_theta_rho_files():
     return sorted(files)
 
 @app.get("/list_theta_rho_files_with_metadata")
-async def list_theta_rho_files_with_metadata():
+async def list_theta_rho_files_with_metadata(request: Request, sort_by: Optional[str] = None, descending: bool = False):
     """Get list of theta-rho files with metadata for sorting and filtering.
     
     Optimized to process files asynchronously and support request cancellation.
+
+    sort_by orders the list by any numeric field or 'name'; patterns without a
+    value for it come last. Numeric fields can be filtered with min_<field> and
+    max_<field> query parameters (e.g. ?min_revolutions=10&max_max_rho=0.5),
+    which drop patterns without a value for that field.
     """
-    from modules.core.cache_manager import get_pattern_metadata
+    from modules.core.cache_manager import (
+        get_pattern_metadata, get_metadata_summaries, get_execution_estimator, get_pattern_speed
+    )
+    from modules.core.pattern_stats import SCALAR_STATS
     import asyncio
     from concurrent.futures import ThreadPoolExecutor
     
@@ -1025,6 +1076,34 @@ async def list_theta_rho_files_with_metadata():
     # Use ThreadPoolExecutor for I/O-bound operations
     executor = ThreadPoolExecutor(max_workers=4)
     
+    table_type = state.table_type or 'dune_weaver'
+
+    numeric_fields = ('date_modified', 'coordinates_count', 'estimated_seconds', 'machine_distance') + SCALAR_STATS
+    if sort_by is not None and sort_by != 'name' and sort_by not in numeric_fields:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by '{sort_by}'")
+    filters = []
+    for key, value in request.query_params.items():
+        bound, _, field = key.partition('_')
+        if bound in ('min', 'max') and field in numeric_fields:
+            try:
+                filters.append((field, bound, float(value)))
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid value for {key}: {value}")
+
+    def geometry_fields(file_path, geometry, stats, estimator):
+        """Estimated run time, machine distance and pattern stats; None where not cached yet."""
+        fields = {'estimated_seconds': None, 'machine_distance': None}
+        # Geometry cached for another table type doesn't apply to this one
+        if geometry and geometry.get('table_type') == table_type:
+            seconds = estimator.predict(geometry, get_pattern_speed(file_path)) if estimator else None
+            fields['estimated_seconds'] = round(seconds, 1) if seconds is not None else None
+            fields['machine_distance'] = round(geometry['path_length'], 1)
+        for field in SCALAR_STATS:
+            value = stats.get(field) if stats else None
+            fields[field] = round(value, 3) if isinstance(value, float) else value
+        fields['radial_histogram'] = stats.get('radial_histogram') if stats else None
+        return fields
+
     def process_file(file_path):
         """Process a single file and return its metadata."""
         try:
@@ -1055,7 +1134,9 @@ async def list_theta_rho_files_with_metadata():
                 'name': file_name,
                 'category': category,
                 'date_modified': date_modified,
-                'coordinates_count': metadata.get('total_coordinates', 0) if metadata else 0
+                'coordinates_count': metadata.get('total_coordinates', 0) if metadata else 0,
+                **geometry_fields(file_path, metadata.get('geometry') if metadata else None,
+                                  metadata.get('stats') if metadata else None, get_execution_estimator())
             }
             
         except Exception as e:
@@ -1071,18 +1152,16 @@ async def list_theta_rho_files_with_metadata():
                 'name': os.path.splitext(os.path.basename(file_path))[0],
                 'category': category,
                 'date_modified': 0,
-                'coordinates_count': 0
+                'coordinates_count': 0,
+                **geometry_fields(file_path, None, None, None)
             }
     
-    # Load the entire metadata cache at once (async)
+    # Load mtime and coordinate count of every pattern in a single query
     # This is much faster than 1000+ individual metadata lookups
     try:
-        import json
-        metadata_cache_path = "metadata_cache.json"
-        # Use async file reading to avoid blocking the event loop
-        cache_data = await asyncio.to_thread(lambda: json.load(open(metadata_cache_path, 'r')))
-        cache_dict = cache_data.get('data', {})
-        logger.debug(f"Loaded metadata cache with {len(cache_dict)} entries")
+        summaries = await asyncio.to_thread(get_metadata_summaries)
+        logger.debug(f"Loaded metadata for {len(summaries)} patterns")
+        estimator = await asyncio.to_thread(get_execution_estimator)
 
         # Process all files using cached data only
         for file_path in files:
@@ -1095,21 +1174,15 @@ async def list_theta_rho_files_with_metadata():
                 file_name = os.path.splitext(os.path.basename(file_path))[0]
 
                 # Get metadata from cache
-                cached_entry = cache_dict.get(file_path, {})
-                if isinstance(cached_entry, dict) and 'metadata' in cached_entry:
-                    metadata = cached_entry['metadata']
-                    coords_count = metadata.get('total_coordinates', 0)
-                    date_modified = cached_entry.get('mtime', 0)
-                else:
-                    coords_count = 0
-                    date_modified = 0
+                date_modified, coords_count, geometry, stats = summaries.get(file_path, (0, 0, None, None))
 
                 files_with_metadata.append({
                     'path': file_path,
                     'name': file_name,
                     'category': category,
                     'date_modified': date_modified,
-                    'coordinates_count': coords_count
+                    'coordinates_count': coords_count,
+                    **geometry_fields(file_path, geometry, stats, estimator)
                 })
 
             except Exception as e:
@@ -1122,7 +1195,8 @@ async def list_theta_rho_files_with_metadata():
                     'name': os.path.splitext(os.path.basename(file_path))[0],
                     'category': category,
                     'date_modified': 0,
-                    'coordinates_count': 0
+                    'coordinates_count': 0,
+                    **geometry_fields(file_path, None, None, None)
                 })
 
     except Exception as e:
@@ -1142,6 +1216,18 @@ async def list_theta_rho_files_with_metadata():
     # Clean up executor
     executor.shutdown(wait=False)
 
+    for field, bound, limit in filters:
+        files_with_metadata = [
+            item for item in files_with_metadata
+            if item[field] is not None and (item[field] >= limit if bound == 'min' else item[field] <= limit)
+        ]
+    if sort_by == 'name':
+        files_with_metadata.sort(key=lambda item: item['name'].lower(), reverse=descending)
+    elif sort_by is not None:
+        known = [item for item in files_with_metadata if item[sort_by] is not None]
+        known.sort(key=lambda item: item[sort_by], reverse=descending)
+        files_with_metadata = known + [item for item in files_with_metadata if item[sort_by] is None]
+
     return files_with_metadata
 
 @app.post("/upload_theta_rho")
@@ -1170,6 +1256,7 @@ async def upload_theta_rho(file: UploadFile = File(...)):
                 f.write(file_content)
         
         logger.info(f"File {file.filename} saved successfully")
+        pattern_manager.pattern_library.refresh([file_path_in_patterns_dir])
         
         # Generate image preview for the new file with retry logic
         max_retries = 3
@@ -1207,10 +1294,8 @@ async def get_theta_rho_coordinates(request: GetCoordinatesRequest):
         if not exists:
             raise HTTPException(status_code=404, detail=f"File {file_name} not found")
 
-        # Parse the theta-rho file in a separate process for CPU-intensive work
-        # This prevents blocking the motion control thread
-        loop = asyncio.get_event_loop()
-        coordinates = await loop.run_in_executor(process_pool, parse_theta_rho_file, file_path)
+        # Read coordinates from the compiled pattern (compiled once per file change)
+        coordinates = await asyncio.to_thread(lambda: list(load_coordinates(file_path)))
         
         if not coordinates:
             raise HTTPException(status_code=400, detail="No valid coordinates found in file")
@@ -1339,6 +1424,7 @@ async def delete_theta_rho_file(request: DeleteFileRequest):
         # Delete the pattern file asynchronously
         await asyncio.to_thread(os.remove, file_path)
         logger.info(f"Successfully deleted theta-rho file: {request.file_name}")
+        pattern_manager.pattern_library.refresh([normalized_file_name])
         
         # Clean up cached preview image and metadata asynchronously
         from modules.core.cache_manager import delete_pattern_cache
@@ -1399,7 +1485,8 @@ async def preview_thr(request: DeleteFileRequest):
         raise HTTPException(status_code=404, detail="Pattern file not found")
 
     try:
-        cache_path = get_cache_path(normalized_file_name)
+        content_hash = await asyncio.to_thread(get_content_hash, normalized_file_name)
+        cache_path = get_content_cache_path(content_hash)
 
         # Check cache existence asynchronously
         cache_exists = await asyncio.to_thread(os.path.exists, cache_path)
@@ -1418,9 +1505,9 @@ async def preview_thr(request: DeleteFileRequest):
             first_coord_obj = metadata.get('first_coordinate')
             last_coord_obj = metadata.get('last_coordinate')
         else:
-            # Fallback to parsing file if metadata not cached (shouldn't happen after initial cache)
-            logger.debug(f"Metadata cache miss for {request.file_name}, parsing file")
-            coordinates = await asyncio.to_thread(parse_theta_rho_file, pattern_file_path)
+            # Fallback to the compiled pattern if metadata not cached (shouldn't happen after initial cache)
+            logger.debug(f"Metadata cache miss for {request.file_name}, reading compiled pattern")
+            coordinates = await asyncio.to_thread(load_coordinates, pattern_file_path)
             first_coord = coordinates[0] if coordinates else None
             last_coord = coordinates[-1] if coordinates else None
             
@@ -1431,9 +1518,10 @@ async def preview_thr(request: DeleteFileRequest):
         # Return JSON with preview URL and coordinates
         # URL encode the file_name for the preview URL
         # Handle both forward slashes and backslashes for cross-platform compatibility
+        # The content hash versions the URL, so browsers may cache it forever
         encoded_filename = normalized_file_name.replace('\\', '--').replace('/', '--')
         return {
-            "preview_url": f"/preview/{encoded_filename}",
+            "preview_url": f"/preview/{encoded_filename}?v={content_hash}",
             "first_coordinate": first_coord_obj,
             "last_coordinate": last_coord_obj
         }
@@ -1444,9 +1532,26 @@ async def preview_thr(request: DeleteFileRequest):
         logger.error(f"Failed to generate or serve preview for {request.file_name}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to serve preview image: {str(e)}")
 
+def _etag_matches(if_none_match, etag):
+    """Check an If-None-Match header value against a strong ETag."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        # Weak comparison, as RFC 9110 requires for If-None-Match
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+    return False
+
 @app.get("/preview/{encoded_filename}")
-async def serve_preview(encoded_filename: str):
-    """Serve a preview image for a pattern file."""
+async def serve_preview(encoded_filename: str, request: Request, v: Optional[str] = None):
+    """Serve a preview image for a pattern file.
+
+    Previews are keyed by the pattern's content hash, which is also the ETag.
+    A URL versioned with ?v=<hash> (as returned by /preview_thr) never changes
+    and may be cached forever; without it the browser revalidates and gets a
+    304 while the pattern is unchanged.
+    """
     # Decode the filename by replacing -- with the original path separators
     # First try forward slash (most common case), then backslash if needed
     file_name = encoded_filename.replace('--', '/')
@@ -1455,23 +1560,36 @@ async def serve_preview(encoded_filename: str):
     file_name = normalize_file_path(file_name)
     
     # Check if the decoded path exists, if not try backslash decoding
-    cache_path = get_cache_path(file_name)
-    if not os.path.exists(cache_path):
+    if not os.path.exists(os.path.join(pattern_manager.THETA_RHO_DIR, file_name)):
         # Try with backslash for Windows paths
-        file_name_backslash = encoded_filename.replace('--', '\\')
-        file_name_backslash = normalize_file_path(file_name_backslash)
-        cache_path_backslash = get_cache_path(file_name_backslash)
-        if os.path.exists(cache_path_backslash):
+        file_name_backslash = normalize_file_path(encoded_filename.replace('--', '\\'))
+        if os.path.exists(os.path.join(pattern_manager.THETA_RHO_DIR, file_name_backslash)):
             file_name = file_name_backslash
-            cache_path = cache_path_backslash
-    # cache_path is already determined above in the decoding logic
+    
+    try:
+        content_hash = await asyncio.to_thread(get_content_hash, file_name)
+    except OSError:
+        logger.error(f"Preview image not found for {file_name}")
+        raise HTTPException(status_code=404, detail="Preview image not found")
+    
+    etag = f'"{content_hash}"'
+    if v == content_hash:
+        cache_control = "public, max-age=31536000, immutable"  # This URL always means this image
+    else:
+        cache_control = "public, no-cache"  # Unversioned or outdated URL: revalidate with the ETag
+    
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+    
+    cache_path = get_content_cache_path(content_hash)
     if not os.path.exists(cache_path):
         logger.error(f"Preview image not found for {file_name}")
         raise HTTPException(status_code=404, detail="Preview image not found")
     
     # Add caching headers
     headers = {
-        "Cache-Control": "public, max-age=31536000",  # Cache for 1 year
+        "Cache-Control": cache_control,
+        "ETag": etag,
         "Content-Type": "image/webp",
         "Accept-Ranges": "bytes"
     }
@@ -1569,6 +1687,19 @@ async def get_playlist(name: str):
 
     return playlist
 
+@app.get("/playlist_duration")
+async def get_playlist_duration(name: str, clear_pattern: Optional[str] = None, pause_time: float = 0):
+    """Estimate how long a playlist takes to run, from pattern geometry and logged run times."""
+    if not name:
+        raise HTTPException(status_code=400, detail="Missing playlist name parameter")
+
+    playlist = playlist_manager.get_playlist(name)
+    if not playlist:
+        raise HTTPException(status_code=404, detail=f"Playlist '{name}' not found")
+
+    from modules.core.cache_manager import estimate_playlist_seconds
+    return await asyncio.to_thread(estimate_playlist_seconds, playlist['files'], clear_pattern, pause_time)
+
 @app.post("/create_playlist")
 async def create_playlist(request: PlaylistRequest):
     success = playlist_manager.create_playlist(request.playlist_name, request.files)
@@ -2280,8 +2411,110 @@ async def test_mqtt_connection(request: dict):
             status_code=500
         )
 
+# Patterns a single batch/stream request prepares at once; rendering itself is
+# bounded separately by the preview worker pool
+PREVIEW_BATCH_CONCURRENCY = 8
+
+async def prepare_pattern_preview(file_name):
+    """Make sure a pattern's preview exists.
+
+    Returns (result, cache_path): result holds the versioned preview URL and the
+    first/last coordinates, or an "error"; cache_path is None on error.
+    """
+    normalized_file_name = normalize_file_path(file_name)
+    pattern_file_path = os.path.join(pattern_manager.THETA_RHO_DIR, normalized_file_name)
+
+    def _locate():
+        # Hash and cache lookup in a single thread hop
+        content_hash = get_content_hash(normalized_file_name)
+        cache_path = get_content_cache_path(content_hash)
+        return content_hash, cache_path, os.path.exists(cache_path)
+
+    try:
+        content_hash, cache_path, cache_exists = await asyncio.to_thread(_locate)
+    except OSError:
+        logger.warning(f"Pattern file not found: {pattern_file_path}")
+        return {"error": "Pattern file not found"}, None
+
+    if not cache_exists:
+        logger.info(f"Cache miss for {file_name}. Generating preview...")
+        if not await generate_image_preview(normalized_file_name):
+            logger.error(f"Failed to generate or find preview for {file_name}")
+            return {"error": "Failed to generate preview"}, None
+
+    metadata = get_pattern_metadata(normalized_file_name)
+    if metadata:
+        first_coord_obj = metadata.get('first_coordinate')
+        last_coord_obj = metadata.get('last_coordinate')
+    else:
+        logger.debug(f"Metadata cache miss for {file_name}, reading compiled pattern")
+        # First/last coordinates are direct lookups in the memory-mapped sidecar
+        coordinates = await asyncio.to_thread(load_coordinates, pattern_file_path)
+        first_coord = coordinates[0] if coordinates else None
+        last_coord = coordinates[-1] if coordinates else None
+        first_coord_obj = {"x": first_coord[0], "y": first_coord[1]} if first_coord else None
+        last_coord_obj = {"x": last_coord[0], "y": last_coord[1]} if last_coord else None
+
+    encoded_filename = normalized_file_name.replace('/', '--')
+    return {
+        "preview_url": f"/preview/{encoded_filename}?v={content_hash}",
+        "first_coordinate": first_coord_obj,
+        "last_coordinate": last_coord_obj
+    }, cache_path
+
+@app.post("/preview_thr_stream")
+async def preview_thr_stream(request: dict):
+    """Stream previews for many patterns as newline-delimited JSON.
+
+    One line per pattern, written as soon as that pattern's preview is ready
+    (cached ones first), so the page can show the first images without waiting
+    for the slowest. Lines carry the preview URL rather than the image itself:
+    {"file_name": ..., "preview_url": ..., "first_coordinate": ..., "last_coordinate": ...}
+    or {"file_name": ..., "error": ...}.
+    """
+    if not request.get("file_names"):
+        logger.warning("Preview stream request received without filenames")
+        raise HTTPException(status_code=400, detail="No file names provided")
+
+    file_names = request["file_names"]
+    if not isinstance(file_names, list):
+        raise HTTPException(status_code=400, detail="file_names must be a list")
+
+    semaphore = asyncio.Semaphore(PREVIEW_BATCH_CONCURRENCY)
+
+    async def process_single_file(file_name):
+        async with semaphore:
+            try:
+                result, _ = await prepare_pattern_preview(file_name)
+            except Exception as e:
+                logger.error(f"Error processing {file_name}: {str(e)}")
+                result = {"error": str(e)}
+        return {"file_name": file_name, **result}
+
+    async def generate_lines():
+        start = time.time()
+        tasks = [asyncio.ensure_future(process_single_file(file_name)) for file_name in dict.fromkeys(file_names)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+            logger.debug(f"Streamed {len(tasks)} previews in {time.time() - start:.2f}s")
+        finally:
+            # Client went away: stop preparing previews nobody will see
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        generate_lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-store"}
+    )
+
 @app.post("/preview_thr_batch")
 async def preview_thr_batch(request: dict):
+    """Previews for many patterns as one JSON object with base64 image data.
+
+    Kept for older clients; /preview_thr_stream is faster for large batches.
+    """
     start = time.time()
     if not request.get("file_names"):
         logger.warning("Batch preview request received without filenames")
@@ -2296,59 +2529,29 @@ async def preview_thr_batch(request: dict):
         "Content-Type": "application/json"
     }
 
+    semaphore = asyncio.Semaphore(PREVIEW_BATCH_CONCURRENCY)
+
     async def process_single_file(file_name):
         """Process a single file and return its preview data."""
         t1 = time.time()
-        try:
-            # Normalize file path for cross-platform compatibility
-            normalized_file_name = normalize_file_path(file_name)
-            pattern_file_path = os.path.join(pattern_manager.THETA_RHO_DIR, normalized_file_name)
-
-            # Check file existence asynchronously
-            exists = await asyncio.to_thread(os.path.exists, pattern_file_path)
-            if not exists:
-                logger.warning(f"Pattern file not found: {pattern_file_path}")
-                return file_name, {"error": "Pattern file not found"}
-
-            cache_path = get_cache_path(normalized_file_name)
-
-            # Check cache existence asynchronously
-            cache_exists = await asyncio.to_thread(os.path.exists, cache_path)
-            if not cache_exists:
-                logger.info(f"Cache miss for {file_name}. Generating preview...")
-                success = await generate_image_preview(normalized_file_name)
-                cache_exists_after = await asyncio.to_thread(os.path.exists, cache_path)
-                if not success or not cache_exists_after:
-                    logger.error(f"Failed to generate or find preview for {file_name}")
-                    return file_name, {"error": "Failed to generate preview"}
-
-            metadata = get_pattern_metadata(normalized_file_name)
-            if metadata:
-                first_coord_obj = metadata.get('first_coordinate')
-                last_coord_obj = metadata.get('last_coordinate')
-            else:
-                logger.debug(f"Metadata cache miss for {file_name}, parsing file")
-                # Use process pool for CPU-intensive parsing
-                loop = asyncio.get_event_loop()
-                coordinates = await loop.run_in_executor(process_pool, parse_theta_rho_file, pattern_file_path)
-                first_coord = coordinates[0] if coordinates else None
-                last_coord = coordinates[-1] if coordinates else None
-                first_coord_obj = {"x": first_coord[0], "y": first_coord[1]} if first_coord else None
-                last_coord_obj = {"x": last_coord[0], "y": last_coord[1]} if last_coord else None
-
-            # Read image file asynchronously
-            image_data = await asyncio.to_thread(lambda: open(cache_path, 'rb').read())
-            image_b64 = base64.b64encode(image_data).decode('utf-8')
-            result = {
-                "image_data": f"data:image/webp;base64,{image_b64}",
-                "first_coordinate": first_coord_obj,
-                "last_coordinate": last_coord_obj
-            }
-            logger.debug(f"Processed {file_name} in {time.time() - t1:.2f}s")
-            return file_name, result
-        except Exception as e:
-            logger.error(f"Error processing {file_name}: {str(e)}")
-            return file_name, {"error": str(e)}
+        async with semaphore:
+            try:
+                result, cache_path = await prepare_pattern_preview(file_name)
+                if cache_path is None:
+                    return file_name, result
+
+                # Read image file asynchronously
+                image_data = await asyncio.to_thread(lambda: open(cache_path, 'rb').read())
+                image_b64 = base64.b64encode(image_data).decode('utf-8')
+                logger.debug(f"Processed {file_name} in {time.time() - t1:.2f}s")
+                return file_name, {
+                    "image_data": f"data:image/webp;base64,{image_b64}",
+                    "first_coordinate": result["first_coordinate"],
+                    "last_coordinate": result["last_coordinate"]
+                }
+            except Exception as e:
+                logger.error(f"Error processing {file_name}: {str(e)}")
+                return file_name, {"error": str(e)}
 
     # Process all files concurrently
     tasks = [process_single_file(file_name) for file_name in file_names]
@@ -2946,6 +3149,24 @@ async def get_cache_progress_endpoint():
     from modules.core.cache_manager import get_cache_progress
     return get_cache_progress()
 
+@app.get("/api/metadata-cache/stats")
+async def get_metadata_cache_stats_endpoint():
+    """Get hit/miss counters of the in-memory pattern metadata cache."""
+    from modules.core.cache_manager import get_metadata_cache_stats
+    return await asyncio.to_thread(get_metadata_cache_stats)
+
+@app.get("/api/execution-estimator/stats")
+async def get_execution_estimator_stats_endpoint():
+    """Get the run counts and fitted coefficients of the execution time estimator."""
+    from modules.core.cache_manager import get_execution_estimator
+    estimator = await asyncio.to_thread(get_execution_estimator)
+    return estimator.stats()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Metrics in the Prometheus text exposition format."""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/rebuild_cache")
 async def rebuild_cache_endpoint():
     """Trigger a rebuild of the pattern cache."""
@@ -2965,12 +3186,11 @@ def signal_handler(signum, frame):
         if state.led_controller:
             state.led_controller.set_power(0)
 
-        # Shutdown process pool to prevent semaphore leaks
-        global process_pool
-        if process_pool:
-            logger.info("Shutting down process pool...")
-            process_pool.shutdown(wait=False, cancel_futures=True)
-            process_pool = None
+        # Shutdown preview worker processes to prevent semaphore leaks
+        preview_renderer.shutdown()
+
+        # Stop watching the pattern library
+        pattern_manager.pattern_library.stop()
 
         # Stop pattern manager motion controller
         pattern_manager.motion_controller.stop()
@@ -2980,6 +3200,8 @@ def signal_handler(signum, frame):
         state.pause_requested = False
 
         state.save()
+        # os._exit below skips atexit handlers, so write the state now
+        state.flush()
         logger.info("Cleanup completed")
     except Exception as e:
         logger.error(f"Error during cleanup: {str(e)}")
@@ -8,6 +8,8 @@ import asyncio
 import os
 
 from modules.core import pattern_manager
+from modules.connection.controller_reader import ControllerReader
+from modules.connection.status_poller import StatusPoller
 from modules.core.state import state
 from modules.led.led_interface import LEDInterface
 from modules.led.idle_timeout_manager import idle_timeout_manager
@@ -16,6 +18,9 @@ logger = logging.getLogger(__name__)
 
 IGNORE_PORTS = ['/dev/cu.debug-console', '/dev/cu.Bluetooth-Incoming-Port']
 
+# Port name that selects the built-in FluidNC simulator instead of a table
+SIMULATOR_PORT = "simulator"
+
 
 async def _check_table_is_idle() -> bool:
     """Helper function to check if table is idle."""
@@ -40,17 +45,27 @@ def _start_idle_led_timeout():
 ###############################################################################
 
 class BaseConnection:
-    """Abstract base class for a connection."""
+    """
+    Abstract base class for a connection.
+
+    Subclasses implement the raw transport (send, flush, _read_line, is_connected,
+    close) and call _start_reader() once connected. Controller output is only ever
+    read by the ControllerReader thread; callers wait on the channel they expect
+    with read_ack, query_status or read_message. The StatusPoller keeps the latest
+    machine status in status_poller.snapshot.
+    """
+    reader = None
+    status_poller = None
+    timeout = 2
+
     def send(self, data: str) -> None:
         raise NotImplementedError
 
     def flush(self) -> None:
         raise NotImplementedError
 
-    def readline(self) -> str:
-        raise NotImplementedError
-
-    def in_waiting(self) -> int:
+    def _read_line(self) -> str:
+        """Blocking read of the next raw line, '' on timeout. Only called by the reader thread."""
         raise NotImplementedError
 
     def is_connected(self) -> bool:
@@ -59,6 +74,59 @@ class BaseConnection:
     def close(self) -> None:
         raise NotImplementedError
 
+    def _start_reader(self) -> None:
+        self.reader = ControllerReader(self._read_line, name=type(self).__name__)
+        self.status_poller = StatusPoller(self, lambda: state.status_poll_interval)
+
+    def _stop_reader(self) -> None:
+        if self.status_poller:
+            self.status_poller.stop()
+        if self.reader:
+            self.reader.stop()
+
+    def _join_reader(self) -> None:
+        if self.status_poller:
+            self.status_poller.join()
+        if self.reader:
+            self.reader.join()
+
+    def read_ack(self, timeout=None) -> str:
+        """Next 'ok'/'error:N' acknowledgement, or '' after timeout (default: connection timeout)."""
+        return self.reader.read_ack(self.timeout if timeout is None else timeout)
+
+    def read_message(self, timeout=None) -> str:
+        """Next [MSG:...], setting, alarm or other unsolicited line, or '' after timeout."""
+        return self.reader.read_message(self.timeout if timeout is None else timeout)
+
+    def query_status(self, timeout=None) -> str:
+        """Send a '?' real-time query and return the status report it produces, or ''."""
+        seq = self.reader.status_seq
+        self.send('?')
+        return self.reader.wait_status(seq, self.timeout if timeout is None else timeout)
+
+    def send_command(self, command: str, timeout=None):
+        """
+        Send a line and wait for its acknowledgement.
+
+        Returns (ack, messages): ack is '' if none arrived in time, messages are the
+        lines the controller printed before it, e.g. the settings listed by '$$'.
+        """
+        self.send(command + "\n")
+        ack = self.read_ack(timeout)
+        # Output precedes the acknowledgement, so it is all queued by now
+        messages = []
+        while self.reader.pending_messages():
+            messages.append(self.reader.read_message(0))
+        return ack, messages
+
+    def discard_pending(self) -> None:
+        """Drop acknowledgements and messages left over from earlier commands."""
+        self.reader.discard_pending()
+
+    def in_waiting(self) -> int:
+        """Number of unread messages."""
+        return self.reader.pending_messages() if self.reader else 0
+
 ###############################################################################
 # Serial Connection Implementation
 ###############################################################################
@@ -73,6 +141,7 @@ class SerialConnection(BaseConnection):
         self.ser = serial.Serial(port, baudrate, timeout=timeout)
         state.port = port
         logger.info(f'Connected to Serial port {port}')
+        self._start_reader()
 
     def send(self, data: str) -> None:
         with self.lock:
@@ -83,13 +152,9 @@ class SerialConnection(BaseConnection):
         with self.lock:
             self.ser.flush()
 
-    def readline(self) -> str:
-        with self.lock:
-            return self.ser.readline().decode().strip()
-
-    def in_waiting(self) -> int:
-        with self.lock:
-            return self.ser.in_waiting
+    def _read_line(self) -> str:
+        # Only the reader thread reads, so no lock; the lock serializes writers
+        return self.ser.readline().decode(errors='replace').strip()
 
     def is_connected(self) -> bool:
         return self.ser is not None and self.ser.is_open
@@ -99,13 +164,15 @@ class SerialConnection(BaseConnection):
         try:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
-            loop.run_until_complete(update_machine_position())
+            loop.run_until_complete(update_machine_position(save_now=True))
             loop.close()
         except Exception as e:
             logger.error(f"Error updating machine position on close: {e}")
+        self._stop_reader()
         with self.lock:
             if self.ser.is_open:
                 self.ser.close()
+        self._join_reader()
         # Release the lock resources
         self.lock = None
 
@@ -126,6 +193,7 @@ class WebSocketConnection(BaseConnection):
         self.ws = websocket.create_connection(self.url, timeout=self.timeout)
         state.port = self.url
         logger.info(f'Connected to Websocket {self.url}')
+        self._start_reader()
         
     def send(self, data: str) -> None:
         with self.lock:
@@ -135,16 +203,16 @@ class WebSocketConnection(BaseConnection):
         # WebSocket sends immediately; nothing to flush.
         pass
 
-    def readline(self) -> str:
-        with self.lock:
+    def _read_line(self) -> str:
+        try:
             data = self.ws.recv()
-            # Decode bytes to string if necessary
-            if isinstance(data, bytes):
-                data = data.decode('utf-8')
-            return data.strip()
-
-    def in_waiting(self) -> int:
-        return 0  # Not applicable for WebSocket
+        except websocket.WebSocketTimeoutException:
+            return ""
+        # Decode bytes to string if necessary
+        if isinstance(data, bytes):
+            data = data.decode('utf-8', errors='replace')
+        # A frame may carry several lines; the reader splits them
+        return data.strip()
 
     def is_connected(self) -> bool:
         return self.ws is not None
@@ -154,13 +222,15 @@ class WebSocketConnection(BaseConnection):
         try:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
-            loop.run_until_complete(update_machine_position())
+            loop.run_until_complete(update_machine_position(save_now=True))
             loop.close()
         except Exception as e:
             logger.error(f"Error updating machine position on close: {e}")
+        self._stop_reader()
         with self.lock:
             if self.ws:
                 self.ws.close()
+        self._join_reader()
         # Release the lock resources
         self.lock = None
                 
@@ -171,6 +241,18 @@ def list_serial_ports():
     logger.debug(f"Available serial ports: {available_ports}")
     return available_ports
 
+def connect_simulator(**options):
+    """
+    Connect to the simulated FluidNC controller (see fluidnc_simulator) instead of
+    a table, so the motion and playlist path can run without hardware.
+    options are passed to SimulatedFluidNCConnection.
+    """
+    from modules.connection.fluidnc_simulator import SimulatedFluidNCConnection
+    logger.info(f'Connecting to simulated FluidNC controller {options or ""}')
+    state.conn = SimulatedFluidNCConnection(**options)
+    state.port = SIMULATOR_PORT
+    return state.conn
+
 def device_init(homing=True):
     try:
         if get_machine_steps():
@@ -224,7 +306,9 @@ def connect_device(homing=True):
     # 1. Preferred port (user's explicit choice) if available
     # 2. Last used port if available
     # 3. First available port as fallback
-    if state.preferred_port and state.preferred_port in ports:
+    if state.preferred_port == SIMULATOR_PORT:
+        connect_simulator()
+    elif state.preferred_port and state.preferred_port in ports:
         logger.info(f"Connecting to preferred port: {state.preferred_port}")
         state.conn = SerialConnection(state.preferred_port)
     elif state.port and state.port in ports:
@@ -263,20 +347,9 @@ def check_and_unlock_alarm():
     try:
         logger.info("Checking device status for alarm state...")
 
-        # Send status query
-        state.conn.send('?\n')
-        time.sleep(0.1)
-
-        # Read response with timeout
-        max_attempts = 5
-        response = None
-
-        for attempt in range(max_attempts):
-            if state.conn.in_waiting() > 0:
-                response = state.conn.readline()
-                logger.debug(f"Status response: {response}")
-                break
-            time.sleep(0.1)
+        status = state.conn.status_poller.wait_for(lambda s: True, timeout=1.0)
+        response = status.raw if status else None
+        logger.debug(f"Status response: {response}")
 
         if not response:
             logger.warning("No status response received, proceeding anyway")
@@ -288,27 +361,17 @@ def check_and_unlock_alarm():
 
             # Query alarm details with $A command
             logger.info("Querying alarm details with $A command...")
-            state.conn.send('$A\n')
-            time.sleep(0.2)
-
-            # Read and log alarm details
-            for attempt in range(max_attempts):
-                if state.conn.in_waiting() > 0:
-                    alarm_details = state.conn.readline()
-                    logger.warning(f"Alarm details: {alarm_details}")
-                    break
-                time.sleep(0.1)
+            _, alarm_details = state.conn.send_command('$A', timeout=0.7)
+            for detail in alarm_details:
+                logger.warning(f"Alarm details: {detail}")
 
             # Send unlock command
             logger.info("Sending $X to unlock...")
-            state.conn.send('$X\n')
-            time.sleep(0.5)
+            state.conn.send_command('$X', timeout=0.5)
 
             # Verify unlock succeeded
-            state.conn.send('?\n')
-            time.sleep(0.1)
-
-            verify_response = state.conn.readline()
+            verify_status = state.conn.status_poller.wait_for(lambda s: True, timeout=state.conn.timeout)
+            verify_response = verify_status.raw if verify_status else ""
             logger.debug(f"Verification response: {verify_response}")
 
             if "Alarm" in verify_response:
@@ -327,19 +390,22 @@ def check_and_unlock_alarm():
 
 def get_status_response() -> str:
     """
-    Send a status query ('?') and return the response if available.
+    Wait for the next status report with a machine position and return its raw text.
+    Returns False if status polling has stopped.
     """
     while True:
         try:
-            state.conn.send('?')
-            response = state.conn.readline()
-            if "MPos" in response:
-                logger.debug(f"Status response: {response}")
-                return response
+            poller = state.conn.status_poller
+            status = poller.wait_for(lambda s: s.machine_x is not None, timeout=state.conn.timeout)
+            if status:
+                logger.debug(f"Status response: {status.raw}")
+                return status.raw
+            if not poller.running:
+                logger.error("Status polling has stopped")
+                return False
         except Exception as e:
             logger.error(f"Error getting status response: {e}")
             return False
-        time.sleep(1)
         
 def parse_machine_position(response: str):
     """
@@ -381,11 +447,15 @@ async def send_grbl_coordinates(x, y, speed=600, timeout=2, home=False):
             start_time = time.time()
             while True:
                 # Use asyncio.to_thread for blocking I/O operations
-                response = await asyncio.to_thread(state.conn.readline)
+                response = await asyncio.to_thread(state.conn.read_ack)
                 logger.debug(f"Response: {response}")
                 if response.lower() == "ok":
                     logger.debug("Command execution confirmed.")
                     return
+                if response:
+                    # The controller rejected the line; waiting longer won't produce an 'ok'
+                    logger.warning(f"Controller rejected {gcode}: {response}")
+                    return
         except Exception as e:
             # Store the error string inside the exception block
             error_str = str(e)
@@ -436,69 +506,58 @@ def get_machine_steps(timeout=10):
     y_steps_per_mm = None
     start_time = time.time()
 
-    # Clear any pending data in the buffer
+    # Drop output left over from earlier commands
     try:
-        while state.conn.in_waiting() > 0:
-            state.conn.readline()
+        state.conn.discard_pending()
     except Exception as e:
         logger.warning(f"Error clearing buffer: {e}")
 
-    # Send the command to request all settings
-    try:
-        logger.info("Requesting GRBL settings with $$ command")
-        state.conn.send("$$\n")
-        time.sleep(0.5)  # Give GRBL a moment to process and respond
-    except Exception as e:
-        logger.error(f"Error sending $$ command: {e}")
-        return False
-
-    # Wait for and process responses
+    # Request all settings; they are printed before the command's 'ok'
     settings_complete = False
     while time.time() - start_time < timeout and not settings_complete:
         try:
-            # Attempt to read a line from the connection
-            if state.conn.in_waiting() > 0:
-                response = state.conn.readline()
-                logger.debug(f"Raw response: {response}")
-                
-                # Process the line
-                if response.strip():  # Only process non-empty lines
-                    for line in response.splitlines():
-                        line = line.strip()
-                        logger.debug(f"Config response: {line}")
-                        if line.startswith("$100="):
-                            x_steps_per_mm = float(line.split("=")[1])
-                            state.x_steps_per_mm = x_steps_per_mm
-                            logger.info(f"X steps per mm: {x_steps_per_mm}")
-                        elif line.startswith("$101="):
-                            y_steps_per_mm = float(line.split("=")[1])
-                            state.y_steps_per_mm = y_steps_per_mm
-                            logger.info(f"Y steps per mm: {y_steps_per_mm}")
-                        elif line.startswith("$22="):
-                            # $22 reports if the homing cycle is enabled
-                            # returns 0 if disabled, 1 if enabled
-                            # Note: We only log this, we don't overwrite state.homing
-                            # because user preference (saved in state.json) should take precedence
-                            firmware_homing = int(line.split('=')[1])
-                            logger.info(f"Firmware homing setting ($22): {firmware_homing}, using user preference: {state.homing}")
-                
-                # Check if we've received all the settings we need
-                if x_steps_per_mm is not None and y_steps_per_mm is not None:
-                    settings_complete = True
+            logger.info("Requesting GRBL settings with $$ command")
+            ack, lines = state.conn.send_command("$$", timeout=min(3, max(0.1, timeout - (time.time() - start_time))))
+            logger.debug(f"$$ acknowledgement: {ack}")
+            for line in lines:
+                logger.debug(f"Config response: {line}")
+                if line.startswith("$100="):
+                    x_steps_per_mm = float(line.split("=")[1])
+                    state.x_steps_per_mm = x_steps_per_mm
+                    logger.info(f"X steps per mm: {x_steps_per_mm}")
+                elif line.startswith("$101="):
+                    y_steps_per_mm = float(line.split("=")[1])
+                    state.y_steps_per_mm = y_steps_per_mm
+                    logger.info(f"Y steps per mm: {y_steps_per_mm}")
+                elif line.startswith("$22="):
+                    # $22 reports if the homing cycle is enabled
+                    # returns 0 if disabled, 1 if enabled
+                    # Note: We only log this, we don't overwrite state.homing
+                    # because user preference (saved in state.json) should take precedence
+                    firmware_homing = int(line.split('=')[1])
+                    logger.info(f"Firmware homing setting ($22): {firmware_homing}, using user preference: {state.homing}")
+
+            # Check if we've received all the settings we need
+            if x_steps_per_mm is not None and y_steps_per_mm is not None:
+                settings_complete = True
+            elif ack.startswith("error"):
+                logger.error(f"Controller rejected $$ command: {ack}")
+                break
             else:
-                # No data waiting, small sleep to prevent CPU thrashing
-                time.sleep(0.1)
-                
-                # If it's taking too long, try sending the command again after 3 seconds
-                elapsed = time.time() - start_time
-                if elapsed > 3 and elapsed < 4:
-                    logger.warning("No response yet, sending $$ command again")
-                    state.conn.send("$$\n")
-
+                logger.warning("No response yet, sending $$ command again")
+                # A late 'ok' of this attempt must not be taken as the reply to the next command
+                state.conn.discard_pending()
+                time.sleep(0.5)
         except Exception as e:
             logger.error(f"Error getting machine steps: {e}")
             time.sleep(0.5)
-    
+
+    # Drop anything an earlier, timed out $$ still produced
+    try:
+        state.conn.discard_pending()
+    except Exception as e:
+        logger.warning(f"Error clearing buffer: {e}")
+
     # Process results and determine table type
     if settings_complete:
         if y_steps_per_mm == 180 and x_steps_per_mm == 256:
@@ -540,7 +599,7 @@ def get_machine_steps(timeout=10):
         missing = []
         if x_steps_per_mm is None: missing.append("X steps/mm")
         if y_steps_per_mm is None: missing.append("Y steps/mm")
-        logger.error(f"Failed to get all machine parameters after {timeout}s. Missing: {', '.join(missing)}")
+        logger.error(f"Failed to get all machine parameters after {time.time() - start_time:.1f}s. Missing: {', '.join(missing)}")
         return False
 
 def home(timeout=90):
@@ -587,6 +646,7 @@ def home(timeout=90):
                 state.homed_y = False
 
                 # Send $H command
+                state.conn.discard_pending()
                 state.conn.send("$H\n")
                 logger.info("Sent $H command, waiting for homing messages...")
 
@@ -596,7 +656,7 @@ def home(timeout=90):
 
                 while (time.time() - start_time) < max_wait_time:
                     try:
-                        response = state.conn.readline()
+                        response = state.conn.read_message(timeout=0.5)
                         if response:
                             logger.debug(f"Homing response: {response}")
 
@@ -614,12 +674,16 @@ def home(timeout=90):
                                 break
                     except Exception as e:
                         logger.error(f"Error reading homing response: {e}")
-
-                    time.sleep(0.1)
+                        time.sleep(0.1)
 
                 if not (state.homed_x and state.homed_y):
                     logger.warning(f"Did not receive all homing messages (X:{state.homed_x}, Y:{state.homed_y})")
 
+                # $H is acknowledged once the cycle finishes; collect it so the
+                # 'ok' isn't mistaken for the acknowledgement of the next move
+                homing_ack = state.conn.read_ack(timeout=max(1, max_wait_time - (time.time() - start_time)))
+                logger.debug(f"$H acknowledgement: {homing_ack}")
+
                 # Wait for idle state after $H
                 logger.info("Waiting for device to reach idle state after $H...")
                 idle_reached = check_idle()
@@ -734,51 +798,54 @@ def home(timeout=90):
     logger.info("Homing completed successfully")
     return True
 
+def _record_machine_position(status, save_now=False):
+    """Store the position of a status report in state and persist it."""
+    state.machine_x, state.machine_y = status.machine_x, status.machine_y
+    # Positions are recorded after every idle wait; only the small position file
+    # is written, and repeated records are coalesced
+    state.save_position()
+    if save_now:
+        state.flush()
+    logger.info(f'Machine position saved: {state.machine_x}, {state.machine_y}')
+
 def check_idle():
     """
-    Continuously check if the device is idle (synchronous version).
+    Wait until the device reports Idle (synchronous version).
+    Only reports answering a query sent after the call count, so a move sent just before isn't missed.
+    Returns False if status polling stops first.
     """
     logger.info("Checking idle")
-    while True:
-        response = get_status_response()
-        if response and "Idle" in response:
-            logger.info("Device is idle")
-            # Schedule async update_machine_position in the existing event loop
-            try:
-                # Try to schedule in existing event loop if available
-                try:
-                    loop = asyncio.get_running_loop()
-                    # Create a task but don't await it (fire and forget)
-                    asyncio.create_task(update_machine_position())
-                    logger.debug("Scheduled machine position update task")
-                except RuntimeError:
-                    # No event loop running, skip machine position update
-                    logger.debug("No event loop running, skipping machine position update")
-            except Exception as e:
-                logger.error(f"Error scheduling machine position update: {e}")
-            return True
-        time.sleep(1)
+    status = state.conn.status_poller.wait_for(lambda s: s.is_idle)
+    if status is None:
+        logger.error("Status polling stopped while waiting for idle")
+        return False
+    logger.info("Device is idle")
+    if status.machine_x is not None:
+        _record_machine_position(status)
+    return True
+
+# Poll interval while waiting for motion to end, so the next pattern starts promptly
+IDLE_WAIT_POLL_INTERVAL = 0.05
 
 async def check_idle_async():
     """
-    Continuously check if the device is idle (async version).
+    Wait until the device reports Idle (async version).
     """
     logger.info("Checking idle (async)")
-    while True:
-        response = await asyncio.to_thread(get_status_response)
-        if response and "Idle" in response:
-            logger.info("Device is idle")
-            try:
-                await update_machine_position()
-            except Exception as e:
-                logger.error(f"Error updating machine position: {e}")
-            return True
-        await asyncio.sleep(1)
+    status = await state.conn.status_poller.wait_for_async(lambda s: s.is_idle,
+                                                           poll_interval=IDLE_WAIT_POLL_INTERVAL)
+    if status is None:
+        logger.error("Status polling stopped while waiting for idle")
+        return False
+    logger.info("Device is idle")
+    if status.machine_x is not None:
+        _record_machine_position(status)
+    return True
 
 def is_machine_idle() -> bool:
     """
     Single check to see if the machine is currently idle.
-    Does not loop - returns immediately with current status.
+    Reads the latest status snapshot; only waits if it is more than a second old.
 
     Returns:
         True if machine is idle, False otherwise
@@ -788,14 +855,13 @@ def is_machine_idle() -> bool:
         return False
 
     try:
-        state.conn.send('?')
-        response = state.conn.readline()
+        status = state.conn.status_poller.fresh_snapshot(max_age=1.0)
 
-        if response and "Idle" in response:
+        if status and status.is_idle:
             logger.debug("Machine status: Idle")
             return True
         else:
-            logger.debug(f"Machine status: {response}")
+            logger.debug(f"Machine status: {status.raw if status else None}")
             return False
     except Exception as e:
         logger.error(f"Error checking machine idle status: {e}")
@@ -804,34 +870,29 @@ def is_machine_idle() -> bool:
 
 def get_machine_position(timeout=5):
     """
-    Query the device for its position.
+    Wait for a fresh status report and return its position.
     """
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        try:
-            state.conn.send('?')
-            response = state.conn.readline()
-            logger.debug(f"Raw status response: {response}")
-            if "MPos" in response:
-                pos = parse_machine_position(response)
-                if pos:
-                    machine_x, machine_y = pos
-                    logger.debug(f"Machine position: X={machine_x}, Y={machine_y}")
-                    return machine_x, machine_y
-        except Exception as e:
-            logger.error(f"Error getting machine position: {e}")
-            return
-        time.sleep(0.1)
+    try:
+        status = state.conn.status_poller.wait_for(lambda s: s.machine_x is not None, timeout=timeout)
+    except Exception as e:
+        logger.error(f"Error getting machine position: {e}")
+        return
+    if status:
+        logger.debug(f"Machine position: X={status.machine_x}, Y={status.machine_y}")
+        return status.machine_x, status.machine_y
     logger.warning("Timeout reached waiting for machine position")
     return None, None
 
-async def update_machine_position():
+async def update_machine_position(save_now=False):
+    """Record the reported machine position. save_now writes it to disk before returning."""
     if (state.conn.is_connected() if state.conn else False):
         try:
             logger.info('Saving machine position')
-            state.machine_x, state.machine_y = await asyncio.to_thread(get_machine_position)
-            await asyncio.to_thread(state.save)
-            logger.info(f'Machine position saved: {state.machine_x}, {state.machine_y}')
+            status = await state.conn.status_poller.wait_for_async(lambda s: s.machine_x is not None, timeout=5)
+            if status is None:
+                logger.warning("Timeout reached waiting for machine position")
+                return
+            _record_machine_position(status, save_now)
         except Exception as e:
             logger.error(f"Error updating machine position: {e}")
 
@@ -0,0 +1,148 @@
+"""
+Background reader for controller output.
+
+GRBL/FluidNC interleave three kinds of lines on one serial stream:
+
+- acknowledgements ('ok' / 'error:N'), one per line received, in order,
+- status reports ('<Idle|MPos:...>'), one per '?' real-time query, and
+- everything else: '[MSG:...]' messages, '$' settings, 'ALARM:N', the banner.
+
+When several callers read the stream directly, whoever reads next gets the next
+line whatever it is: a status query swallows the 'ok' the motion thread is waiting
+for, and the motion thread has to skip status reports. ControllerReader owns the
+only reader thread and sorts every line into its channel, so each caller waits on
+the kind of line it expects.
+"""
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def classify_line(line: str) -> str:
+    """Channel of a controller line: 'ack', 'status' or 'message'."""
+    lowered = line.lower()
+    if lowered == 'ok' or lowered.startswith('error'):
+        return 'ack'
+    if line.startswith('<'):
+        return 'status'
+    return 'message'
+
+
+class ControllerReader:
+    """Reads controller lines on a daemon thread and demultiplexes them into channels."""
+
+    def __init__(self, read_line, name: str = "controller"):
+        """
+        Args:
+            read_line: Blocking function returning the next line (or several, newline
+                       separated), or '' after its timeout. Called from the reader
+                       thread only.
+            name: Used in the thread name and log messages
+        """
+        self._read_line = read_line
+        self.name = name
+        self._acks = queue.Queue()
+        self._messages = queue.Queue()
+        self._status_cond = threading.Condition()
+        self._status = ""
+        self._status_seq = 0
+        self._error = None
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"{name}-reader", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while self._running:
+            try:
+                line = self._read_line()
+            except Exception as e:
+                if self._running:
+                    logger.warning(f"{self.name} reader stopped: {e}")
+                    self._error = e
+                break
+            if line:
+                for part in line.splitlines():
+                    self._dispatch(part.strip())
+
+        self._running = False
+        # Wake status waiters so they see the error instead of their timeout
+        with self._status_cond:
+            self._status_cond.notify_all()
+
+    def _dispatch(self, line: str):
+        if not line:
+            return
+        channel = classify_line(line)
+        if channel == 'ack':
+            self._acks.put(line)
+        elif channel == 'status':
+            with self._status_cond:
+                self._status = line
+                self._status_seq += 1
+                self._status_cond.notify_all()
+        else:
+            self._messages.put(line)
+
+    def _check_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _get(self, channel: queue.Queue, timeout):
+        try:
+            # A dead reader only delivers what it queued before it stopped
+            return channel.get(timeout=timeout if self._running else 0)
+        except queue.Empty:
+            self._check_error()
+            return ""
+
+    def read_ack(self, timeout=None) -> str:
+        """Next 'ok'/'error:N', or '' after timeout seconds."""
+        return self._get(self._acks, timeout)
+
+    def read_message(self, timeout=None) -> str:
+        """Next line that is neither an acknowledgement nor a status report, or ''."""
+        return self._get(self._messages, timeout)
+
+    @property
+    def status_seq(self) -> int:
+        """Number of status reports received so far."""
+        with self._status_cond:
+            return self._status_seq
+
+    @property
+    def last_status(self) -> str:
+        with self._status_cond:
+            return self._status
+
+    def wait_status(self, after_seq: int, timeout=None) -> str:
+        """First status report newer than after_seq, or '' after timeout seconds."""
+        with self._status_cond:
+            self._status_cond.wait_for(lambda: self._status_seq > after_seq or not self._running, timeout)
+            if self._status_seq > after_seq:
+                return self._status
+        self._check_error()
+        return ""
+
+    def pending_messages(self) -> int:
+        return self._messages.qsize()
+
+    def discard_pending(self) -> None:
+        """Drop queued acknowledgements and messages nobody is waiting for."""
+        for channel in (self._acks, self._messages):
+            while True:
+                try:
+                    channel.get_nowait()
+                except queue.Empty:
+                    break
+
+    def stop(self) -> None:
+        """Stop reading. Close the connection afterwards to unblock read_line, then join()."""
+        self._running = False
+        with self._status_cond:
+            self._status_cond.notify_all()
+
+    def join(self, timeout: float = 1.0) -> None:
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
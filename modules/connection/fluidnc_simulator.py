@@ -0,0 +1,377 @@
+"""
+Simulated FluidNC controller.
+
+Implements the BaseConnection interface without hardware so the motion path can be
+exercised and benchmarked offline. The simulator models the two buffers that matter
+for G-code streaming:
+
+- the serial RX buffer, which holds raw line bytes until the parser consumes them
+  (character-counting senders must never overflow it), and
+- the planner buffer, which holds parsed motion blocks waiting to be executed.
+
+A line is acknowledged with 'ok' once it has been moved from the RX buffer into the
+planner, exactly like GRBL. Blocks are executed with a trapezoidal velocity profile:
+each block accelerates towards its feed rate and leaves at the speed GRBL's planner
+would allow at the junction with the blocks queued behind it (junction deviation,
+then a backward pass so the machine can stop at the end of the queue). A sender
+that waits for every 'ok' therefore pays a full stop between segments while a
+streaming sender keeps the planner full and the machine at speed. Status reports
+interpolate the position linearly in time within a block.
+
+Responses reach the host after a latency with optional random jitter, in order.
+Select it with the port name "simulator" on /connect.
+"""
+import logging
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+
+from modules.connection.connection_manager import BaseConnection
+
+logger = logging.getLogger(__name__)
+
+# Real-time commands are acted on immediately and never enter the RX buffer
+REALTIME_COMMANDS = {'?', '!', '~', '\x18'}
+
+_WORD_RE = re.compile(r'([A-Z])(-?\d*\.?\d+)')
+
+# Gaps between blocks longer than this (in simulated seconds) are deliberate pauses, not starvation
+STARVATION_GAP_LIMIT = 0.5
+
+
+def junction_speed(previous_unit, next_unit, acceleration: float, deviation: float) -> float:
+    """Highest speed (mm/s) through the corner between two unit direction vectors, as in GRBL."""
+    cos_theta = -(previous_unit[0] * next_unit[0] + previous_unit[1] * next_unit[1])
+    if cos_theta > 0.999999:
+        return 0.0  # Full reversal
+    if cos_theta < -0.999999:
+        return math.inf  # Straight on
+    sin_theta_d2 = math.sqrt(0.5 * (1.0 - cos_theta))
+    return math.sqrt(acceleration * deviation * sin_theta_d2 / (1.0 - sin_theta_d2))
+
+
+def block_duration(distance: float, entry_speed: float, exit_speed: float,
+                   cruise_speed: float, acceleration: float) -> float:
+    """Seconds to cover distance (mm) with a trapezoidal (or triangular) velocity profile."""
+    if distance <= 0 or cruise_speed <= 0:
+        return 0.0
+    accelerate = (cruise_speed ** 2 - entry_speed ** 2) / (2 * acceleration)
+    decelerate = (cruise_speed ** 2 - exit_speed ** 2) / (2 * acceleration)
+    if accelerate + decelerate <= distance:
+        return ((cruise_speed - entry_speed) + (cruise_speed - exit_speed)) / acceleration \
+            + (distance - accelerate - decelerate) / cruise_speed
+    # Never reaches the feed rate
+    peak = math.sqrt((2 * acceleration * distance + entry_speed ** 2 + exit_speed ** 2) / 2)
+    return ((peak - entry_speed) + (peak - exit_speed)) / acceleration
+
+
+def _unit_vector(dx: float, dy: float):
+    length = math.hypot(dx, dy)
+    return (dx / length, dy / length) if length > 0 else None
+
+
+class SimulatedFluidNCConnection(BaseConnection):
+    """In-process stand-in for a FluidNC table speaking the GRBL serial protocol."""
+
+    def __init__(self, x_steps_per_mm: float = 256, y_steps_per_mm: float = 180,
+                 rx_buffer_size: int = 128, planner_blocks: int = 16,
+                 response_latency: float = 0.002, time_scale: float = 1.0,
+                 timeout: float = 2.0, latency_jitter: float = 0.0,
+                 acceleration: float = 100.0, junction_deviation: float = 0.01,
+                 seed=None):
+        """
+        Args:
+            x_steps_per_mm: Value reported for $100
+            y_steps_per_mm: Value reported for $101
+            rx_buffer_size: Serial RX buffer size in bytes
+            planner_blocks: Number of motion blocks the planner can hold
+            response_latency: Seconds between the controller producing a response and
+                              the host being able to read it (USB/serial round trip)
+            time_scale: Speed-up factor applied to all simulated durations
+            timeout: Default read timeout in seconds, like the serial connection
+            latency_jitter: Up to this many extra seconds of random latency per response
+            acceleration: mm/s^2 on both axes ($120/$121); 0 executes blocks at their
+                          feed rate from start to end
+            junction_deviation: mm ($11), how fast the machine may take corners
+            seed: Seed for the jitter, for reproducible runs
+        """
+        self.x_steps_per_mm = x_steps_per_mm
+        self.y_steps_per_mm = y_steps_per_mm
+        self.rx_buffer_size = rx_buffer_size
+        self.planner_blocks = planner_blocks
+        self.response_latency = response_latency
+        self.time_scale = time_scale
+        self.timeout = timeout
+        self.latency_jitter = latency_jitter
+        self.acceleration = acceleration
+        self.junction_deviation = junction_deviation
+        self._random = random.Random(seed)
+
+        self._cond = threading.Condition()
+        self._rx_lines = deque()  # Raw lines waiting to be parsed
+        self._rx_bytes = 0
+        self._partial = ""  # Bytes received without a terminating newline yet
+        self._planner = deque()  # Parsed blocks: (x, y, feed)
+        self._responses = deque()  # (available_at, line)
+        self._current_block = None  # (start_x, start_y, x, y, started_at, duration)
+        self._exit_speed = 0.0  # mm/s the current block ends with
+        self._feed_hold = False
+
+        self.machine_x = 0.0
+        self.machine_y = 0.0
+        self.feed_rate = 0.0
+
+        # Statistics for benchmarks
+        self.stats = {
+            "lines_received": 0,
+            "blocks_executed": 0,
+            "rx_overflows": 0,
+            "planner_starved_seconds": 0.0,
+        }
+        self._last_block_finished_at = None
+
+        self._running = True
+        self._thread = threading.Thread(target=self._controller_loop, daemon=True)
+        self._thread.start()
+        self._start_reader()
+        logger.info(f"Simulated FluidNC controller started (RX buffer {rx_buffer_size} bytes, "
+                    f"{planner_blocks} planner blocks, time scale {time_scale}x)")
+
+    ###########################################################################
+    # BaseConnection interface
+    ###########################################################################
+
+    def send(self, data: str) -> None:
+        with self._cond:
+            for char in data:
+                if char in REALTIME_COMMANDS:
+                    self._handle_realtime(char)
+                    continue
+                self._partial += char
+                if char == '\n':
+                    self._receive_line(self._partial)
+                    self._partial = ""
+            self._cond.notify_all()
+
+    def flush(self) -> None:
+        pass
+
+    def _read_line(self) -> str:
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self._responses and self._responses[0][0] <= now:
+                    return self._responses.popleft()[1]
+                if now >= deadline or not self._running:
+                    return ""
+                wait = deadline - now
+                if self._responses:
+                    wait = min(wait, self._responses[0][0] - now)
+                self._cond.wait(wait)
+
+    def is_connected(self) -> bool:
+        return self._running
+
+    def close(self) -> None:
+        self._stop_reader()
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+        self._join_reader()
+        logger.info("Simulated FluidNC controller stopped")
+
+    ###########################################################################
+    # Controller internals (all called with self._cond held)
+    ###########################################################################
+
+    def _respond(self, line: str):
+        latency = self.response_latency
+        if self.latency_jitter > 0:
+            latency += self._random.uniform(0, self.latency_jitter)
+        available_at = time.monotonic() + latency / self.time_scale
+        if self._responses:
+            # The serial line delivers in order, whatever the jitter
+            available_at = max(available_at, self._responses[-1][0])
+        self._responses.append((available_at, line))
+
+    def _receive_line(self, raw: str):
+        if self._rx_bytes + len(raw) > self.rx_buffer_size:
+            # A real controller silently loses bytes here; count it so senders can be checked
+            self.stats["rx_overflows"] += 1
+            logger.warning(f"Simulated RX buffer overflow ({self._rx_bytes + len(raw)} > {self.rx_buffer_size} bytes)")
+            return
+        self._rx_lines.append(raw)
+        self._rx_bytes += len(raw)
+        self.stats["lines_received"] += 1
+
+    def _handle_realtime(self, char: str):
+        if char == '?':
+            self._respond(self._status_report())
+        elif char == '!':
+            self._feed_hold = True
+        elif char == '~':
+            self._feed_hold = False
+        elif char == '\x18':
+            self._rx_lines.clear()
+            self._rx_bytes = 0
+            self._planner.clear()
+            self._current_block = None
+            self._exit_speed = 0.0
+            self._feed_hold = False
+
+    def _status_report(self) -> str:
+        x, y = self._position(time.monotonic())
+        if self._feed_hold:
+            machine_state = "Hold"
+        elif self._current_block or self._planner:
+            machine_state = "Run"
+        else:
+            machine_state = "Idle"
+        feed = self.feed_rate if machine_state == "Run" else 0
+        planner_free = self.planner_blocks - len(self._planner)
+        rx_free = self.rx_buffer_size - self._rx_bytes
+        return f"<{machine_state}|MPos:{x:.3f},{y:.3f},0.000|Bf:{planner_free},{rx_free}|FS:{feed:.0f},0>"
+
+    def _position(self, now: float):
+        if not self._current_block:
+            return self.machine_x, self.machine_y
+        start_x, start_y, x, y, started_at, duration = self._current_block
+        fraction = min(1.0, (now - started_at) / duration) if duration > 0 else 1.0
+        return start_x + (x - start_x) * fraction, start_y + (y - start_y) * fraction
+
+    def _parse_line(self, raw: str):
+        """Consume one line from the RX buffer. Returns False if the planner is full."""
+        line = raw.strip().upper()
+        is_motion = line.startswith('G0') or line.startswith('G1') or line.startswith('$J=')
+        if is_motion and len(self._planner) >= self.planner_blocks:
+            return False
+
+        self._rx_lines.popleft()
+        self._rx_bytes -= len(raw)
+
+        if line == '$$':
+            for setting in (f"$11={self.junction_deviation:.3f}", "$22=0",
+                            f"$100={self.x_steps_per_mm:.3f}", f"$101={self.y_steps_per_mm:.3f}",
+                            f"$120={self.acceleration:.3f}", f"$121={self.acceleration:.3f}"):
+                self._respond(setting)
+        elif line == '$H':
+            self._planner.clear()
+            self._current_block = None
+            self._exit_speed = 0.0
+            self.machine_x = 0.0
+            self.machine_y = 0.0
+            self._respond("[MSG:Homed:X]")
+            self._respond("[MSG:Homed:Y]")
+        elif is_motion:
+            self._queue_motion(line)
+
+        self._respond("ok")
+        return True
+
+    def _queue_motion(self, line: str):
+        words = dict(_WORD_RE.findall(line.replace(' ', '')))
+        # Target is relative to the end of the last queued block
+        if self._planner:
+            last_x, last_y, _ = self._planner[-1]
+        elif self._current_block:
+            last_x, last_y = self._current_block[2], self._current_block[3]
+        else:
+            last_x, last_y = self.machine_x, self.machine_y
+
+        if line.startswith('$J='):
+            x = last_x + float(words.get('X', 0))
+            y = last_y + float(words.get('Y', 0))
+        else:
+            x = float(words['X']) if 'X' in words else last_x
+            y = float(words['Y']) if 'Y' in words else last_y
+        feed = float(words.get('F', self.feed_rate or 600))
+        self._planner.append((x, y, feed))
+
+    def _start_next_block(self, started_at: float):
+        x, y, feed = self._planner.popleft()
+        stopped = True
+        if self._last_block_finished_at is not None:
+            # Time the machine sat still although more motion followed shortly after
+            gap = (started_at - self._last_block_finished_at) * self.time_scale
+            if 0 < gap < STARVATION_GAP_LIMIT:
+                self.stats["planner_starved_seconds"] += gap
+            stopped = gap > 0
+        distance = math.hypot(x - self.machine_x, y - self.machine_y)
+        if self.acceleration > 0:
+            entry_speed = 0.0 if stopped else self._exit_speed
+            exit_speed = self._plan_exit_speed(x, y, feed, distance, entry_speed)
+            seconds = block_duration(distance, entry_speed, exit_speed, feed / 60.0, self.acceleration)
+            self._exit_speed = exit_speed
+        else:
+            seconds = distance / feed * 60.0 if feed > 0 else 0.0
+        duration = seconds / self.time_scale
+        self.feed_rate = feed
+        self._current_block = (self.machine_x, self.machine_y, x, y, started_at, duration)
+
+    def _plan_exit_speed(self, x: float, y: float, feed: float, distance: float, entry_speed: float) -> float:
+        """
+        Speed (mm/s) the block ending at (x, y) can leave with: a backward pass over the
+        queued blocks, starting from a stop after the last one, as GRBL's planner does.
+        """
+        acceleration = self.acceleration
+        points = [(self.machine_x, self.machine_y), (x, y)] + [(bx, by) for bx, by, _ in self._planner]
+        feeds = [feed] + [block_feed for _, _, block_feed in self._planner]
+        units = [_unit_vector(points[i + 1][0] - points[i][0], points[i + 1][1] - points[i][1])
+                 for i in range(len(feeds))]
+
+        speed = 0.0  # Entry speed of the block after the one being planned
+        for i in range(len(feeds) - 1, 0, -1):
+            length = math.hypot(points[i + 1][0] - points[i][0], points[i + 1][1] - points[i][1])
+            limit = min(feeds[i] / 60.0, math.sqrt(speed ** 2 + 2 * acceleration * length))
+            if units[i - 1] and units[i]:
+                limit = min(limit, junction_speed(units[i - 1], units[i], acceleration, self.junction_deviation))
+            speed = limit
+
+        reachable = math.sqrt(entry_speed ** 2 + 2 * acceleration * distance)
+        return min(speed, reachable, feed / 60.0)
+
+    def _advance(self, now: float):
+        """Finish elapsed blocks, start queued ones and parse waiting lines."""
+        while True:
+            block_start = now
+            if self._current_block and not self._feed_hold:
+                _, _, x, y, started_at, duration = self._current_block
+                if now - started_at < duration:
+                    break
+                self.machine_x, self.machine_y = x, y
+                self._current_block = None
+                self.stats["blocks_executed"] += 1
+                self._last_block_finished_at = started_at + duration
+                if self._planner:
+                    # The next block was already planned, so it starts without a gap
+                    block_start = self._last_block_finished_at
+
+            while self._rx_lines and self._parse_line(self._rx_lines[0]):
+                pass
+
+            if self._current_block or not self._planner or self._feed_hold:
+                break
+            self._start_next_block(block_start)
+
+    def _controller_loop(self):
+        with self._cond:
+            while self._running:
+                now = time.monotonic()
+                self._advance(now)
+
+                wait = None
+                if self._current_block and not self._feed_hold:
+                    _, _, _, _, started_at, duration = self._current_block
+                    wait = max(0.0, started_at + duration - now)
+                if self._responses:
+                    response_wait = max(0.0, self._responses[0][0] - now)
+                    wait = response_wait if wait is None else min(wait, response_wait)
+                    # Wake readers once their response becomes available
+                    self._cond.notify_all()
+                self._cond.wait(wait if wait is not None else 0.5)
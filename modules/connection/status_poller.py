@@ -0,0 +1,236 @@
+"""
+Real-time status polling.
+
+StatusPoller sends the GRBL '?' real-time command (no newline, so it bypasses the
+RX buffer and is never acknowledged) at a fixed rate and parses every status
+report into a MachineStatus snapshot. Idle and position checks read the snapshot
+or wait for one that satisfies a condition instead of querying the controller
+themselves, so they never block on the serial port and never compete with the
+motion thread for it. A waiter that needs a report newer than the call makes the
+poller query right away instead of at the next tick.
+
+Every query is numbered. A fresh wait only accepts a report answering a query
+sent after the wait started: '?' is answered ahead of queued commands, so the
+reply to an earlier query can predate a move that was queued just before.
+"""
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Poll interval used when no interval getter is given
+DEFAULT_POLL_INTERVAL = 0.25
+
+
+@dataclass(frozen=True)
+class MachineStatus:
+    """One parsed status report, e.g. <Run|MPos:1.000,2.000,0.000|Bf:15,127|FS:600,0>."""
+    state: str  # Idle, Run, Hold, Jog, Alarm, Door, Check, Home, Sleep
+    machine_x: Optional[float]
+    machine_y: Optional[float]
+    feed: Optional[float]
+    planner_free: Optional[int]  # Free planner blocks (Bf)
+    rx_free: Optional[int]  # Free RX buffer bytes (Bf)
+    raw: str
+    seq: int  # Increases with every report
+    received_at: float  # time.monotonic()
+
+    @property
+    def is_idle(self) -> bool:
+        return self.state == "Idle"
+
+
+def parse_status_report(line: str, seq: int = 0, received_at: Optional[float] = None) -> Optional[MachineStatus]:
+    """Parse a '<...>' status report. Returns None if line isn't one."""
+    line = line.strip()
+    if not (line.startswith('<') and line.endswith('>')):
+        return None
+    fields = line[1:-1].split('|')
+    # Substates such as Hold:0 or Door:1 are reported after a colon
+    machine_state = fields[0].split(':', 1)[0]
+    machine_x = machine_y = feed = planner_free = rx_free = None
+    for field in fields[1:]:
+        name, _, value = field.partition(':')
+        try:
+            values = value.split(',')
+            if name == 'MPos':
+                machine_x, machine_y = float(values[0]), float(values[1])
+            elif name == 'FS' or name == 'F':
+                feed = float(values[0])
+            elif name == 'Bf':
+                planner_free, rx_free = int(values[0]), int(values[1])
+        except (ValueError, IndexError):
+            logger.debug(f"Ignoring malformed status field {field!r} in {line}")
+    return MachineStatus(
+        state=machine_state,
+        machine_x=machine_x,
+        machine_y=machine_y,
+        feed=feed,
+        planner_free=planner_free,
+        rx_free=rx_free,
+        raw=line,
+        seq=seq,
+        received_at=time.monotonic() if received_at is None else received_at
+    )
+
+
+class StatusPoller:
+    """Polls a connection for status reports and publishes the latest one."""
+
+    def __init__(self, conn, interval: Optional[Callable[[], float]] = None):
+        """
+        Args:
+            conn: BaseConnection with a running ControllerReader
+            interval: Returns the poll interval in seconds; read before every poll
+                      so setting changes apply immediately
+        """
+        self.conn = conn
+        self._interval = interval or (lambda: DEFAULT_POLL_INTERVAL)
+        self._cond = threading.Condition()
+        self._status = None
+        self._status_query = 0  # Number of the query _status answers
+        self._seq = 0
+        self._queries = 0  # Queries sent so far
+        self._async_waiters = []  # (predicate, min_query, loop, future, poll_interval)
+        self._poll_now = threading.Event()  # Set by waiters that need a fresh report
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="status-poller", daemon=True)
+        self._thread.start()
+
+    def _poll_interval(self) -> float:
+        try:
+            return max(0.02, float(self._interval()))
+        except Exception:
+            return DEFAULT_POLL_INTERVAL
+
+    def _run(self):
+        while self._running:
+            interval = self._poll_interval()
+            with self._cond:
+                requested = [waiter[4] for waiter in self._async_waiters if waiter[4]]
+                self._queries += 1
+                query = self._queries
+            if requested:
+                interval = min(interval, max(0.02, min(requested)))
+            started = time.monotonic()
+            try:
+                line = self.conn.query_status(timeout=max(interval, 1.0))
+            except Exception as e:
+                if self._running:
+                    logger.warning(f"Status polling stopped: {e}")
+                break
+            if line:
+                self._publish(line, query)
+            remaining = interval - (time.monotonic() - started)
+            if remaining > 0:
+                self._poll_now.wait(remaining)
+            self._poll_now.clear()
+        self._running = False
+        self._wake_all()
+
+    def _publish(self, line: str, query: int):
+        with self._cond:
+            status = parse_status_report(line, self._seq + 1)
+            if status is None:
+                return
+            self._seq = status.seq
+            self._status = status
+            self._status_query = query
+            self._cond.notify_all()
+            waiters = self._async_waiters
+            self._async_waiters = []
+        remaining = []
+        for waiter in waiters:
+            predicate, min_query, loop, future, _ = waiter
+            if query >= min_query and predicate(status):
+                loop.call_soon_threadsafe(_resolve, future, status)
+            elif not future.done():
+                remaining.append(waiter)
+        if remaining:
+            with self._cond:
+                self._async_waiters.extend(remaining)
+
+    def _wake_all(self):
+        with self._cond:
+            self._cond.notify_all()
+            waiters = self._async_waiters
+            self._async_waiters = []
+        for _, _, loop, future, _ in waiters:
+            loop.call_soon_threadsafe(_resolve, future, None)
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    @property
+    def snapshot(self) -> Optional[MachineStatus]:
+        """The latest status report, or None before the first one."""
+        with self._cond:
+            return self._status
+
+    def fresh_snapshot(self, max_age: float) -> Optional[MachineStatus]:
+        """The latest report if it is at most max_age seconds old, else wait for the next one."""
+        status = self.snapshot
+        if status and time.monotonic() - status.received_at <= max_age:
+            return status
+        return self.wait_for(lambda s: True, timeout=max(max_age, 1.0))
+
+    def wait_for(self, predicate: Callable[[MachineStatus], bool], timeout: Optional[float] = None,
+                 fresh: bool = True) -> Optional[MachineStatus]:
+        """
+        Block until a report satisfies predicate and return it, or None on timeout
+        or when polling stops. With fresh, only reports answering a query sent after
+        the call count, so they reflect every command sent before the call.
+        """
+        with self._cond:
+            min_query = self._queries + 1 if fresh else 0
+            self._poll_now.set()
+
+            def satisfied():
+                return (self._status is not None and self._status_query >= min_query
+                        and predicate(self._status))
+
+            found = self._cond.wait_for(lambda: not self._running or satisfied(), timeout)
+            if found and satisfied():
+                return self._status
+            return None
+
+    async def wait_for_async(self, predicate: Callable[[MachineStatus], bool], timeout: Optional[float] = None,
+                             fresh: bool = True, poll_interval: Optional[float] = None) -> Optional[MachineStatus]:
+        """
+        wait_for for the event loop: awaits a future resolved by the poller thread.
+        poll_interval polls faster than the configured interval while waiting.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._cond:
+            min_query = self._queries + 1 if fresh else 0
+            status = self._status
+            if not self._running:
+                return None
+            if not fresh and status is not None and predicate(status):
+                return status
+            self._async_waiters.append((predicate, min_query, loop, future, poll_interval))
+            self._poll_now.set()
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def stop(self):
+        self._running = False
+        self._poll_now.set()
+        self._wake_all()
+
+    def join(self, timeout: float = 1.0):
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+
+def _resolve(future, status):
+    if not future.done():
+        future.set_result(status)
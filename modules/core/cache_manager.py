@@ -1,10 +1,18 @@
 """Image Cache Manager for pre-generating and managing image previews."""
 import os
-import json
+import shutil
 import asyncio
+import hashlib
 import logging
+import threading
 from pathlib import Path
-from modules.core.pattern_manager import list_theta_rho_files, THETA_RHO_DIR, parse_theta_rho_file
+from modules.core.pattern_manager import list_theta_rho_files, pattern_library, THETA_RHO_DIR
+from modules.core.compiled_patterns import load_coordinates
+from modules.core.metadata_store import MetadataStore, MetadataCache
+from modules.core.execution_estimator import compute_geometry, execution_estimator
+from modules.core.pattern_stats import compute_pattern_stats
+from modules.core.metrics import metrics
+from modules.core.state import state
 
 logger = logging.getLogger(__name__)
 
@@ -20,10 +28,18 @@ cache_progress = {
 
 # Constants
 CACHE_DIR = os.path.join(THETA_RHO_DIR, "cached_images")
-METADATA_CACHE_FILE = "metadata_cache.json"  # Now in root directory
+# Previews keyed by the SHA-256 of the pattern file (<hash[:2]>/<hash>.webp). The
+# name-based files next to them are hard links kept for the touch app.
+CONTENT_CACHE_DIR = os.path.join(CACHE_DIR, "by_hash")
+HASH_CHUNK_SIZE = 1024 * 1024
+METADATA_DB_FILE = "metadata_cache.db"  # SQLite metadata store in root directory
+METADATA_CACHE_FILE = "metadata_cache.json"  # Legacy JSON cache, migrated into METADATA_DB_FILE once
 
 # Cache schema version - increment when structure changes
-CACHE_SCHEMA_VERSION = 1
+CACHE_SCHEMA_VERSION = 3
+# Schema version of the legacy JSON cache; its entries lack geometry and stats,
+# which are computed and stored on first use (get_pattern_geometry)
+LEGACY_CACHE_SCHEMA_VERSION = 1
 
 # Expected cache schema structure
 EXPECTED_CACHE_SCHEMA = {
@@ -33,13 +49,54 @@ EXPECTED_CACHE_SCHEMA = {
         'metadata': {
             'first_coordinate': {'x': 'number', 'y': 'number'},
             'last_coordinate': {'x': 'number', 'y': 'number'},
-            'total_coordinates': 'number'
+            'total_coordinates': 'number',
+            'geometry': {'table_type': 'string', 'path_length': 'number', 'short_segments': 'number'},
+            'stats': {
+                'theta_travel': 'number', 'rho_travel': 'number', 'min_rho': 'number',
+                'max_rho': 'number', 'revolutions': 'number', 'radial_histogram': 'list'
+            }
         }
     }
 }
 
+metadata_store = MetadataStore(METADATA_DB_FILE, CACHE_SCHEMA_VERSION)
+# Reads are served from memory; writes go through to the store
+metadata_cache = MetadataCache(metadata_store)
+
+metrics.counter('dune_weaver_metadata_cache_hits_total', 'Metadata cache reads served from memory',
+                function=lambda: metadata_cache.hits)
+metrics.counter('dune_weaver_metadata_cache_reloads_total', 'Metadata cache reloads from the database',
+                function=lambda: metadata_cache.misses)
+_METADATA_LOOKUPS = metrics.counter('dune_weaver_pattern_metadata_lookups_total',
+                                    'Pattern metadata lookups: hit, stale (file changed) or miss', ['result'])
+_METADATA_HIT = _METADATA_LOOKUPS.labels('hit')
+_METADATA_STALE = _METADATA_LOOKUPS.labels('stale')
+_METADATA_MISS = _METADATA_LOOKUPS.labels('miss')
+_PREVIEW_LOOKUPS = metrics.counter('dune_weaver_preview_cache_lookups_total',
+                                   'Preview image lookups: hit (cached) or miss (rendered)', ['result'])
+_migration_lock = threading.Lock()
+_migration_done = False
+
+def get_metadata_cache():
+    """Get the in-memory metadata cache, importing the legacy JSON cache on first use."""
+    global _migration_done
+    if not _migration_done:
+        with _migration_lock:
+            if not _migration_done:
+                metadata_cache.migrate_from_json(METADATA_CACHE_FILE, validate_cache_schema)
+                _migration_done = True
+    return metadata_cache
+
+def get_metadata_cache_stats():
+    """Get hit/miss counters of the in-memory metadata cache."""
+    return get_metadata_cache().stats()
+
 def validate_cache_schema(cache_data):
-    """Validate that cache data matches the expected schema structure."""
+    """Validate that cache data matches the expected schema structure.
+
+    Any version from LEGACY_CACHE_SCHEMA_VERSION to CACHE_SCHEMA_VERSION is
+    accepted: later versions only added optional fields.
+    """
     try:
         # Check if version info exists
         if not isinstance(cache_data, dict):
@@ -51,9 +108,9 @@ def validate_cache_schema(cache_data):
             logger.info("Cache file missing version info - treating as outdated schema")
             return False
         
-        # Check if version matches current expected version
-        if cache_version != CACHE_SCHEMA_VERSION:
-            logger.info(f"Cache schema version mismatch: found {cache_version}, expected {CACHE_SCHEMA_VERSION}")
+        # Check if version is one whose entries can be read
+        if not isinstance(cache_version, int) or not LEGACY_CACHE_SCHEMA_VERSION <= cache_version <= CACHE_SCHEMA_VERSION:
+            logger.info(f"Cache schema version mismatch: found {cache_version}, expected {LEGACY_CACHE_SCHEMA_VERSION} to {CACHE_SCHEMA_VERSION}")
             return False
         
         # Check if data section exists
@@ -86,12 +143,11 @@ def validate_cache_schema(cache_data):
         return False
 
 def invalidate_cache():
-    """Delete only the metadata cache file, preserving image cache."""
+    """Delete only the metadata cache, preserving image cache."""
     try:
-        # Delete metadata cache file only
-        if os.path.exists(METADATA_CACHE_FILE):
-            os.remove(METADATA_CACHE_FILE)
-            logger.info("Deleted outdated metadata cache file")
+        # Clear metadata entries only
+        get_metadata_cache().clear()
+        logger.info("Cleared metadata cache")
         
         # Keep image cache directory intact - images are still valid
         # Just ensure the cache directory structure exists
@@ -103,12 +159,11 @@ def invalidate_cache():
         return False
 
 async def invalidate_cache_async():
-    """Async version: Delete only the metadata cache file, preserving image cache."""
+    """Async version: Delete only the metadata cache, preserving image cache."""
     try:
-        # Delete metadata cache file only
-        if await asyncio.to_thread(os.path.exists, METADATA_CACHE_FILE):
-            await asyncio.to_thread(os.remove, METADATA_CACHE_FILE)
-            logger.info("Deleted outdated metadata cache file")
+        # Clear metadata entries only
+        await asyncio.to_thread(lambda: get_metadata_cache().clear())
+        logger.info("Cleared metadata cache")
         
         # Keep image cache directory intact - images are still valid
         # Just ensure the cache directory structure exists
@@ -124,18 +179,8 @@ def ensure_cache_dir():
     try:
         Path(CACHE_DIR).mkdir(parents=True, exist_ok=True)
         
-        # Initialize metadata cache if it doesn't exist
-        if not os.path.exists(METADATA_CACHE_FILE):
-            initial_cache = {
-                'version': CACHE_SCHEMA_VERSION,
-                'data': {}
-            }
-            with open(METADATA_CACHE_FILE, 'w') as f:
-                json.dump(initial_cache, f)
-            try:
-                os.chmod(METADATA_CACHE_FILE, 0o644)  # More conservative permissions
-            except (OSError, PermissionError) as e:
-                logger.debug(f"Could not set metadata cache file permissions: {str(e)}")
+        # Initialize metadata store (creates the database on first use)
+        get_metadata_cache()
         
         for root, dirs, files in os.walk(CACHE_DIR):
             try:
@@ -160,21 +205,8 @@ async def ensure_cache_dir_async():
     try:
         await asyncio.to_thread(Path(CACHE_DIR).mkdir, parents=True, exist_ok=True)
         
-        # Initialize metadata cache if it doesn't exist
-        if not await asyncio.to_thread(os.path.exists, METADATA_CACHE_FILE):
-            initial_cache = {
-                'version': CACHE_SCHEMA_VERSION,
-                'data': {}
-            }
-            def _write_initial_cache():
-                with open(METADATA_CACHE_FILE, 'w') as f:
-                    json.dump(initial_cache, f)
-            
-            await asyncio.to_thread(_write_initial_cache)
-            try:
-                await asyncio.to_thread(os.chmod, METADATA_CACHE_FILE, 0o644)
-            except (OSError, PermissionError) as e:
-                logger.debug(f"Could not set metadata cache file permissions: {str(e)}")
+        # Initialize metadata store (creates the database on first use)
+        await asyncio.to_thread(get_metadata_cache)
         
         def _set_permissions():
             for root, dirs, files in os.walk(CACHE_DIR):
@@ -195,51 +227,164 @@ async def ensure_cache_dir_async():
     except Exception as e:
         logger.error(f"Failed to create cache directory: {str(e)}")
 
-def get_cache_path(pattern_file):
-    """Get the cache path for a pattern file."""
+def _make_cache_subdir(cache_dir):
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        os.chmod(cache_dir, 0o755)  # More conservative permissions
+    except (OSError, PermissionError) as e:
+        # Log as debug instead of error since this is not critical
+        logger.debug(f"Could not set permissions for cache subdirectory {cache_dir}: {str(e)}")
+
+def _legacy_cache_path(pattern_file):
+    """Name-based preview path (cached_images/<folder>/<name>.webp) used before content hashing."""
     # Normalize path separators to handle both forward slashes and backslashes
     pattern_file = pattern_file.replace('\\', '/')
     
-    # Create subdirectories in cache to match the pattern file structure
+    # Same subdirectory structure as the pattern file (including custom_patterns)
     cache_subpath = os.path.dirname(pattern_file)
     if cache_subpath:
-        # Create the same subdirectory structure in cache (including custom_patterns)
         # Convert forward slashes back to platform-specific separator for os.path.join
-        cache_subpath = cache_subpath.replace('/', os.sep)
-        cache_dir = os.path.join(CACHE_DIR, cache_subpath)
+        cache_dir = os.path.join(CACHE_DIR, cache_subpath.replace('/', os.sep))
     else:
         # For files in root pattern directory
         cache_dir = CACHE_DIR
     
-    # Ensure the subdirectory exists
-    os.makedirs(cache_dir, exist_ok=True)
-    try:
-        os.chmod(cache_dir, 0o755)  # More conservative permissions
-    except (OSError, PermissionError) as e:
-        # Log as debug instead of error since this is not critical
-        logger.debug(f"Could not set permissions for cache subdirectory {cache_dir}: {str(e)}")
-    
     # Use just the filename part for the cache file
     filename = os.path.basename(pattern_file)
     safe_name = filename.replace('\\', '_')
     return os.path.join(cache_dir, f"{safe_name}.webp")
 
+def get_content_cache_path(content_hash):
+    """Get the preview path for a content hash."""
+    cache_dir = os.path.join(CONTENT_CACHE_DIR, content_hash[:2])
+    _make_cache_subdir(cache_dir)
+    return os.path.join(cache_dir, f"{content_hash}.webp")
+
+def _hash_file(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def _link_preview(source, alias):
+    """Point alias at the same file as source, replacing whatever was there."""
+    _make_cache_subdir(os.path.dirname(alias))
+    temp_path = f"{alias}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        # Filesystem without hard links
+        shutil.copyfile(source, temp_path)
+    replaced = os.path.exists(alias)
+    os.replace(temp_path, alias)
+    if replaced:
+        # PNG the touch app converted from the previous image
+        _remove_file(os.path.splitext(alias)[0] + '.png')
+
+def _remove_preview_alias(pattern_file):
+    alias = _legacy_cache_path(pattern_file)
+    _remove_file(alias)
+    _remove_file(os.path.splitext(alias)[0] + '.png')
+
+def _sync_preview_aliases(content_hash):
+    """Link the name-based path of every pattern with this hash to its preview."""
+    preview_path = get_content_cache_path(content_hash)
+    if not os.path.exists(preview_path):
+        return
+    for pattern_file in get_metadata_cache().paths_with_hash(content_hash):
+        alias = _legacy_cache_path(pattern_file)
+        try:
+            if not (os.path.exists(alias) and os.path.samefile(alias, preview_path)):
+                _link_preview(preview_path, alias)
+        except OSError as e:
+            logger.debug(f"Could not link preview for {pattern_file}: {str(e)}")
+
+def _release_preview(content_hash):
+    """Delete the preview of a content hash once no pattern has that content any more."""
+    if get_metadata_cache().paths_with_hash(content_hash):
+        return
+    if _remove_file(get_content_cache_path(content_hash)):
+        logger.info(f"Deleted unreferenced preview {content_hash}")
+
+def _adopt_legacy_preview(pattern_file, content_hash, pattern_mtime):
+    """Reuse a name-based preview that is newer than the pattern instead of rendering it again."""
+    preview_path = get_content_cache_path(content_hash)
+    alias = _legacy_cache_path(pattern_file)
+    try:
+        if not os.path.exists(preview_path) and os.path.getmtime(alias) >= pattern_mtime:
+            _link_preview(alias, preview_path)
+            logger.debug(f"Adopted existing preview of {pattern_file}")
+    except OSError:
+        pass
+
+def get_content_hash(pattern_file):
+    """Get the SHA-256 of a pattern file, recomputed only when its mtime or size changed.
+
+    Raises OSError if the pattern file can't be read.
+    """
+    pattern_path = os.path.join(THETA_RHO_DIR, pattern_file)
+    stat = os.stat(pattern_path)
+    cache = get_metadata_cache()
+    cached = cache.get_content_hash(pattern_file)
+    if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+        return cached[2]
+    
+    content_hash = _hash_file(pattern_path)
+    cache.set_content_hash(pattern_file, stat.st_mtime, stat.st_size, content_hash)
+    if cached is None or cached[2] != content_hash:
+        if cached:
+            # The pattern was replaced: its old image is stale
+            logger.debug(f"Content of {pattern_file} changed")
+            _remove_preview_alias(pattern_file)
+            _release_preview(cached[2])
+        _adopt_legacy_preview(pattern_file, content_hash, stat.st_mtime)
+        _sync_preview_aliases(content_hash)
+    return content_hash
+
+async def get_content_hash_async(pattern_file):
+    """Async version: Get the SHA-256 of a pattern file."""
+    return await asyncio.to_thread(get_content_hash, pattern_file)
+
+def get_cache_path(pattern_file):
+    """Get the cache path for a pattern file.
+
+    Previews are keyed by the pattern's content hash, so identical patterns share
+    one image and a replaced pattern gets a new one. Falls back to the name-based
+    path if the pattern file can't be read.
+    """
+    try:
+        content_hash = get_content_hash(pattern_file)
+    except OSError:
+        return _legacy_cache_path(pattern_file)
+    return get_content_cache_path(content_hash)
+
 def delete_pattern_cache(pattern_file):
     """Delete cached preview image and metadata for a pattern file."""
     try:
-        # Remove cached image
-        cache_path = get_cache_path(pattern_file)
-        if os.path.exists(cache_path):
-            os.remove(cache_path)
-            logger.info(f"Deleted cached image: {cache_path}")
-        
+        cache = get_metadata_cache()
+        
+        # Remove cached image; a preview shared with an identical pattern is kept
+        cached_hash = cache.get_content_hash(pattern_file)
+        cache.delete_content_hash(pattern_file)
+        if _remove_file(_legacy_cache_path(pattern_file)):
+            logger.info(f"Deleted cached image for {pattern_file}")
+        if cached_hash:
+            _release_preview(cached_hash[2])
+        
+        # Remove compiled coordinates
+        from modules.core.compiled_patterns import delete_compiled
+        delete_compiled(os.path.join(THETA_RHO_DIR, pattern_file))
+
         # Remove from metadata cache
-        metadata_cache = load_metadata_cache()
-        data_section = metadata_cache.get('data', {})
-        if pattern_file in data_section:
-            del data_section[pattern_file]
-            metadata_cache['data'] = data_section
-            save_metadata_cache(metadata_cache)
+        if cache.delete(pattern_file):
             logger.info(f"Removed {pattern_file} from metadata cache")
         
         return True
@@ -248,29 +393,14 @@ def delete_pattern_cache(pattern_file):
         return False
 
 def load_metadata_cache():
-    """Load the metadata cache from disk with schema validation."""
+    """Load the whole metadata cache in the legacy {'version', 'data'} layout."""
     try:
-        if os.path.exists(METADATA_CACHE_FILE):
-            with open(METADATA_CACHE_FILE, 'r') as f:
-                cache_data = json.load(f)
-            
-            # Validate schema
-            if not validate_cache_schema(cache_data):
-                logger.info("Cache schema validation failed - invalidating cache")
-                invalidate_cache()
-                # Return empty cache structure after invalidation
-                return {
-                    'version': CACHE_SCHEMA_VERSION,
-                    'data': {}
-                }
-            
-            return cache_data
+        return {
+            'version': CACHE_SCHEMA_VERSION,
+            'data': get_metadata_cache().get_all()
+        }
     except Exception as e:
-        logger.warning(f"Failed to load metadata cache: {str(e)} - invalidating cache")
-        try:
-            invalidate_cache()
-        except Exception as invalidate_error:
-            logger.error(f"Failed to invalidate corrupted cache: {str(invalidate_error)}")
+        logger.warning(f"Failed to load metadata cache: {str(e)}")
     
     # Return empty cache structure
     return {
@@ -279,124 +409,187 @@ def load_metadata_cache():
     }
 
 async def load_metadata_cache_async():
-    """Async version: Load the metadata cache from disk with schema validation."""
-    try:
-        if await asyncio.to_thread(os.path.exists, METADATA_CACHE_FILE):
-            def _load_json():
-                with open(METADATA_CACHE_FILE, 'r') as f:
-                    return json.load(f)
-            
-            cache_data = await asyncio.to_thread(_load_json)
-            
-            # Validate schema
-            if not validate_cache_schema(cache_data):
-                logger.info("Cache schema validation failed - invalidating cache")
-                await invalidate_cache_async()
-                # Return empty cache structure after invalidation
-                return {
-                    'version': CACHE_SCHEMA_VERSION,
-                    'data': {}
-                }
-            
-            return cache_data
-    except Exception as e:
-        logger.warning(f"Failed to load metadata cache: {str(e)} - invalidating cache")
-        try:
-            await invalidate_cache_async()
-        except Exception as invalidate_error:
-            logger.error(f"Failed to invalidate corrupted cache: {str(invalidate_error)}")
-    
-    # Return empty cache structure
-    return {
-        'version': CACHE_SCHEMA_VERSION,
-        'data': {}
-    }
+    """Async version: Load the whole metadata cache in the legacy {'version', 'data'} layout."""
+    return await asyncio.to_thread(load_metadata_cache)
 
 def save_metadata_cache(cache_data):
-    """Save the metadata cache to disk with version info."""
+    """Replace the whole metadata cache. Prefer cache_pattern_metadata for single patterns."""
     try:
-        ensure_cache_dir()
-        
-        # Ensure cache data has proper structure
-        if not isinstance(cache_data, dict) or 'version' not in cache_data:
-            # Convert old format or create new structure
-            if isinstance(cache_data, dict) and 'data' not in cache_data:
-                # Old format - wrap existing data
-                structured_cache = {
-                    'version': CACHE_SCHEMA_VERSION,
-                    'data': cache_data
-                }
-            else:
-                structured_cache = cache_data
+        # Accept both the versioned layout and a bare {path: entry} dict
+        if isinstance(cache_data, dict) and 'data' in cache_data:
+            data_section = cache_data['data']
         else:
-            structured_cache = cache_data
-        
-        with open(METADATA_CACHE_FILE, 'w') as f:
-            json.dump(structured_cache, f, indent=2)
+            data_section = cache_data
+        get_metadata_cache().upsert_many(data_section, replace_all=True)
     except Exception as e:
         logger.error(f"Failed to save metadata cache: {str(e)}")
 
 def get_pattern_metadata(pattern_file):
     """Get cached metadata for a pattern file."""
-    cache_data = load_metadata_cache()
-    data_section = cache_data.get('data', {})
+    try:
+        cached_entry = get_metadata_cache().get(pattern_file)
+    except Exception as e:
+        logger.warning(f"Failed to read metadata for {pattern_file}: {str(e)}")
+        return None
     
     # Check if we have cached metadata and if the file hasn't changed
-    if pattern_file in data_section:
-        cached_entry = data_section[pattern_file]
+    if cached_entry:
         pattern_path = os.path.join(THETA_RHO_DIR, pattern_file)
         
         try:
             file_mtime = os.path.getmtime(pattern_path)
             if cached_entry.get('mtime') == file_mtime:
+                _METADATA_HIT.inc()
                 return cached_entry.get('metadata')
         except OSError:
             pass
+        _METADATA_STALE.inc()
+        return None
     
+    _METADATA_MISS.inc()
     return None
 
 async def get_pattern_metadata_async(pattern_file):
     """Async version: Get cached metadata for a pattern file."""
-    cache_data = await load_metadata_cache_async()
-    data_section = cache_data.get('data', {})
-    
-    # Check if we have cached metadata and if the file hasn't changed
-    if pattern_file in data_section:
-        cached_entry = data_section[pattern_file]
-        pattern_path = os.path.join(THETA_RHO_DIR, pattern_file)
-        
-        try:
-            file_mtime = await asyncio.to_thread(os.path.getmtime, pattern_path)
-            if cached_entry.get('mtime') == file_mtime:
-                return cached_entry.get('metadata')
-        except OSError:
-            pass
-    
-    return None
+    return await asyncio.to_thread(get_pattern_metadata, pattern_file)
 
-def cache_pattern_metadata(pattern_file, first_coord, last_coord, total_coords):
-    """Cache metadata for a pattern file."""
+def cache_pattern_metadata(pattern_file, first_coord, last_coord, total_coords, geometry=None, stats=None):
+    """Cache metadata for a pattern file.
+
+    geometry: execution_estimator.compute_geometry result for the current table type.
+    stats: pattern_stats.compute_pattern_stats result.
+    """
     try:
-        cache_data = load_metadata_cache()
-        data_section = cache_data.get('data', {})
         pattern_path = os.path.join(THETA_RHO_DIR, pattern_file)
         file_mtime = os.path.getmtime(pattern_path)
         
-        data_section[pattern_file] = {
-            'mtime': file_mtime,
-            'metadata': {
-                'first_coordinate': first_coord,
-                'last_coordinate': last_coord,
-                'total_coordinates': total_coords
-            }
+        metadata = {
+            'first_coordinate': first_coord,
+            'last_coordinate': last_coord,
+            'total_coordinates': total_coords
         }
-        
-        cache_data['data'] = data_section
-        save_metadata_cache(cache_data)
+        if geometry:
+            metadata['geometry'] = geometry
+        if stats:
+            metadata['stats'] = stats
+        get_metadata_cache().upsert(pattern_file, {
+            'mtime': file_mtime,
+            'metadata': metadata
+        })
         logger.debug(f"Cached metadata for {pattern_file}")
     except Exception as e:
         logger.warning(f"Failed to cache metadata for {pattern_file}: {str(e)}")
 
+def get_metadata_summaries():
+    """Get {path: (mtime, total_coordinates, geometry)} for every cached pattern."""
+    return get_metadata_cache().list_summaries()
+
+def _metadata_from_coordinates(coordinates):
+    """First/last coordinate, count, geometry and stats, as stored by cache_pattern_metadata."""
+    first_coord = {"x": coordinates[0][0], "y": coordinates[0][1]}
+    last_coord = {"x": coordinates[-1][0], "y": coordinates[-1][1]}
+    return (first_coord, last_coord, len(coordinates), compute_geometry(coordinates, state.table_type),
+            compute_pattern_stats(coordinates))
+
+def get_pattern_geometry(pattern_file, table_type=None):
+    """Get the geometry of a pattern for a table type (default: the current one).
+
+    Served from the metadata cache; computed and cached if missing, stale or for
+    another table type. Returns None if the pattern can't be read.
+    """
+    table_type = table_type or state.table_type or 'dune_weaver'
+    metadata = get_pattern_metadata(pattern_file)
+    geometry = metadata.get('geometry') if metadata else None
+    if geometry and geometry.get('table_type') == table_type:
+        return geometry
+    
+    coordinates = load_coordinates(os.path.join(THETA_RHO_DIR, pattern_file))
+    if not coordinates:
+        return None
+    geometry = compute_geometry(coordinates, table_type)
+    if table_type == (state.table_type or 'dune_weaver'):
+        first_coord, last_coord, total_coords, _, stats = _metadata_from_coordinates(coordinates)
+        cache_pattern_metadata(pattern_file, first_coord, last_coord, total_coords, geometry, stats)
+    return geometry
+
+def _logged_pattern_geometry_lookup():
+    """geometry_lookup for execution_estimator.load: finds logged patterns by file name."""
+    by_name = {}
+    for pattern_file in list_theta_rho_files():
+        by_name.setdefault(os.path.basename(pattern_file), pattern_file)
+    
+    def lookup(pattern_name, table_type):
+        pattern_file = by_name.get(pattern_name)
+        if not pattern_file or not table_type or table_type == 'unknown':
+            return None
+        return get_pattern_geometry(pattern_file, table_type)
+    return lookup
+
+def get_execution_estimator():
+    """Get the execution time estimator, training it on the execution log on first use."""
+    if not execution_estimator.loaded:
+        from modules.core.pattern_manager import EXECUTION_LOG_FILE
+        execution_estimator.load(EXECUTION_LOG_FILE, _logged_pattern_geometry_lookup())
+    return execution_estimator
+
+def get_pattern_speed(pattern_file):
+    """Speed a pattern runs at: the clear pattern speed for clear patterns, else the table speed."""
+    from modules.core.pattern_manager import is_clear_pattern
+    if state.clear_pattern_speed is not None and is_clear_pattern(os.path.join(THETA_RHO_DIR, pattern_file)):
+        return state.clear_pattern_speed
+    return state.speed
+
+def estimate_pattern_seconds(pattern_file, speed=None):
+    """Predicted run time of a pattern in seconds at the given (default: its usual) speed, or None."""
+    geometry = get_pattern_geometry(pattern_file)
+    if geometry is None:
+        return None
+    return get_execution_estimator().predict(geometry, speed or get_pattern_speed(pattern_file))
+
+def estimate_playlist_seconds(pattern_files, clear_pattern=None, pause_time=0):
+    """Predicted run time of a playlist, including clear patterns and pauses between patterns.
+
+    Random clear patterns are counted at the average of the possible ones.
+    Returns {'total_seconds', 'patterns': [{'file', 'seconds'}], 'unknown': [files]}.
+    """
+    from modules.core.pattern_manager import get_clear_pattern_file
+    estimates = {}
+
+    def estimate(pattern_file):
+        if pattern_file not in estimates:
+            try:
+                estimates[pattern_file] = estimate_pattern_seconds(pattern_file)
+            except Exception as e:
+                logger.debug(f"No estimate for {pattern_file}: {e}")
+                estimates[pattern_file] = None
+        return estimates[pattern_file]
+
+    def clear_seconds(pattern_file):
+        modes = ['clear_from_out', 'clear_from_in', 'clear_sideway'] if clear_pattern == 'random' else [clear_pattern]
+        seconds = []
+        for mode in modes:
+            clear_file = get_clear_pattern_file(mode, os.path.join(THETA_RHO_DIR, pattern_file))
+            if clear_file:
+                clear_estimate = estimate(os.path.relpath(clear_file, THETA_RHO_DIR).replace(os.sep, '/'))
+                if clear_estimate is not None:
+                    seconds.append(clear_estimate)
+        return sum(seconds) / len(seconds) if seconds else 0.0
+
+    total = 0.0
+    patterns = []
+    unknown = []
+    for pattern_file in pattern_files:
+        seconds = estimate(pattern_file)
+        if seconds is None:
+            unknown.append(pattern_file)
+            continue
+        if clear_pattern and clear_pattern != 'none':
+            seconds += clear_seconds(pattern_file)
+        patterns.append({'file': pattern_file, 'seconds': round(seconds, 1)})
+        total += seconds
+    total += max(0, len(pattern_files) - 1) * (pause_time or 0)
+    return {'total_seconds': round(total, 1), 'patterns': patterns, 'unknown': unknown}
+
 def needs_cache(pattern_file):
     """Check if a pattern file needs its cache generated."""
     # Check if image preview exists
@@ -423,7 +616,7 @@ def needs_image_cache_only(pattern_file):
 async def needs_cache_async(pattern_file):
     """Async version: Check if a pattern file needs its cache generated."""
     # Check if image preview exists
-    cache_path = get_cache_path(pattern_file)
+    cache_path = await asyncio.to_thread(get_cache_path, pattern_file)
     if not await asyncio.to_thread(os.path.exists, cache_path):
         return True
         
@@ -434,10 +627,12 @@ async def needs_cache_async(pattern_file):
         
     return False
 
-async def generate_image_preview(pattern_file):
-    """Generate image preview for a single pattern file."""
+async def generate_image_preview(pattern_file, priority=None):
+    """Generate image preview for a single pattern file.
+
+    priority: preview_renderer priority; None renders ahead of background backfill.
+    """
     from modules.core.preview import generate_preview_image
-    from modules.core.pattern_manager import parse_theta_rho_file
     
     try:
         logger.debug(f"Starting preview generation for {pattern_file}")
@@ -450,15 +645,14 @@ async def generate_image_preview(pattern_file):
             pattern_path = os.path.join(THETA_RHO_DIR, pattern_file)
             
             try:
-                coordinates = await asyncio.to_thread(parse_theta_rho_file, pattern_path)
+                # Compiling here lets the preview below reuse the sidecar
+                coordinates = await asyncio.to_thread(load_coordinates, pattern_path)
                 
                 if coordinates:
-                    first_coord = {"x": coordinates[0][0], "y": coordinates[0][1]}
-                    last_coord = {"x": coordinates[-1][0], "y": coordinates[-1][1]}
-                    total_coords = len(coordinates)
+                    first_coord, last_coord, total_coords, geometry, stats = await asyncio.to_thread(_metadata_from_coordinates, coordinates)
                     
                     # Cache the metadata for future use
-                    cache_pattern_metadata(pattern_file, first_coord, last_coord, total_coords)
+                    cache_pattern_metadata(pattern_file, first_coord, last_coord, total_coords, geometry, stats)
                     logger.debug(f"Metadata cached for {pattern_file}: {total_coords} coordinates")
                 else:
                     logger.warning(f"No coordinates found in {pattern_file}")
@@ -466,15 +660,17 @@ async def generate_image_preview(pattern_file):
                 logger.error(f"Failed to parse {pattern_file} for metadata: {str(e)}")
                 # Continue with image generation even if metadata fails
         
-        # Check if we need to generate the image
-        cache_path = get_cache_path(pattern_file)
+        # Check if we need to generate the image (hashing a new pattern reads the whole file)
+        cache_path = await asyncio.to_thread(get_cache_path, pattern_file)
         if os.path.exists(cache_path):
             logger.debug(f"Skipping image generation for {pattern_file} - already cached")
+            _PREVIEW_LOOKUPS.labels('hit').inc()
             return True
+        _PREVIEW_LOOKUPS.labels('miss').inc()
             
         # Generate the image
         logger.debug(f"Generating image preview for {pattern_file}")
-        image_content = await generate_preview_image(pattern_file)
+        image_content = await generate_preview_image(pattern_file, priority=priority)
         
         if not image_content:
             logger.error(f"Generated image content is empty for {pattern_file}")
@@ -483,14 +679,23 @@ async def generate_image_preview(pattern_file):
         # Ensure cache directory exists
         ensure_cache_dir()
         
-        with open(cache_path, 'wb') as f:
+        # Write beside the final path and rename, so a preview is never served half-written
+        temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
             f.write(image_content)
         
         try:
-            os.chmod(cache_path, 0o644)  # More conservative permissions
+            os.chmod(temp_path, 0o644)  # More conservative permissions
         except (OSError, PermissionError) as e:
             # Log as debug instead of error since this is not critical
             logger.debug(f"Could not set cache file permissions for {pattern_file}: {str(e)}")
+        os.replace(temp_path, cache_path)
+        
+        # Name-based links for this and any identical pattern
+        try:
+            await asyncio.to_thread(lambda: _sync_preview_aliases(get_content_hash(pattern_file)))
+        except OSError as e:
+            logger.debug(f"Could not link preview for {pattern_file}: {str(e)}")
         
         logger.debug(f"Successfully generated preview for {pattern_file}")
         return True
@@ -544,22 +749,7 @@ async def generate_all_image_previews():
         
         logger.info(f"Generating image cache for {total_files} uncached .thr patterns ({skipped_files} already cached)...")
         
-        batch_size = 5
-        successful = 0
-        for i in range(0, total_files, batch_size):
-            batch = patterns_to_cache[i:i + batch_size]
-            tasks = [generate_image_preview(file) for file in batch]
-            results = await asyncio.gather(*tasks)
-            successful += sum(1 for r in results if r)
-            
-            # Update progress
-            cache_progress["processed_files"] = min(i + batch_size, total_files)
-            if i < total_files:
-                cache_progress["current_file"] = patterns_to_cache[min(i + batch_size - 1, total_files - 1)]
-            
-            # Log progress
-            progress = min(i + batch_size, total_files)
-            logger.info(f"Image cache generation progress: {progress}/{total_files} files processed")
+        successful = await _generate_previews_in_background(patterns_to_cache, "Image cache generation", track_progress=True)
         
         logger.info(f"Image cache generation completed: {successful}/{total_files} patterns cached successfully, {skipped_files} patterns skipped (already cached)")
         
@@ -568,6 +758,41 @@ async def generate_all_image_previews():
         cache_progress["error"] = str(e)
         raise
 
+async def _generate_previews_in_background(pattern_files, description, track_progress=False):
+    """Queue previews at backfill priority and wait for them. Returns the number generated.
+
+    All patterns are queued at once; the preview renderer bounds concurrency and
+    renders on-demand previews ahead of them.
+    """
+    from modules.core.preview_renderer import PRIORITY_BACKFILL
+
+    async def _generate(file):
+        return file, await generate_image_preview(file, priority=PRIORITY_BACKFILL)
+
+    total_files = len(pattern_files)
+    tasks = [asyncio.ensure_future(_generate(file)) for file in pattern_files]
+    successful = 0
+    processed = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            file, result = await next_done
+            if result:
+                successful += 1
+            processed += 1
+            
+            # Update progress
+            if track_progress:
+                cache_progress["processed_files"] = processed
+                cache_progress["current_file"] = file
+            
+            # Log progress every 10 files
+            if processed % 10 == 0 or processed == total_files:
+                logger.info(f"{description} progress: {processed}/{total_files} files processed")
+    finally:
+        for task in tasks:
+            task.cancel()
+    return successful
+
 async def generate_metadata_cache():
     """Generate metadata cache for missing patterns using set difference."""
     global cache_progress
@@ -583,8 +808,7 @@ async def generate_metadata_cache():
             return
         
         # Step 2: Get existing metadata keys
-        metadata_cache = await load_metadata_cache_async()
-        existing_keys = set(metadata_cache.get('data', {}).keys())
+        existing_keys = await asyncio.to_thread(lambda: get_metadata_cache().paths())
         
         # Step 3: Calculate delta (patterns missing from metadata)
         pattern_set = set(pattern_files)
@@ -620,15 +844,13 @@ async def generate_metadata_cache():
                 cache_progress["current_file"] = file_name
                 
                 try:
-                    # Parse file to get metadata
-                    coordinates = await asyncio.to_thread(parse_theta_rho_file, pattern_path)
+                    # Compile the pattern and read its metadata from the sidecar
+                    coordinates = await asyncio.to_thread(load_coordinates, pattern_path)
                     if coordinates:
-                        first_coord = {"x": coordinates[0][0], "y": coordinates[0][1]}
-                        last_coord = {"x": coordinates[-1][0], "y": coordinates[-1][1]}
-                        total_coords = len(coordinates)
+                        first_coord, last_coord, total_coords, geometry, stats = await asyncio.to_thread(_metadata_from_coordinates, coordinates)
                         
                         # Cache the metadata
-                        cache_pattern_metadata(file_name, first_coord, last_coord, total_coords)
+                        cache_pattern_metadata(file_name, first_coord, last_coord, total_coords, geometry, stats)
                         successful += 1
                         logger.debug(f"Generated metadata for {file_name}")
                         
@@ -676,18 +898,7 @@ async def rebuild_cache():
         
     logger.info(f"Generating image previews for {total_files} pattern files...")
     
-    # Process in batches
-    batch_size = 5
-    successful = 0
-    for i in range(0, total_files, batch_size):
-        batch = pattern_files[i:i + batch_size]
-        tasks = [generate_image_preview(file) for file in batch]
-        results = await asyncio.gather(*tasks)
-        successful += sum(1 for r in results if r)
-        
-        # Log progress
-        progress = min(i + batch_size, total_files)
-        logger.info(f"Image preview generation progress: {progress}/{total_files} files processed")
+    successful = await _generate_previews_in_background(pattern_files, "Image preview generation")
     
     logger.info(f"Cache rebuild completed: {successful}/{total_files} patterns cached successfully")
 
@@ -771,8 +982,7 @@ async def is_cache_generation_needed_async():
         pattern_set = set(pattern_files)
         
         # Step 2: Check metadata cache
-        metadata_cache = await load_metadata_cache_async()
-        metadata_keys = set(metadata_cache.get('data', {}).keys())
+        metadata_keys = await asyncio.to_thread(lambda: get_metadata_cache().paths())
         
         if pattern_set != metadata_keys:
             # Metadata is missing some patterns
@@ -803,18 +1013,27 @@ async def is_cache_generation_needed_async():
 
 async def list_theta_rho_files_async():
     """Async version: List all theta-rho files."""
-    def _walk_files():
-        files = []
-        for root, _, filenames in os.walk(THETA_RHO_DIR):
-            # Only process .thr files to reduce memory usage
-            thr_files = [f for f in filenames if f.endswith('.thr')]
-            for file in thr_files:
-                relative_path = os.path.relpath(os.path.join(root, file), THETA_RHO_DIR)
-                # Normalize path separators to always use forward slashes for consistency across platforms
-                relative_path = relative_path.replace(os.sep, '/')
-                files.append(relative_path)
-        return files
+    if pattern_library.watching:
+        # In-memory index, no need for a thread
+        return list_theta_rho_files()
+    return await asyncio.to_thread(list_theta_rho_files)
+
+async def update_pattern_caches(changed, removed):
+    """Update metadata and previews for patterns the library watcher saw change.
+
+    changed: added or modified pattern paths; removed: deleted pattern paths.
+    """
+    # Hash the new files first, so a renamed pattern keeps the preview its old path used
+    for pattern_file in changed:
+        try:
+            await asyncio.to_thread(get_content_hash, pattern_file)
+        except OSError:
+            pass
+    
+    for pattern_file in removed:
+        await asyncio.to_thread(delete_pattern_cache, pattern_file)
     
-    files = await asyncio.to_thread(_walk_files)
-    logger.debug(f"Found {len(files)} theta-rho files")
-    return files  # Already filtered for .thr
\ No newline at end of file
+    if changed:
+        # Stale metadata is detected by mtime and replaced along with the preview
+        successful = await _generate_previews_in_background(changed, "Pattern library update")
+        logger.info(f"Updated cache for {successful}/{len(changed)} changed patterns")
\ No newline at end of file
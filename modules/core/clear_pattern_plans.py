@@ -0,0 +1,131 @@
+"""
+Pre-computed motion plans for clear patterns.
+
+A clear pattern runs before every pattern of a playlist, and the large ones
+(clear_from_out_Ultra.thr, clear_from_in_Ultra.thr) are ~95k points. Turning
+their coordinates into machine targets and coalescing them is the same work
+every time, except for the first move, which goes from wherever the previous
+pattern ended. So the plan is kept relative to the pattern's first point:
+
+- the machine increments between consecutive coordinates, and
+- which targets after the first have to be sent, coalesced from the first target.
+
+Placing the plan at the current position only needs the first increment and one
+accumulate, which gives the same targets as _plan_machine_targets. The first
+target is always sent, since the move to it depends on the start position.
+
+Plans are kept in memory per file, keyed on everything that changes the machine
+moves: the file's mtime and size, table type, steps per mm, gear ratio and the
+coalescing tolerance. Speed is not part of a plan; it is applied when the
+G-code is formatted.
+"""
+import os
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from modules.core.state import state
+from modules.core import theta_rho_engine
+from modules.core.segment_coalescer import coalesce_moves
+from modules.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# One plan per clear pattern in use; a 95k point plan takes about 1.6 MB
+MAX_PLANS = 6
+
+_PlanKey = namedtuple('_PlanKey', ['mtime_ns', 'size', 'table_type', 'x_steps_per_mm', 'y_steps_per_mm',
+                                   'gear_ratio', 'tolerance_steps'])
+# Increments and send flags of targets 1..N-1 (index 0 is filled in when the plan is placed)
+_RelativePlan = namedtuple('_RelativePlan', ['key', 'x_increment', 'y_increment', 'send_flags'])
+
+_PLAN_LOOKUPS = metrics.counter('dune_weaver_clear_plan_lookups_total',
+                                'Clear pattern plan lookups by result', ['result'])
+_PLAN_HIT = _PLAN_LOOKUPS.labels('hit')
+_PLAN_MISS = _PLAN_LOOKUPS.labels('miss')
+
+
+def _current_key(file_path):
+    stat = os.stat(file_path)
+    return _PlanKey(stat.st_mtime_ns, stat.st_size, state.table_type, state.x_steps_per_mm,
+                    state.y_steps_per_mm, state.gear_ratio, state.coalesce_tolerance_steps)
+
+
+class ClearPatternPlans:
+    """In-memory cache of relative motion plans, one per clear pattern file."""
+
+    def __init__(self, max_plans=MAX_PLANS):
+        self.max_plans = max_plans
+        self._plans = OrderedDict()  # path -> _RelativePlan, least recently used first
+        self._lock = threading.Lock()
+
+    def _build(self, coordinates, key):
+        started = time.perf_counter()
+        coordinates = theta_rho_engine.as_array(coordinates)
+        # Starting at the first point makes its increment zero
+        x_increment, y_increment = theta_rho_engine.compute_machine_increments(
+            coordinates, coordinates[0, 0], coordinates[0, 1],
+            key.table_type, key.x_steps_per_mm, key.y_steps_per_mm, key.gear_ratio)
+        x, y = theta_rho_engine.accumulate_increments(x_increment, y_increment, 0.0, 0.0)
+        send_flags = bytearray(b'\x01')
+        send_flags += coalesce_moves(x[1:].tolist(), y[1:].tolist(), 0.0, 0.0,
+                                     key.x_steps_per_mm, key.y_steps_per_mm, key.tolerance_steps)
+        plan = _RelativePlan(key, x_increment, y_increment, bytes(send_flags))
+        logger.info(f"Planned clear pattern: {len(coordinates)} targets, {sum(send_flags)} moves, "
+                    f"{time.perf_counter() - started:.2f}s")
+        return plan
+
+    def _get(self, file_path, coordinates):
+        key = _current_key(file_path)
+        path = os.path.abspath(file_path)
+        with self._lock:
+            plan = self._plans.get(path)
+            if plan is not None and plan.key == key:
+                self._plans.move_to_end(path)
+                _PLAN_HIT.inc()
+                return plan
+            # Built under the lock so concurrent requests for the same file wait for one build
+            _PLAN_MISS.inc()
+            plan = self._build(coordinates, key)
+            self._plans[path] = plan
+            self._plans.move_to_end(path)
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+            return plan
+
+    def warm(self, file_path, coordinates=None):
+        """Build the plan for the current settings unless it is cached already."""
+        if coordinates is None:
+            from modules.core.compiled_patterns import load_coordinates
+            coordinates = load_coordinates(file_path)
+        if len(coordinates) >= 2:
+            self._get(file_path, coordinates)
+
+    def plan(self, file_path, coordinates):
+        """
+        Machine targets for all of coordinates from the current position.
+
+        Returns (x, y, send_flags) like _plan_machine_targets.
+        """
+        relative = self._get(file_path, coordinates)
+        first_x, first_y = theta_rho_engine.compute_machine_increments(
+            theta_rho_engine.as_array(coordinates)[:1], state.current_theta, state.current_rho,
+            state.table_type, state.x_steps_per_mm, state.y_steps_per_mm, state.gear_ratio)
+        x_increment = relative.x_increment.copy()
+        y_increment = relative.y_increment.copy()
+        x_increment[0] = first_x[0]
+        y_increment[0] = first_y[0]
+        x, y = theta_rho_engine.accumulate_increments(x_increment, y_increment, state.machine_x, state.machine_y)
+        return x, y, relative.send_flags
+
+    def invalidate(self, file_path=None):
+        """Drop the plan of one file, or all plans."""
+        with self._lock:
+            if file_path is None:
+                self._plans.clear()
+            else:
+                self._plans.pop(os.path.abspath(file_path), None)
+
+
+clear_pattern_plans = ClearPatternPlans()
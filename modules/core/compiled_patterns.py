@@ -0,0 +1,212 @@
+"""
+Compiled binary pattern format.
+
+Parsing a .thr file builds a Python list with one tuple per coordinate, which costs
+several megabytes for 100k-point patterns and is repeated for every run and preview.
+This module compiles each pattern once into a sidecar file of packed theta/rho pairs
+and maps it into memory, so coordinates are read lazily from the page cache.
+
+File layout (little endian):
+    magic       4s   b'DWTR'
+    version     H    FORMAT_VERSION
+    item_size   H    4 (float32) or 8 (float64)
+    count       Q    number of (theta, rho) pairs
+    mtime_ns    q    mtime of the source .thr when compiled
+    size        q    size of the source .thr when compiled
+    data             count * 2 floats, interleaved theta, rho
+
+A sidecar is recompiled whenever the source mtime or size no longer matches.
+"""
+import os
+import mmap
+import struct
+import logging
+import threading
+from array import array
+from collections.abc import Sequence
+
+logger = logging.getLogger(__name__)
+
+# Stored beside the metadata cache (application root)
+COMPILED_PATTERNS_DIR = "compiled_patterns"
+
+MAGIC = b'DWTR'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHQqq')
+
+# float64 keeps coordinates bit-identical to the text parser; float32 halves the size
+PRECISIONS = {'float64': ('d', 8), 'float32': ('f', 4)}
+TYPECODES = {8: 'd', 4: 'f'}
+
+
+class CompiledCoordinates(Sequence):
+    """Read-only sequence of (theta, rho) tuples backed by a memory-mapped sidecar."""
+
+    def __init__(self, mapped: mmap.mmap, count: int, item_size: int):
+        self._mmap = mapped
+        self._count = count
+        # Zero-copy view of the interleaved theta/rho values
+        self._values = memoryview(mapped)[HEADER.size:HEADER.size + count * 2 * item_size].cast(TYPECODES[item_size])
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("coordinate index out of range")
+        return self._values[2 * index], self._values[2 * index + 1]
+
+    def __iter__(self):
+        values = iter(self._values)
+        return zip(values, values)
+
+    @property
+    def values(self) -> memoryview:
+        """Flat view of the interleaved theta/rho values."""
+        return self._values
+
+    def read_ahead(self):
+        """Read the whole sidecar into the page cache, so later access doesn't wait on storage."""
+        if hasattr(self._mmap, 'madvise') and hasattr(mmap, 'MADV_WILLNEED'):
+            self._mmap.madvise(mmap.MADV_WILLNEED)
+        # Touch one byte per page; the kernel reads ahead in larger chunks
+        for offset in range(0, len(self._mmap), mmap.PAGESIZE):
+            self._mmap[offset]
+
+    def close(self):
+        """Release the memory map. The sequence must not be used afterwards."""
+        self._values.release()
+        self._mmap.close()
+
+
+def get_compiled_path(file_path: str) -> str:
+    """Get the sidecar path for a pattern file."""
+    from modules.core.pattern_manager import THETA_RHO_DIR
+
+    relative_path = os.path.relpath(file_path, THETA_RHO_DIR)
+    if relative_path.startswith('..'):
+        # Pattern outside the patterns directory - flatten its absolute path
+        relative_path = os.path.abspath(file_path).strip(os.sep).replace(os.sep, '_')
+    return os.path.join(COMPILED_PATTERNS_DIR, f"{relative_path}.bin")
+
+
+def _read_header(compiled_path: str):
+    try:
+        with open(compiled_path, 'rb') as f:
+            raw = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(raw) != HEADER.size:
+        return None
+    magic, version, item_size, count, mtime_ns, size = HEADER.unpack(raw)
+    if magic != MAGIC or version != FORMAT_VERSION or item_size not in TYPECODES:
+        return None
+    return item_size, count, mtime_ns, size
+
+
+def is_compiled_current(file_path: str) -> bool:
+    """Check whether the sidecar for a pattern exists and matches the source file."""
+    try:
+        source_stat = os.stat(file_path)
+    except OSError:
+        return False
+    header = _read_header(get_compiled_path(file_path))
+    return bool(header) and header[2] == source_stat.st_mtime_ns and header[3] == source_stat.st_size
+
+
+def compile_pattern(file_path: str, precision: str = 'float64') -> str:
+    """Parse a .thr file and write its binary sidecar. Returns the sidecar path."""
+    from modules.core.pattern_manager import parse_theta_rho_file
+    from modules.core.theta_rho_engine import NUMPY_AVAILABLE, parse_theta_rho_array
+
+    typecode, item_size = PRECISIONS[precision]
+    source_stat = os.stat(file_path)
+
+    if NUMPY_AVAILABLE:
+        coordinates = parse_theta_rho_array(file_path)
+        # Sidecars are always little endian
+        values = coordinates.astype(f'<{typecode}')
+    else:
+        coordinates = parse_theta_rho_file(file_path)
+        values = array(typecode)
+        for theta, rho in coordinates:
+            values.append(theta)
+            values.append(rho)
+        if struct.pack('<H', 1) != struct.pack('=H', 1):
+            values.byteswap()  # Sidecars are always little endian
+
+    compiled_path = get_compiled_path(file_path)
+    os.makedirs(os.path.dirname(compiled_path), exist_ok=True)
+    # Unique per writer: preview workers and the pattern runner may compile the same file at once
+    temp_path = f"{compiled_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, item_size, len(coordinates),
+                            source_stat.st_mtime_ns, source_stat.st_size))
+        values.tofile(f)
+    # Atomic replace so concurrent readers never see a half-written file
+    os.replace(temp_path, compiled_path)
+    logger.debug(f"Compiled {len(coordinates)} coordinates from {file_path} to {compiled_path}")
+    return compiled_path
+
+
+def open_compiled(file_path: str):
+    """Memory-map an up-to-date sidecar, or return None if it is missing or stale."""
+    if not is_compiled_current(file_path):
+        return None
+    compiled_path = get_compiled_path(file_path)
+    with open(compiled_path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    item_size, count, _, _ = HEADER.unpack_from(mapped)[2:]
+    if len(mapped) < HEADER.size + count * 2 * item_size:
+        mapped.close()
+        return None
+    return CompiledCoordinates(mapped, count, item_size)
+
+
+def load_coordinates(file_path: str):
+    """
+    Get the coordinates of a pattern as a sequence of (theta, rho) tuples.
+
+    Compiles the sidecar if it is missing or stale and returns a lazy
+    memory-mapped view of it. Falls back to parsing the text file if the
+    sidecar can't be written or mapped.
+    """
+    try:
+        coordinates = open_compiled(file_path)
+        if coordinates is None:
+            compile_pattern(file_path)
+            coordinates = open_compiled(file_path)
+        if coordinates is not None:
+            return coordinates
+    except Exception as e:
+        logger.warning(f"Could not use compiled pattern for {file_path}, parsing text instead: {e}")
+
+    from modules.core.pattern_manager import parse_theta_rho_file
+    return parse_theta_rho_file(file_path)
+
+
+def prefetch(file_path: str):
+    """
+    Compile a pattern if needed and read it into the page cache.
+
+    Used to prepare the next pattern of a playlist while the current one draws,
+    so starting it doesn't wait on parsing or a slow SD card.
+    """
+    coordinates = load_coordinates(file_path)
+    if isinstance(coordinates, CompiledCoordinates):
+        coordinates.read_ahead()
+    return coordinates
+
+
+def delete_compiled(file_path: str):
+    """Delete the sidecar of a pattern file if it exists."""
+    compiled_path = get_compiled_path(file_path)
+    try:
+        os.remove(compiled_path)
+        logger.debug(f"Deleted compiled pattern: {compiled_path}")
+    except FileNotFoundError:
+        pass
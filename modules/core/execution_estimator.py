@@ -0,0 +1,242 @@
+"""
+Pattern execution time estimator.
+
+Predicts how long a pattern takes from its geometry in machine space and the
+runs logged to execution_times.jsonl:
+
+    seconds = a * (60 * path_length / speed) + b * short_segments + c
+
+The first term is the time at the commanded feed rate (mm/min), the second the
+per-move overhead that dominates on tiny segments (acceleration, serial round
+trips), and c a fixed start/finish overhead. The coefficients are fitted per
+table type, and per table type and speed once there are enough runs at that
+speed, by least squares pulled towards a prior so that one or two runs can't
+produce nonsense. Only sums of products are kept per group, so every logged run
+updates the fit in constant time.
+
+Geometry ignores the small theta/rho coupling correction of the motion thread,
+so it depends only on the table type, not on the steps/mm calibration.
+"""
+import json
+import math
+import logging
+import threading
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from modules.core.theta_rho_engine import get_scaling_factors
+
+logger = logging.getLogger(__name__)
+
+# Moves shorter than this (machine units) count as short segments
+SHORT_SEGMENT_LENGTH = 0.1
+# Prior coefficients (a, b, c) and how many runs the prior is worth
+PRIOR_COEFFICIENTS = (1.0, 0.02, 0.0)
+PRIOR_WEIGHT = 3.0
+# Runs needed before a table type + speed group is preferred over the table type group
+MIN_SPEED_GROUP_RUNS = 3
+
+
+def compute_geometry(coordinates, table_type):
+    """
+    Path length and number of short moves of a pattern in machine space.
+
+    Returns {'table_type', 'path_length', 'short_segments'}.
+    """
+    x_scaling_factor, y_scaling_factor = get_scaling_factors(table_type)
+    x_scale = 100 / (2 * math.pi * x_scaling_factor)
+    y_scale = 100 / y_scaling_factor
+
+    if NUMPY_AVAILABLE:
+        from modules.core.theta_rho_engine import as_array
+        coordinates = as_array(coordinates)
+        deltas = np.diff(coordinates, axis=0)
+        lengths = np.hypot(deltas[:, 0] * x_scale, deltas[:, 1] * y_scale)
+        path_length = float(lengths.sum())
+        short_segments = int(np.count_nonzero(lengths < SHORT_SEGMENT_LENGTH))
+    else:
+        path_length = 0.0
+        short_segments = 0
+        previous = None
+        for theta, rho in coordinates:
+            if previous is not None:
+                length = math.hypot((theta - previous[0]) * x_scale, (rho - previous[1]) * y_scale)
+                path_length += length
+                if length < SHORT_SEGMENT_LENGTH:
+                    short_segments += 1
+            previous = (theta, rho)
+
+    return {
+        'table_type': table_type or 'dune_weaver',
+        'path_length': path_length,
+        'short_segments': short_segments
+    }
+
+
+def _features(geometry, speed):
+    return (60.0 * geometry['path_length'] / speed, float(geometry['short_segments']), 1.0)
+
+
+def _solve(matrix, vector):
+    """Solve a small linear system by Gaussian elimination with partial pivoting."""
+    size = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(size)]
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda r: abs(rows[r][col]))
+        if abs(rows[pivot][col]) < 1e-12:
+            raise ValueError("singular system")
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for r in range(col + 1, size):
+            factor = rows[r][col] / rows[col][col]
+            for c in range(col, size + 1):
+                rows[r][c] -= factor * rows[col][c]
+    solution = [0.0] * size
+    for r in range(size - 1, -1, -1):
+        solution[r] = (rows[r][size] - sum(rows[r][c] * solution[c] for c in range(r + 1, size))) / rows[r][r]
+    return solution
+
+
+class _RunGroup:
+    """Sufficient statistics of the runs in one group, and the fit they give."""
+
+    def __init__(self):
+        size = len(PRIOR_COEFFICIENTS)
+        self.runs = 0
+        self.xtx = [[0.0] * size for _ in range(size)]
+        self.xty = [0.0] * size
+        self._coefficients = None
+
+    def add(self, features, seconds):
+        for i, xi in enumerate(features):
+            self.xty[i] += xi * seconds
+            for j, xj in enumerate(features):
+                self.xtx[i][j] += xi * xj
+        self.runs += 1
+        self._coefficients = None
+
+    def coefficients(self):
+        if self._coefficients is None:
+            # Ridge towards the prior; each penalty is scaled by the feature's
+            # mean square so the prior weighs like PRIOR_WEIGHT typical runs
+            penalties = [PRIOR_WEIGHT * ((self.xtx[i][i] / self.runs) or 1.0) for i in range(len(self.xty))]
+            matrix = [[self.xtx[i][j] + (penalties[i] if i == j else 0.0) for j in range(len(self.xty))]
+                      for i in range(len(self.xty))]
+            vector = [self.xty[i] + penalties[i] * PRIOR_COEFFICIENTS[i] for i in range(len(self.xty))]
+            try:
+                solution = _solve(matrix, vector)
+                # Negative time per unit of work is never right
+                self._coefficients = tuple(max(0.0, value) for value in solution)
+            except ValueError:
+                self._coefficients = PRIOR_COEFFICIENTS
+        return self._coefficients
+
+
+class ExecutionEstimator:
+    """Learns execution times from logged runs and predicts new ones."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()  # Held while training on the log
+        self._groups = {}  # table_type or (table_type, speed) -> _RunGroup
+        self._loaded = False
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def load(self, log_file, geometry_lookup):
+        """
+        Train on the execution log once.
+
+        geometry_lookup(pattern_name, table_type) returns the geometry of a logged
+        pattern that predates geometry logging, or None to skip that run.
+        Concurrent callers wait until training has finished.
+        """
+        with self._load_lock:
+            if self._loaded:
+                return
+            self._train(log_file, geometry_lookup)
+            self._loaded = True
+
+    def _train(self, log_file, geometry_lookup):
+        runs = 0
+        try:
+            with open(log_file, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    geometry = self._entry_geometry(entry, geometry_lookup)
+                    if geometry and self.add_run(entry, geometry):
+                        runs += 1
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to read execution log {log_file}: {e}")
+        logger.info(f"Execution estimator trained on {runs} logged runs")
+
+    @staticmethod
+    def _entry_geometry(entry, geometry_lookup):
+        if entry.get('path_length') is not None and entry.get('short_segments') is not None:
+            return {
+                'table_type': entry.get('table_type'),
+                'path_length': entry['path_length'],
+                'short_segments': entry['short_segments']
+            }
+        try:
+            return geometry_lookup(entry.get('pattern_name'), entry.get('table_type'))
+        except Exception as e:
+            logger.debug(f"No geometry for logged run of {entry.get('pattern_name')}: {e}")
+            return None
+
+    def add_run(self, entry, geometry):
+        """Learn from one execution log entry. Returns True if it was usable."""
+        table_type = entry.get('table_type')
+        speed = entry.get('speed')
+        seconds = entry.get('actual_time_seconds')
+        # Stopped or skipped runs say nothing about the full duration
+        if not entry.get('completed') or not table_type or table_type == 'unknown':
+            return False
+        if not speed or not seconds or seconds <= 0 or geometry.get('table_type') != table_type:
+            return False
+
+        features = _features(geometry, speed)
+        with self._lock:
+            for key in (table_type, (table_type, speed)):
+                self._groups.setdefault(key, _RunGroup()).add(features, seconds)
+        return True
+
+    def predict(self, geometry, speed):
+        """Predicted seconds for a pattern with this geometry at this speed, or None."""
+        if not geometry or not speed:
+            return None
+        table_type = geometry.get('table_type')
+        with self._lock:
+            group = self._groups.get((table_type, speed))
+            if group is None or group.runs < MIN_SPEED_GROUP_RUNS:
+                group = self._groups.get(table_type)
+            coefficients = group.coefficients() if group else PRIOR_COEFFICIENTS
+        features = _features(geometry, speed)
+        return sum(c * x for c, x in zip(coefficients, features))
+
+    def stats(self):
+        """Runs and fitted coefficients per group."""
+        with self._lock:
+            return [
+                {
+                    "table_type": key if isinstance(key, str) else key[0],
+                    "speed": None if isinstance(key, str) else key[1],
+                    "runs": group.runs,
+                    "coefficients": dict(zip(("feed_time", "short_segment", "overhead"), group.coefficients()))
+                }
+                for key, group in self._groups.items()
+            ]
+
+
+execution_estimator = ExecutionEstimator()
@@ -0,0 +1,444 @@
+"""
+SQLite-backed pattern metadata store.
+
+One row per pattern, keyed by its path relative to the patterns directory, so
+caching or deleting one pattern is a single-row upsert instead of rewriting the
+whole cache. The database runs in WAL mode: readers never block the background
+cache generator and a crash can't leave a half-written cache behind.
+
+A second table maps each pattern to the SHA-256 of its contents, which keys the
+preview images. The hash is only recomputed when the file's mtime or size changes.
+
+Pattern statistics (pattern_stats.compute_pattern_stats) are stored as columns,
+the radial histogram as a JSON list.
+"""
+import os
+import copy
+import json
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = ("path, category, mtime, total_coordinates, first_theta, first_rho, last_theta, last_rho, "
+            "geometry_table, path_length, short_segments, "
+            "theta_travel, rho_travel, min_rho, max_rho, revolutions, radial_histogram")
+_PLACEHOLDERS = ", ".join("?" * len(_COLUMNS.split(", ")))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS patterns (
+    path TEXT PRIMARY KEY,
+    category TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    total_coordinates INTEGER NOT NULL,
+    first_theta REAL,
+    first_rho REAL,
+    last_theta REAL,
+    last_rho REAL,
+    geometry_table TEXT,
+    path_length REAL,
+    short_segments INTEGER,
+    theta_travel REAL,
+    rho_travel REAL,
+    min_rho REAL,
+    max_rho REAL,
+    revolutions INTEGER,
+    radial_histogram TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_patterns_category ON patterns(category);
+CREATE INDEX IF NOT EXISTS idx_patterns_mtime ON patterns(mtime);
+CREATE INDEX IF NOT EXISTS idx_patterns_total_coordinates ON patterns(total_coordinates);
+CREATE TABLE IF NOT EXISTS content_hashes (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_content_hashes_hash ON content_hashes(hash);
+"""
+
+
+def get_category(pattern_file):
+    """Folder part of a pattern path ('root' for top-level patterns)."""
+    path_parts = pattern_file.split('/')
+    return '/'.join(path_parts[:-1]) if len(path_parts) > 1 else 'root'
+
+
+def _row_to_entry(row):
+    """Convert a row to the {'mtime', 'metadata'} entry layout of the legacy JSON cache."""
+    metadata = {
+        'first_coordinate': {'x': row['first_theta'], 'y': row['first_rho']},
+        'last_coordinate': {'x': row['last_theta'], 'y': row['last_rho']},
+        'total_coordinates': row['total_coordinates']
+    }
+    if row['geometry_table'] is not None:
+        metadata['geometry'] = {
+            'table_type': row['geometry_table'],
+            'path_length': row['path_length'],
+            'short_segments': row['short_segments']
+        }
+    stats = _row_stats(row)
+    if stats:
+        metadata['stats'] = stats
+    return {'mtime': row['mtime'], 'metadata': metadata}
+
+
+def _row_stats(row):
+    """Pattern statistics of a row, or None if they haven't been computed."""
+    if row['radial_histogram'] is None:
+        return None
+    return {
+        'theta_travel': row['theta_travel'],
+        'rho_travel': row['rho_travel'],
+        'min_rho': row['min_rho'],
+        'max_rho': row['max_rho'],
+        'revolutions': row['revolutions'],
+        'radial_histogram': json.loads(row['radial_histogram'])
+    }
+
+
+def _is_valid_entry(entry):
+    """Whether a legacy JSON cache entry has the fields every version had."""
+    if not isinstance(entry, dict) or not isinstance(entry.get('mtime'), (int, float)):
+        return False
+    metadata = entry.get('metadata')
+    if not isinstance(metadata, dict) or not isinstance(metadata.get('total_coordinates'), int):
+        return False
+    return all(isinstance(metadata.get(field), dict) for field in ('first_coordinate', 'last_coordinate'))
+
+
+def _entry_to_row(pattern_file, entry):
+    metadata = entry['metadata']
+    first_coord = metadata.get('first_coordinate') or {}
+    last_coord = metadata.get('last_coordinate') or {}
+    geometry = metadata.get('geometry') or {}
+    stats = metadata.get('stats') or {}
+    histogram = stats.get('radial_histogram')
+    return (
+        pattern_file,
+        get_category(pattern_file),
+        entry['mtime'],
+        metadata.get('total_coordinates', 0),
+        first_coord.get('x'),
+        first_coord.get('y'),
+        last_coord.get('x'),
+        last_coord.get('y'),
+        geometry.get('table_type'),
+        geometry.get('path_length'),
+        geometry.get('short_segments'),
+        stats.get('theta_travel'),
+        stats.get('rho_travel'),
+        stats.get('min_rho'),
+        stats.get('max_rho'),
+        stats.get('revolutions'),
+        json.dumps(histogram) if histogram is not None else None,
+    )
+
+
+def _normalize_entry(pattern_file, entry):
+    """The entry as it reads back from the database, e.g. a missing coordinate as {'x': None, 'y': None}."""
+    return _row_to_entry(dict(zip(_COLUMNS.split(", "), _entry_to_row(pattern_file, entry))))
+
+
+class MetadataStore:
+    """Thread-safe pattern metadata table. Each thread gets its own connection."""
+
+    def __init__(self, db_path, schema_version):
+        self.db_path = db_path
+        self.schema_version = schema_version
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; multi-row writes open explicit transactions
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._initialized:
+            self._initialize(conn)
+        return conn
+
+    def _initialize(self, conn):
+        with self._init_lock:
+            if self._initialized:
+                return
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != self.schema_version:
+                if version:
+                    logger.info(f"Metadata schema version mismatch: found {version}, expected {self.schema_version} - rebuilding")
+                conn.execute("DROP TABLE IF EXISTS patterns")
+            conn.executescript(_SCHEMA)
+            conn.execute(f"PRAGMA user_version = {int(self.schema_version)}")
+            try:
+                os.chmod(self.db_path, 0o644)
+            except (OSError, PermissionError) as e:
+                logger.debug(f"Could not set metadata database permissions: {str(e)}")
+            self._initialized = True
+
+    def get(self, pattern_file):
+        """Get the cached entry of one pattern, or None."""
+        row = self._connect().execute(
+            f"SELECT {_COLUMNS} FROM patterns WHERE path = ?", (pattern_file,)
+        ).fetchone()
+        return _row_to_entry(row) if row else None
+
+    def get_all(self):
+        """Get every cached entry as a {path: entry} dict."""
+        rows = self._connect().execute(f"SELECT {_COLUMNS} FROM patterns").fetchall()
+        return {row['path']: _row_to_entry(row) for row in rows}
+
+    def paths(self):
+        """Set of all pattern paths that have cached metadata."""
+        return {row[0] for row in self._connect().execute("SELECT path FROM patterns")}
+
+    def list_summaries(self, category=None):
+        """Get {path: (mtime, total_coordinates, geometry, stats)} for all patterns, or one category.
+
+        geometry and stats are None for patterns where they haven't been computed.
+        """
+        query = f"SELECT {_COLUMNS} FROM patterns"
+        params = ()
+        if category is not None:
+            query += " WHERE category = ?"
+            params = (category,)
+        summaries = {}
+        for row in self._connect().execute(query, params):
+            geometry = None
+            if row['geometry_table'] is not None:
+                geometry = {'table_type': row['geometry_table'], 'path_length': row['path_length'],
+                            'short_segments': row['short_segments']}
+            summaries[row['path']] = (row['mtime'], row['total_coordinates'], geometry, _row_stats(row))
+        return summaries
+
+    def upsert(self, pattern_file, entry):
+        """Insert or replace the entry of one pattern."""
+        self._connect().execute(
+            f"INSERT OR REPLACE INTO patterns ({_COLUMNS}) VALUES ({_PLACEHOLDERS})",
+            _entry_to_row(pattern_file, entry)
+        )
+
+    def upsert_many(self, entries, replace_all=False):
+        """Insert or replace many {path: entry} items in one transaction."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if replace_all:
+                conn.execute("DELETE FROM patterns")
+            conn.executemany(
+                f"INSERT OR REPLACE INTO patterns ({_COLUMNS}) VALUES ({_PLACEHOLDERS})",
+                [_entry_to_row(pattern_file, entry) for pattern_file, entry in entries.items()]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, pattern_file):
+        """Delete the entry of one pattern. Returns True if it existed."""
+        cursor = self._connect().execute("DELETE FROM patterns WHERE path = ?", (pattern_file,))
+        return cursor.rowcount > 0
+
+    def clear(self):
+        """Delete every entry."""
+        self._connect().execute("DELETE FROM patterns")
+
+    def get_content_hashes(self):
+        """Get every stored content hash as a {path: (mtime, size, hash)} dict."""
+        rows = self._connect().execute("SELECT path, mtime, size, hash FROM content_hashes").fetchall()
+        return {row[0]: (row[1], row[2], row[3]) for row in rows}
+
+    def set_content_hash(self, pattern_file, mtime, size, content_hash):
+        """Record the content hash of a pattern file at the given mtime and size."""
+        self._connect().execute(
+            "INSERT OR REPLACE INTO content_hashes (path, mtime, size, hash) VALUES (?, ?, ?, ?)",
+            (pattern_file, mtime, size, content_hash)
+        )
+
+    def delete_content_hash(self, pattern_file):
+        """Forget the content hash of a pattern file."""
+        self._connect().execute("DELETE FROM content_hashes WHERE path = ?", (pattern_file,))
+
+    def migrate_from_json(self, json_path, validate):
+        """
+        One-time import of a legacy JSON metadata cache.
+
+        The JSON file is renamed to <name>.migrated afterwards so it is never imported twice.
+        Entries are only imported if validate(cache_data) accepts the file; malformed
+        entries are skipped one by one.
+        """
+        if not os.path.exists(json_path):
+            return 0
+
+        imported = 0
+        try:
+            with open(json_path, 'r') as f:
+                cache_data = json.load(f)
+            if validate(cache_data):
+                data = cache_data.get('data', {})
+                entries = {
+                    pattern_file: entry for pattern_file, entry in data.items() if _is_valid_entry(entry)
+                }
+                self.upsert_many(entries)
+                imported = len(entries)
+                logger.info(f"Migrated {imported} entries from {json_path} to {self.db_path}"
+                            + (f", skipped {len(data) - imported} malformed" if len(data) > imported else ""))
+            else:
+                logger.info(f"Legacy metadata cache {json_path} has an outdated schema - not migrating")
+        except Exception as e:
+            logger.warning(f"Failed to migrate legacy metadata cache {json_path}: {str(e)}")
+
+        try:
+            os.replace(json_path, f"{json_path}.migrated")
+        except OSError as e:
+            logger.warning(f"Could not rename legacy metadata cache {json_path}: {str(e)}")
+        return imported
+
+
+class MetadataCache:
+    """
+    Process-wide in-memory copy of a MetadataStore.
+
+    The whole table is loaded once and lookups are served from memory. Writes go
+    through to SQLite and update the copy. The copy is reloaded only when the
+    database or its WAL file changes on disk (mtime or size) without going
+    through this cache, e.g. when another process wrote to it.
+
+    Counters: a hit is a lookup served from memory, a miss is one that had to
+    (re)load the table first.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.RLock()
+        self._entries = None
+        self._hashes = None
+        self._signature = None
+        self.hits = 0
+        self.misses = 0
+
+    def _file_signature(self):
+        signature = []
+        for path in (self.store.db_path, f"{self.store.db_path}-wal"):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _load(self):
+        """Return the in-memory entries, reloading them if the database changed. Lock must be held."""
+        signature = self._file_signature()
+        if self._entries is None or signature != self._signature:
+            self._entries = self.store.get_all()
+            self._hashes = self.store.get_content_hashes()
+            self._signature = self._file_signature()
+            self.misses += 1
+            logger.debug(f"Loaded {len(self._entries)} metadata entries into memory")
+        else:
+            self.hits += 1
+        return self._entries
+
+    def _after_write(self):
+        # Our own write changed the database files; don't treat that as an outside change
+        self._signature = self._file_signature()
+
+    def get(self, pattern_file):
+        with self._lock:
+            # A copy, so callers can't change the cached entry
+            return copy.deepcopy(self._load().get(pattern_file))
+
+    def get_all(self):
+        with self._lock:
+            # Copies, like get()
+            return copy.deepcopy(self._load())
+
+    def paths(self):
+        with self._lock:
+            return set(self._load())
+
+    def list_summaries(self, category=None):
+        with self._lock:
+            return {
+                path: (entry['mtime'], entry['metadata'].get('total_coordinates', 0),
+                       entry['metadata'].get('geometry'), entry['metadata'].get('stats'))
+                for path, entry in self._load().items()
+                if category is None or get_category(path) == category
+            }
+
+    def upsert(self, pattern_file, entry):
+        with self._lock:
+            entries = self._load()
+            self.store.upsert(pattern_file, entry)
+            # Same shape as after a reload from the database
+            entries[pattern_file] = _normalize_entry(pattern_file, entry)
+            self._after_write()
+
+    def upsert_many(self, entries, replace_all=False):
+        with self._lock:
+            self.store.upsert_many(entries, replace_all=replace_all)
+            # Reload so the copy matches exactly what the store kept
+            self._entries = None
+            self._load()
+
+    def delete(self, pattern_file):
+        with self._lock:
+            entries = self._load()
+            existed = self.store.delete(pattern_file)
+            entries.pop(pattern_file, None)
+            self._after_write()
+            return existed
+
+    def clear(self):
+        with self._lock:
+            self.store.clear()
+            self._entries = {}
+            self._after_write()
+
+    def migrate_from_json(self, json_path, validate):
+        with self._lock:
+            imported = self.store.migrate_from_json(json_path, validate)
+            self._entries = None
+            return imported
+
+    def get_content_hash(self, pattern_file):
+        with self._lock:
+            self._load()
+            return self._hashes.get(pattern_file)
+
+    def set_content_hash(self, pattern_file, mtime, size, content_hash):
+        with self._lock:
+            self._load()
+            self.store.set_content_hash(pattern_file, mtime, size, content_hash)
+            self._hashes[pattern_file] = (mtime, size, content_hash)
+            self._after_write()
+
+    def delete_content_hash(self, pattern_file):
+        with self._lock:
+            self._load()
+            self.store.delete_content_hash(pattern_file)
+            self._hashes.pop(pattern_file, None)
+            self._after_write()
+
+    def paths_with_hash(self, content_hash):
+        """Paths of all patterns whose contents have this hash."""
+        with self._lock:
+            self._load()
+            return [path for path, row in self._hashes.items() if row[2] == content_hash]
+
+    def stats(self):
+        """Hit/miss counters and the number of entries held in memory."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries) if self._entries is not None else 0
+            }
@@ -0,0 +1,247 @@
+"""
+Lightweight metrics registry, exposed at /metrics in the Prometheus text format.
+
+Counters, gauges and histograms with fixed buckets, optionally with labels.
+Updating a metric is a dict lookup and an addition under a lock, so the hot paths
+(motion thread, LED effect loop) can afford it. Values that already exist
+elsewhere (queue sizes, cache counters) are registered with a function and only
+read when /metrics is scraped.
+
+Metrics are defined next to the code they measure:
+
+    from modules.core.metrics import metrics
+    MOVES = metrics.counter('dune_weaver_moves_total', 'Moves sent to the controller')
+    MOVES.inc()
+    RENDER_SECONDS = metrics.histogram('dune_weaver_render_seconds', 'Render time', buckets=(0.1, 1, 10))
+    with RENDER_SECONDS.time():
+        ...
+"""
+import bisect
+import math
+import threading
+import time
+
+# Seconds; suits anything from a serial round trip to a slow render
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, (bool, int)):
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    metric_type = None
+
+    def __init__(self, name, help_text, labelnames=(), function=None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._function = function
+        self._lock = threading.Lock()
+        self._values = {}
+        if not self.labelnames:
+            # Unlabelled metrics are reported from the start, not from their first update
+            self._values[()] = self._initial_value()
+
+    def _initial_value(self):
+        return 0
+
+    def labels(self, *values, **kwargs):
+        """The child for one combination of label values."""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return _Child(self, tuple(str(value) for value in values))
+
+    def set_function(self, function):
+        """Read the value from function() at scrape time instead of tracking it."""
+        self._function = function
+
+    def _samples(self):
+        """[(suffix, label values, extra label, value)] for rendering."""
+        if self._function is not None:
+            return [("", (), None, self._function())]
+        with self._lock:
+            return [("", key, None, value) for key, value in self._values.items()]
+
+
+class _Child:
+    """A labelled metric bound to one combination of label values."""
+
+    __slots__ = ('_metric', '_key')
+
+    def __init__(self, metric, key):
+        self._metric = metric
+        self._key = key
+
+    def inc(self, amount=1):
+        self._metric._inc(self._key, amount)
+
+    def dec(self, amount=1):
+        self._metric._inc(self._key, -amount)
+
+    def set(self, value):
+        self._metric._set(self._key, value)
+
+    def observe(self, value):
+        self._metric._observe(self._key, value)
+
+    def time(self):
+        return _Timer(self.observe)
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def _inc(self, key, amount):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def inc(self, amount=1):
+        self._inc((), amount)
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def _inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1):
+        self._inc((), amount)
+
+    def dec(self, amount=1):
+        self._inc((), -amount)
+
+    def set(self, value):
+        self._set((), value)
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labelnames)
+
+    def _initial_value(self):
+        # Per-bucket counts (the last one is +Inf), then the sum
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def _observe(self, key, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = self._initial_value()
+            entry[index] += 1
+            entry[-1] += value
+
+    def observe(self, value):
+        self._observe((), value)
+
+    def time(self):
+        """Context manager that observes the seconds spent in its block."""
+        return _Timer(self.observe)
+
+    def _samples(self):
+        with self._lock:
+            entries = [(key, list(entry)) for key, entry in self._values.items()]
+        samples = []
+        for key, entry in entries:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), entry[:-1]):
+                cumulative += count
+                samples.append(("_bucket", key, f'le="{_format_value(float(bound))}"', cumulative))
+            samples.append(("_sum", key, None, entry[-1]))
+            samples.append(("_count", key, None, cumulative))
+        return samples
+
+
+class _Timer:
+    __slots__ = ('_observe', '_start')
+
+    def __init__(self, observe):
+        self._observe = observe
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._observe(time.perf_counter() - self._start)
+        return False
+
+
+class MetricsRegistry:
+    """All metrics of the process, rendered together for /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Module reloads define the same metric again; keep the first
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labelnames=(), function=None) -> Counter:
+        return self._register(Counter(name, help_text, labelnames, function))
+
+    def gauge(self, name, help_text, labelnames=(), function=None) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames, function))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric._samples()
+            except Exception:
+                # A failing value function must not break the whole scrape
+                continue
+            lines.append(f"# HELP {metric.name} {_escape(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for suffix, key, extra, value in samples:
+                if value is None:
+                    continue
+                lines.append(f"{metric.name}{suffix}{_format_labels(metric.labelnames, key, extra)} "
+                             f"{_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
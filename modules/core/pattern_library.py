@@ -0,0 +1,342 @@
+"""
+In-memory index of the pattern library.
+
+Keeps every .thr file under the patterns directory with its mtime and size, so
+listing the library doesn't walk the tree. While the watcher runs, the index is
+kept current with inotify (Linux, through ctypes) or, where inotify isn't
+available, by rescanning every POLL_INTERVAL seconds. Each batch of changes is
+passed to an on_change(changed, removed) callback on the event loop, so only
+the changed patterns get new metadata and previews.
+
+Without a running watcher, listing walks the tree on every call as before.
+"""
+import os
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+import logging
+import asyncio
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Directories under the patterns directory that never contain patterns
+SKIPPED_DIRS = {'cached_images'}
+POLL_INTERVAL = 30.0
+# Changes are delivered once the tree has been quiet for this long
+DEBOUNCE_SECONDS = 0.5
+
+# inotify constants from <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+               | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+def _load_inotify():
+    """Return libc with the inotify functions set up, or None if unavailable."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class _InotifyWatcher:
+    """Recursive inotify watch of a directory tree. Collects changed paths."""
+
+    def __init__(self, libc, root):
+        self._libc = libc
+        self.root = root
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_init1 failed: {os.strerror(error)}")
+        self._watches = {}  # wd -> relative directory ('' for the root)
+
+    def add_tree(self, rel_dir):
+        """Watch a directory and all directories below it."""
+        for dirpath, dirs, _ in os.walk(os.path.join(self.root, rel_dir)):
+            dirs[:] = [d for d in dirs if d not in SKIPPED_DIRS]
+            rel = os.path.relpath(dirpath, self.root)
+            rel = '' if rel == '.' else rel.replace(os.sep, '/')
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dirpath), _WATCH_MASK)
+            if wd < 0:
+                logger.warning(f"Could not watch {dirpath}: {os.strerror(ctypes.get_errno())}")
+                continue
+            self._watches[wd] = rel
+
+    def read(self, timeout):
+        """
+        Wait up to timeout seconds for events.
+
+        Returns (paths, dirs, overflow): relative paths whose state may have changed,
+        relative directories that appeared or disappeared as a whole, and whether
+        the kernel dropped events (the caller must rescan everything).
+        """
+        paths, dirs = set(), set()
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return paths, dirs, False
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return paths, dirs, False
+
+        overflow = False
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            if mask & IN_IGNORED:
+                # Watch removed by the kernel (directory deleted or moved away)
+                self._watches.pop(wd, None)
+                continue
+            parent = self._watches.get(wd)
+            if parent is None or not name:
+                continue
+            rel_path = f"{parent}/{name}" if parent else name
+            if mask & IN_ISDIR:
+                if name in SKIPPED_DIRS:
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(rel_path)
+                dirs.add(rel_path)
+            elif name.endswith('.thr'):
+                paths.add(rel_path)
+        return paths, dirs, overflow
+
+    def close(self):
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+
+
+class PatternLibrary:
+    """Index of the .thr files below a directory, as paths relative to it."""
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._entries = {}  # path -> (mtime, size)
+        self._files = None  # Sorted path list, rebuilt after a change
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._loop = None
+        self._on_change = None
+        self.mode = None  # 'inotify' or 'polling' while watching
+
+    @property
+    def watching(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _walk(self, rel_dir='', with_stat=True):
+        """Find every pattern below a relative directory. Returns {path: (mtime, size)}, or {path: None} without with_stat."""
+        entries = {}
+        top = os.path.join(self.root, rel_dir) if rel_dir else self.root
+        for dirpath, dirs, filenames in os.walk(top):
+            # Skip cached_images directories to avoid scanning thousands of WebP files
+            dirs[:] = [d for d in dirs if d not in SKIPPED_DIRS]
+            for filename in filenames:
+                if not filename.endswith('.thr'):
+                    continue
+                full_path = os.path.join(dirpath, filename)
+                # Normalize path separators to always use forward slashes for consistency across platforms
+                rel_path = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+                if not with_stat:
+                    entries[rel_path] = None
+                    continue
+                try:
+                    stat = os.stat(full_path)
+                except OSError:
+                    continue
+                entries[rel_path] = (stat.st_mtime, stat.st_size)
+        return entries
+
+    def files(self):
+        """List of all pattern paths. Served from the index while the watcher runs."""
+        if not self.watching:
+            return list(self._walk(with_stat=False))
+        with self._lock:
+            if self._files is None:
+                self._files = sorted(self._entries)
+            return list(self._files)
+
+    def entries(self):
+        """{path: (mtime, size)} of all patterns."""
+        if not self.watching:
+            return self._walk()
+        with self._lock:
+            return dict(self._entries)
+
+    def _apply(self, found, scope=None):
+        """
+        Merge freshly stat'ed entries into the index.
+
+        scope limits removals: None replaces the whole index, a set of paths or a
+        directory prefix (ending in '/') only removes entries inside it.
+        Returns (changed, removed) path lists.
+        """
+        with self._lock:
+            if scope is None:
+                candidates = set(self._entries)
+            elif isinstance(scope, str):
+                candidates = {path for path in self._entries if path.startswith(scope)}
+            else:
+                candidates = set(scope) & set(self._entries)
+            removed = [path for path in candidates if path not in found]
+            changed = [path for path, entry in found.items() if self._entries.get(path) != entry]
+            for path in removed:
+                del self._entries[path]
+            for path in changed:
+                self._entries[path] = found[path]
+            if changed or removed:
+                self._files = None
+        return changed, removed
+
+    def refresh(self, paths):
+        """
+        Update the index for paths this process just wrote or deleted.
+
+        Lets a listing right after an upload or delete include the change without
+        waiting for the watcher. The caller takes care of the caches, so on_change
+        is not called; the watcher will find these entries already up to date.
+        """
+        if self.watching:
+            self._apply(self._stat_paths(paths), scope=set(paths))
+
+    def _stat_paths(self, paths):
+        found = {}
+        for path in paths:
+            try:
+                stat = os.stat(os.path.join(self.root, path))
+                found[path] = (stat.st_mtime, stat.st_size)
+            except OSError:
+                pass
+        return found
+
+    def start(self, on_change=None, loop=None):
+        """
+        Build the index and keep it current in a background thread.
+
+        on_change(changed, removed) is a coroutine function, awaited on loop (default:
+        the running loop) after each batch of changes with lists of relative pattern paths.
+        """
+        if self.watching:
+            return
+        if loop is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+        self._loop = loop
+        self._on_change = on_change
+        self._stop_event.clear()
+        with self._lock:
+            self._entries = {}
+            self._files = None
+        self._apply(self._walk())
+
+        watcher = None
+        libc = _load_inotify()
+        if libc is not None:
+            try:
+                watcher = _InotifyWatcher(libc, self.root)
+                watcher.add_tree('')
+            except (OSError, AttributeError) as e:
+                logger.info(f"inotify not available ({e}), polling the pattern library instead")
+                watcher = None
+        self.mode = 'inotify' if watcher else 'polling'
+        self._thread = threading.Thread(target=self._run, args=(watcher,), name="pattern-library", daemon=True)
+        self._thread.start()
+        logger.info(f"Pattern library indexed: {len(self._entries)} patterns, watching with {self.mode}")
+
+    def stop(self):
+        """Stop watching. Listing walks the tree again afterwards."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.mode = None
+
+    def _run(self, watcher):
+        try:
+            if watcher:
+                self._run_inotify(watcher)
+            else:
+                self._run_polling()
+        except Exception as e:
+            logger.error(f"Pattern library watcher failed: {e}")
+        finally:
+            if watcher:
+                watcher.close()
+
+    def _run_polling(self):
+        while not self._stop_event.wait(POLL_INTERVAL):
+            self._notify(*self._apply(self._walk()))
+
+    def _run_inotify(self, watcher):
+        pending_paths, pending_dirs = set(), set()
+        rescan = False
+        last_event = 0.0
+        while not self._stop_event.is_set():
+            timeout = DEBOUNCE_SECONDS if (pending_paths or pending_dirs or rescan) else 1.0
+            paths, dirs, overflow = watcher.read(timeout)
+            if paths or dirs or overflow:
+                pending_paths |= paths
+                pending_dirs |= dirs
+                rescan = rescan or overflow
+                last_event = time.monotonic()
+                continue
+            if not (pending_paths or pending_dirs or rescan) or time.monotonic() - last_event < DEBOUNCE_SECONDS:
+                continue
+
+            if rescan:
+                logger.info("Pattern library watcher overflowed, rescanning")
+                changed, removed = self._apply(self._walk())
+            else:
+                changed, removed = self._apply(self._stat_paths(pending_paths), scope=pending_paths)
+                for rel_dir in pending_dirs:
+                    dir_changed, dir_removed = self._apply(self._walk(rel_dir), scope=f"{rel_dir}/")
+                    changed += dir_changed
+                    removed += dir_removed
+            pending_paths, pending_dirs = set(), set()
+            rescan = False
+            self._notify(changed, removed)
+
+    def _notify(self, changed, removed):
+        if not (changed or removed):
+            return
+        logger.info(f"Pattern library changed: {len(changed)} added or modified, {len(removed)} removed")
+        if self._on_change and self._loop and not self._loop.is_closed():
+            asyncio.run_coroutine_threadsafe(self._deliver(changed, removed), self._loop)
+
+    async def _deliver(self, changed, removed):
+        try:
+            await self._on_change(changed, removed)
+        except Exception as e:
+            logger.error(f"Error handling pattern library changes: {e}")
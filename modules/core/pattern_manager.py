@@ -4,10 +4,19 @@ import threading
 import time
 import random
 import logging
-from datetime import datetime, time as datetime_time
+from datetime import datetime
 from tqdm import tqdm
 from modules.connection import connection_manager
 from modules.core.state import state
+from modules.core import theta_rho_engine
+from modules.core.theta_rho_engine import NUMPY_AVAILABLE
+from modules.core.pattern_library import PatternLibrary
+from modules.core.execution_estimator import execution_estimator
+from modules.core.segment_coalescer import coalesce_moves
+from modules.core.clear_pattern_plans import clear_pattern_plans
+from modules.core.status_publisher import status_publisher
+from modules.core.pause_schedule import PauseSchedule
+from modules.core.metrics import metrics
 from math import pi
 import asyncio
 import json
@@ -15,6 +24,7 @@ import json
 from modules.led.led_controller import effect_playing, effect_idle
 from modules.led.idle_timeout_manager import idle_timeout_manager
 import queue
+from collections import deque, namedtuple
 from dataclasses import dataclass
 from typing import Optional, Callable
 
@@ -25,11 +35,15 @@ logger = logging.getLogger(__name__)
 THETA_RHO_DIR = './patterns'
 os.makedirs(THETA_RHO_DIR, exist_ok=True)
 
+# Index of the .thr files in THETA_RHO_DIR; kept current once its watcher is started
+pattern_library = PatternLibrary(THETA_RHO_DIR)
+
 # Execution time log file (JSON Lines format - one JSON object per line)
 EXECUTION_LOG_FILE = './execution_times.jsonl'
 
 def log_execution_time(pattern_name: str, table_type: str, speed: int, actual_time: float,
-                       total_coordinates: int, was_completed: bool):
+                       total_coordinates: int, was_completed: bool, geometry: Optional[dict] = None,
+                       coalesced_moves: Optional[int] = None):
     """Log pattern execution time to JSON Lines file for analysis.
 
     Args:
@@ -39,6 +53,8 @@ def log_execution_time(pattern_name: str, table_type: str, speed: int, actual_ti
         actual_time: Actual execution time in seconds (excluding pauses)
         total_coordinates: Total number of coordinates in the pattern
         was_completed: Whether the pattern completed normally (not stopped/skipped)
+        geometry: Pattern geometry from execution_estimator.compute_geometry, if known
+        coalesced_moves: Number of moves merged into others instead of being sent
     """
     # Format time as HH:MM:SS
     hours, remainder = divmod(int(actual_time), 3600)
@@ -55,11 +71,20 @@ def log_execution_time(pattern_name: str, table_type: str, speed: int, actual_ti
         "total_coordinates": total_coordinates,
         "completed": was_completed
     }
+    if geometry:
+        log_entry["path_length"] = round(geometry['path_length'], 3)
+        log_entry["short_segments"] = geometry['short_segments']
+    if coalesced_moves is not None:
+        log_entry["coalesced_moves"] = coalesced_moves
 
     try:
         with open(EXECUTION_LOG_FILE, 'a') as f:
             f.write(json.dumps(log_entry) + '\n')
 
+        # Runs logged before the estimator is trained are picked up from the file instead
+        if geometry and execution_estimator.loaded:
+            execution_estimator.add_run(log_entry, geometry)
+
         logger.info(f"Execution time logged: {pattern_name} - {time_formatted} (speed: {speed}, table: {table_type})")
     except Exception as e:
         logger.error(f"Failed to log execution time: {e}")
@@ -71,13 +96,15 @@ pause_event.set()  # Initially not paused
 # Create an asyncio Lock for pattern execution
 pattern_lock = asyncio.Lock()
 
-# Progress update task
-progress_update_task = None
-
 # Cache timezone at module level - read once per session (cleared when user changes timezone)
 _cached_timezone = None
 _cached_zoneinfo = None
 
+# Compiled from state.scheduled_pause_time_slots by _get_pause_schedule()
+_pause_schedule = None
+# Set when the schedule settings change or a stop is requested
+_pause_schedule_changed = asyncio.Event()
+
 def _get_timezone():
     """Get and cache the timezone for Still Sands. Uses user-selected timezone if set, otherwise system timezone."""
     global _cached_timezone, _cached_zoneinfo
@@ -122,64 +149,45 @@ def _get_timezone():
 
     return _cached_zoneinfo
 
+def _get_pause_schedule():
+    """The compiled Still Sands schedule, recompiled when the slots or timezone change."""
+    global _pause_schedule
+    slots = state.scheduled_pause_time_slots
+    tz_info = _get_timezone()
+    if _pause_schedule is None or _pause_schedule.slots is not slots or _pause_schedule.tz_info is not tz_info:
+        _pause_schedule = PauseSchedule(slots, tz_info)
+    return _pause_schedule
+
+def invalidate_pause_schedule():
+    """Pick up changed Still Sands settings and wake tasks waiting for the schedule."""
+    global _cached_timezone, _cached_zoneinfo, _pause_schedule
+    _cached_timezone = None
+    _cached_zoneinfo = None
+    _pause_schedule = None
+    _pause_schedule_changed.set()
+
 def is_in_scheduled_pause_period():
     """Check if current time falls within any scheduled pause period."""
     if not state.scheduled_pause_enabled or not state.scheduled_pause_time_slots:
         return False
+    return _get_pause_schedule().is_paused()
 
-    # Get cached timezone (user-selected or system default)
-    tz_info = _get_timezone()
-
+async def wait_for_pause_schedule_change():
+    """
+    Sleep until the scheduled pause period may have changed: its next transition,
+    a settings change or a stop request.
+    """
+    timeout = None
+    if state.scheduled_pause_enabled and state.scheduled_pause_time_slots:
+        transition = _get_pause_schedule().next_transition()
+        if transition is not None:
+            # A little past the transition, so the check afterwards sees the new period
+            timeout = max(0.0, transition - time.time()) + 0.01
+    _pause_schedule_changed.clear()
     try:
-        # Get current time in user's timezone
-        if tz_info:
-            now = datetime.now(tz_info)
-        else:
-            now = datetime.now()
-    except Exception as e:
-        logger.warning(f"Error getting current time: {e}")
-        now = datetime.now()
-
-    current_time = now.time()
-    current_weekday = now.strftime("%A").lower()  # monday, tuesday, etc.
-
-    for slot in state.scheduled_pause_time_slots:
-        # Parse start and end times
-        try:
-            start_time = datetime_time.fromisoformat(slot['start_time'])
-            end_time = datetime_time.fromisoformat(slot['end_time'])
-        except (ValueError, KeyError):
-            logger.warning(f"Invalid time format in scheduled pause slot: {slot}")
-            continue
-
-        # Check if this slot applies to today
-        slot_applies_today = False
-        days_setting = slot.get('days', 'daily')
-
-        if days_setting == 'daily':
-            slot_applies_today = True
-        elif days_setting == 'weekdays':
-            slot_applies_today = current_weekday in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']
-        elif days_setting == 'weekends':
-            slot_applies_today = current_weekday in ['saturday', 'sunday']
-        elif days_setting == 'custom':
-            custom_days = slot.get('custom_days', [])
-            slot_applies_today = current_weekday in custom_days
-
-        if not slot_applies_today:
-            continue
-
-        # Check if current time is within the pause period
-        if start_time <= end_time:
-            # Normal case: start and end are on the same day
-            if start_time <= current_time <= end_time:
-                return True
-        else:
-            # Time spans midnight: start is before midnight, end is after midnight
-            if current_time >= start_time or current_time <= end_time:
-                return True
-
-    return False
+        await asyncio.wait_for(_pause_schedule_changed.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
 
 
 async def check_table_is_idle() -> bool:
@@ -221,12 +229,56 @@ def start_idle_led_timeout():
 @dataclass
 class MotionCommand:
     """Represents a motion command for the motion control thread."""
-    command_type: str  # 'move', 'stop', 'pause', 'resume', 'shutdown'
+    command_type: str  # 'move', 'batch', 'drain', 'stop', 'pause', 'resume', 'shutdown'
     theta: Optional[float] = None
     rho: Optional[float] = None
     speed: Optional[float] = None
     callback: Optional[Callable] = None
     future: Optional[asyncio.Future] = None
+    stream: bool = False  # Use the character-counting streaming protocol instead of waiting for 'ok'
+    x: Optional[float] = None  # Precomputed absolute machine target (skips the polar transform)
+    y: Optional[float] = None
+    batch: Optional['MotionBatch'] = None  # For 'batch' commands
+
+class MotionBatch:
+    """
+    A chunk of pattern moves, executed by the motion thread in one go.
+
+    The motion thread advances position after every move; the event loop polls it
+    instead of being woken up per move, and the future completes once for the chunk.
+    Setting cancelled makes the motion thread stop after the move in progress.
+    """
+
+    def __init__(self, moves, start, end, speed, stream, future):
+        self.moves = moves  # [(coordinate index, theta, rho, x, y)], x/y None without a precomputed target
+        self.start = start
+        self.end = end  # Coordinates [start, end) are covered, including coalesced ones
+        self.speed = speed
+        self.stream = stream
+        self.future = future
+        self.position = start  # Coordinates before this one have been executed
+        self.sent = 0  # Moves executed
+        self.cancelled = False
+
+# Moves per MotionBatch, and how many batches are queued ahead of the motion thread
+MOTION_BATCH_SIZE = 64
+MOTION_BATCHES_IN_FLIGHT = 2
+# Seconds between progress updates while a batch runs
+MOTION_POLL_INTERVAL = 0.1
+
+# Machine targets for coordinates[start:], from _plan_machine_targets
+_MotionPlan = namedtuple('_MotionPlan', ['start', 'x', 'y', 'send_flags'])
+
+# Seconds without any controller response before an unacknowledged streamed line is assumed lost
+STREAM_ACK_TIMEOUT = 30.0
+
+MOVE_SECONDS = metrics.histogram(
+    'dune_weaver_motion_move_seconds',
+    "Motion thread time per move: until its 'ok', or until it is buffered when streaming")
+SERIAL_RETRIES = metrics.counter(
+    'dune_weaver_serial_retries_total', 'G-code lines sent again after a failed send or read')
+LOST_ACKS = metrics.counter(
+    'dune_weaver_stream_lost_acks_total', "Streamed lines whose 'ok' never arrived")
 
 class MotionControlThread:
     """Dedicated thread for hardware motion control operations."""
@@ -236,6 +288,11 @@ class MotionControlThread:
         self.thread = None
         self.running = False
         self.paused = False
+        # GRBL character-counting state: (gcode, byte length) of every streamed
+        # line that the controller has not acknowledged yet, oldest first
+        self.inflight_lines = deque()
+        self.inflight_bytes = 0
+        self._last_ack_time = 0.0
 
     def start(self):
         """Start the motion control thread."""
@@ -258,6 +315,17 @@ class MotionControlThread:
 
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=5.0)
+
+        # Release anyone still waiting on a command that will never run
+        while True:
+            try:
+                command = self.command_queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                self._resolve_future(command.batch.future if command.batch else command.future)
+            except RuntimeError:
+                pass  # Event loop already closed
         logger.info("Motion control thread stopped")
 
     def _motion_loop(self):
@@ -275,12 +343,19 @@ class MotionControlThread:
                 elif command.command_type == 'move':
                     self._execute_move(command)
 
+                elif command.command_type == 'batch':
+                    self._execute_batch(command.batch)
+
                 elif command.command_type == 'pause':
                     self.paused = True
 
                 elif command.command_type == 'resume':
                     self.paused = False
 
+                elif command.command_type == 'drain':
+                    self._drain_stream_sync()
+                    self._resolve_future(command.future)
+
                 elif command.command_type == 'stop':
                     # Clear any pending commands
                     while not self.command_queue.empty():
@@ -288,11 +363,14 @@ class MotionControlThread:
                             self.command_queue.get_nowait()
                         except queue.Empty:
                             break
+                    self._drain_stream_sync()
 
                 self.command_queue.task_done()
 
             except queue.Empty:
-                # Timeout - continue loop for shutdown check
+                # Timeout - collect acknowledgements for lines streamed before going idle
+                if self.inflight_lines:
+                    self._drain_stream_sync()
                 continue
             except Exception as e:
                 logger.error(f"Error in motion control thread: {e}")
@@ -310,13 +388,16 @@ class MotionControlThread:
                 return
 
             # Execute the actual motion using sync version
-            self._move_polar_sync(command.theta, command.rho, command.speed)
+            move_started = time.perf_counter()
+            if command.x is not None and command.y is not None:
+                self._move_machine_sync(command.theta, command.rho, command.x, command.y,
+                                        command.speed, stream=command.stream)
+            else:
+                self._move_polar_sync(command.theta, command.rho, command.speed, stream=command.stream)
+            MOVE_SECONDS.observe(time.perf_counter() - move_started)
 
             # Signal completion if future provided
-            if command.future and not command.future.done():
-                command.future.get_loop().call_soon_threadsafe(
-                    command.future.set_result, None
-                )
+            self._resolve_future(command.future)
 
         except Exception as e:
             logger.error(f"Error executing move command: {e}")
@@ -325,7 +406,39 @@ class MotionControlThread:
                     command.future.set_exception, e
                 )
 
-    def _move_polar_sync(self, theta: float, rho: float, speed: Optional[float] = None):
+    def _execute_batch(self, batch: MotionBatch):
+        """Execute the moves of a batch until it ends, is cancelled or the pattern is stopped."""
+        try:
+            for index, theta, rho, x, y in batch.moves:
+                while self.paused and self.running and not batch.cancelled:
+                    time.sleep(0.1)
+                if not self.running or batch.cancelled or state.stop_requested:
+                    break
+
+                move_started = time.perf_counter()
+                if x is not None:
+                    self._move_machine_sync(theta, rho, x, y, batch.speed, stream=batch.stream)
+                else:
+                    self._move_polar_sync(theta, rho, batch.speed, stream=batch.stream)
+                MOVE_SECONDS.observe(time.perf_counter() - move_started)
+                batch.sent += 1
+                batch.position = index + 1
+            else:
+                batch.position = batch.end
+
+            self._resolve_future(batch.future)
+
+        except Exception as e:
+            logger.error(f"Error executing motion batch: {e}")
+            if not batch.future.done():
+                batch.future.get_loop().call_soon_threadsafe(batch.future.set_exception, e)
+
+    def _resolve_future(self, future: Optional[asyncio.Future]):
+        """Complete an asyncio future from the motion thread."""
+        if future and not future.done():
+            future.get_loop().call_soon_threadsafe(future.set_result, None)
+
+    def _move_polar_sync(self, theta: float, rho: float, speed: Optional[float] = None, stream: bool = False):
         """Synchronous version of move_polar for use in motion thread."""
         # This is the original sync logic but running in dedicated thread
         if state.table_type == 'dune_weaver_mini':
@@ -357,7 +470,7 @@ class MotionControlThread:
         actual_speed = speed if speed is not None else state.speed
 
         # Call sync version of send_grbl_coordinates in this thread
-        self._send_grbl_coordinates_sync(round(new_x_abs, 3), round(new_y_abs, 3), actual_speed)
+        self._send_grbl_coordinates_sync(round(new_x_abs, 3), round(new_y_abs, 3), actual_speed, stream=stream)
 
         # Update state
         state.current_theta = theta
@@ -365,10 +478,29 @@ class MotionControlThread:
         state.machine_x = new_x_abs
         state.machine_y = new_y_abs
 
-    def _send_grbl_coordinates_sync(self, x: float, y: float, speed: int = 600, timeout: int = 2, home: bool = False):
+    def _move_machine_sync(self, theta: float, rho: float, x: float, y: float,
+                           speed: Optional[float] = None, stream: bool = False):
+        """Move to a machine position precomputed by theta_rho_engine.compute_machine_targets."""
+        actual_speed = speed if speed is not None else state.speed
+
+        self._send_grbl_coordinates_sync(round(x, 3), round(y, 3), actual_speed, stream=stream)
+
+        state.current_theta = theta
+        state.current_rho = rho
+        state.machine_x = x
+        state.machine_y = y
+
+    def _send_grbl_coordinates_sync(self, x: float, y: float, speed: int = 600, timeout: int = 2, home: bool = False, stream: bool = False):
         """Synchronous version of send_grbl_coordinates for motion thread."""
         logger.debug(f"Motion thread sending G-code: X{x} Y{y} at F{speed}")
 
+        if stream and not home:
+            return self._stream_gcode_sync(f"G1 X{x} Y{y} F{speed}")
+
+        # Collect outstanding streamed acknowledgements so the 'ok' below belongs to this line
+        if self.inflight_lines:
+            self._drain_stream_sync()
+
         # Track overall attempt time
         overall_start_time = time.time()
 
@@ -380,51 +512,137 @@ class MotionControlThread:
 
                 start_time = time.time()
                 while True:
-                    response = state.conn.readline()
+                    response = state.conn.read_ack()
                     logger.debug(f"Motion thread response: {response}")
                     if response.lower() == "ok":
                         logger.debug("Motion thread: Command execution confirmed.")
                         return
+                    if response:
+                        # The controller rejected the line; waiting longer won't produce an 'ok'
+                        logger.warning(f"Motion thread: Controller rejected {gcode}: {response}")
+                        return
 
             except Exception as e:
                 error_str = str(e)
                 logger.warning(f"Motion thread error sending command: {error_str}")
 
                 # Immediately return for device not configured errors
-                if "Device not configured" in error_str or "Errno 6" in error_str:
-                    logger.error(f"Motion thread: Device configuration error detected: {error_str}")
-                    state.stop_requested = True
-                    state.conn = None
-                    state.is_connected = False
-                    logger.info("Connection marked as disconnected due to device error")
+                if self._is_device_error(error_str):
+                    self._mark_disconnected(error_str)
                     return False
 
             logger.warning(f"Motion thread: No 'ok' received for X{x} Y{y}, speed {speed}. Retrying...")
+            SERIAL_RETRIES.inc()
+            time.sleep(0.1)
+
+    def _stream_gcode_sync(self, gcode: str):
+        """
+        Send a line using the GRBL character-counting protocol.
+
+        The line is written as soon as it fits in the controller's RX buffer
+        instead of after the previous line's 'ok', so the planner never runs dry
+        between segments. Each 'ok'/'error' acknowledges the oldest in-flight line.
+        """
+        line = gcode + "\n"
+        line_length = len(line)
+
+        # Wait for acknowledgements until the line fits in the controller's RX buffer
+        while self.inflight_lines and self.inflight_bytes + line_length > state.grbl_rx_buffer_size:
+            if not self._read_stream_ack():
+                return False
+
+        try:
+            state.conn.send(line)
+        except Exception as e:
+            error_str = str(e)
+            logger.warning(f"Motion thread error streaming command: {error_str}")
+            if self._is_device_error(error_str):
+                self._mark_disconnected(error_str)
+            return False
+
+        if not self.inflight_lines:
+            self._last_ack_time = time.time()
+        self.inflight_lines.append((gcode, line_length))
+        self.inflight_bytes += line_length
+        logger.debug(f"Motion thread streamed command: {gcode} ({self.inflight_bytes} bytes in flight)")
+        return True
+
+    def _read_stream_ack(self) -> bool:
+        """
+        Read one controller acknowledgement and match it against the oldest in-flight line.
+        Returns False if the connection is lost.
+        """
+        try:
+            response = state.conn.read_ack()
+        except Exception as e:
+            error_str = str(e)
+            logger.warning(f"Motion thread error reading stream response: {error_str}")
+            if self._is_device_error(error_str):
+                self._mark_disconnected(error_str)
+                return False
             time.sleep(0.1)
+            return True
+
+        if not response:
+            # Read timed out; a lost 'ok' would otherwise stall the stream forever
+            if time.time() - self._last_ack_time > STREAM_ACK_TIMEOUT:
+                gcode, line_length = self.inflight_lines.popleft()
+                self.inflight_bytes -= line_length
+                self._last_ack_time = time.time()
+                LOST_ACKS.inc()
+                logger.warning(f"Motion thread: No 'ok' received for {gcode} after {STREAM_ACK_TIMEOUT}s, assuming it was lost")
+            return True
+
+        logger.debug(f"Motion thread stream response: {response}")
+        is_ok = response.lower() == "ok"
+        gcode, line_length = self.inflight_lines.popleft()
+        self.inflight_bytes -= line_length
+        self._last_ack_time = time.time()
+        if not is_ok:
+            logger.warning(f"Motion thread: Controller rejected {gcode}: {response}")
+        return True
+
+    def _drain_stream_sync(self):
+        """Block until every streamed line has been acknowledged by the controller."""
+        while self.inflight_lines:
+            if not state.conn or not self._read_stream_ack():
+                break
+        self._reset_stream()
+
+    def _reset_stream(self):
+        """Forget all in-flight lines (after a drain or a lost connection)."""
+        self.inflight_lines.clear()
+        self.inflight_bytes = 0
+
+    def _is_device_error(self, error_str: str) -> bool:
+        """Check whether an I/O error means the controller has gone away."""
+        return "Device not configured" in error_str or "Errno 6" in error_str
+
+    def _mark_disconnected(self, error_str: str):
+        """Stop execution and drop the connection after a fatal device error."""
+        logger.error(f"Motion thread: Device configuration error detected: {error_str}")
+        state.stop_requested = True
+        state.conn = None
+        state.is_connected = False
+        self._reset_stream()
+        logger.info("Connection marked as disconnected due to device error")
 
 # Global motion control thread instance
 motion_controller = MotionControlThread()
 
+metrics.gauge('dune_weaver_motion_queue_depth', 'Commands waiting for the motion thread',
+              function=lambda: motion_controller.command_queue.qsize())
+metrics.gauge('dune_weaver_motion_inflight_bytes', 'Streamed bytes not yet acknowledged by the controller',
+              function=lambda: motion_controller.inflight_bytes)
+
 async def cleanup_pattern_manager():
     """Clean up pattern manager resources"""
-    global progress_update_task, pattern_lock, pause_event
+    global pattern_lock, pause_event
 
     try:
         # Stop motion control thread
         motion_controller.stop()
 
-        # Cancel progress update task if running
-        if progress_update_task and not progress_update_task.done():
-            try:
-                progress_update_task.cancel()
-                # Wait for task to actually cancel
-                try:
-                    await progress_update_task
-                except asyncio.CancelledError:
-                    pass
-            except Exception as e:
-                logger.error(f"Error cancelling progress update task: {e}")
-
         # Clean up pattern lock
         if pattern_lock:
             try:
@@ -468,26 +686,16 @@ async def cleanup_pattern_manager():
         logger.error(f"Error during pattern manager cleanup: {e}")
     finally:
         # Ensure we always reset these
-        progress_update_task = None
         pattern_lock = None
         pause_event = None
 
 def list_theta_rho_files():
-    files = []
-    for root, dirs, filenames in os.walk(THETA_RHO_DIR):
-        # Skip cached_images directories to avoid scanning thousands of WebP files
-        if 'cached_images' in dirs:
-            dirs.remove('cached_images')
-
-        # Filter .thr files during traversal for better performance
-        thr_files = [f for f in filenames if f.endswith('.thr')]
-
-        for file in thr_files:
-            relative_path = os.path.relpath(os.path.join(root, file), THETA_RHO_DIR)
-            # Normalize path separators to always use forward slashes for consistency across platforms
-            relative_path = relative_path.replace(os.sep, '/')
-            files.append(relative_path)
+    """List all .thr files, relative to THETA_RHO_DIR with forward slashes.
 
+    Served from the pattern library index while its watcher runs, otherwise the
+    directory tree is walked.
+    """
+    files = pattern_library.files()
     logger.debug(f"Found {len(files)} theta-rho files")
     return files
 
@@ -669,6 +877,11 @@ def is_clear_pattern(file_path):
             f'./patterns/clear_from_in{("_" + table_type.split("_")[-1]) if table_type != "dune_weaver" else ""}.thr',
             f'./patterns/clear_sideway{("_" + table_type.split("_")[-1]) if table_type != "dune_weaver" else ""}.thr'
         ])
+    clear_patterns.extend(['./patterns/clear_from_out_Ultra.thr', './patterns/clear_from_in_Ultra.thr'])
+    # Custom clear patterns chosen in settings (see get_clear_pattern_file)
+    for custom in (state.custom_clear_from_out, state.custom_clear_from_in):
+        if custom:
+            clear_patterns.append(os.path.join('./patterns', custom))
     
     # Normalize paths for comparison
     normalized_path = os.path.normpath(file_path)
@@ -677,6 +890,23 @@ def is_clear_pattern(file_path):
     # Check if the file path matches any clear pattern path
     return normalized_path in normalized_clear_patterns
 
+def _estimate_remaining_time(done, total, rate, predicted_time, active_time):
+    """
+    Remaining seconds of a running pattern.
+
+    Blends the predicted run time with the measured rate (coordinates/s), trusting
+    the measurement more as the pattern progresses; the prediction carries the
+    first minutes, when the rate is still noise.
+    """
+    rate_remaining = (total - done) / rate if rate else None
+    if predicted_time is None:
+        return rate_remaining or 0
+    predicted_remaining = max(0.0, predicted_time - active_time)
+    if rate_remaining is None:
+        return predicted_remaining
+    progress = done / total if total else 1.0
+    return (1 - progress) * predicted_remaining + progress * rate_remaining
+
 async def run_theta_rho_file(file_path, is_playlist=False):
     """Run a theta-rho file by sending data in optimized batches with tqdm ETA tracking."""
     if pattern_lock.locked():
@@ -684,12 +914,11 @@ async def run_theta_rho_file(file_path, is_playlist=False):
         return
 
     async with pattern_lock:  # This ensures only one pattern can run at a time
-        # Start progress update task only if not part of a playlist
-        global progress_update_task
-        if not is_playlist and not progress_update_task:
-            progress_update_task = asyncio.create_task(broadcast_progress())
-        
-        coordinates = parse_theta_rho_file(file_path)
+        # Import locally to avoid circular import
+        from modules.core.compiled_patterns import load_coordinates
+
+        # Coordinates are read lazily from the memory-mapped compiled pattern
+        coordinates = await asyncio.to_thread(load_coordinates, file_path)
         total_coordinates = len(coordinates)
 
         if total_coordinates < 2:
@@ -710,11 +939,20 @@ async def run_theta_rho_file(file_path, is_playlist=False):
 
         state.execution_progress = (0, total_coordinates, None, 0)
 
+        # In a seamless playlist the table doesn't stop at the end of a pattern. When the
+        # previous pattern ended that way, its moves are still being drawn and this one is
+        # streamed right behind them from the tracked position
+        global _seamless_continuation
+        seamless = is_playlist and state.seamless_playlist
+        continuing = seamless and _seamless_continuation
+        _seamless_continuation = False
+
         # stop actions without resetting the playlist, and don't wait for lock (we already have it)
-        await stop_actions(clear_playlist=False, wait_for_lock=False)
+        await stop_actions(clear_playlist=False, wait_for_lock=False, drain=not continuing)
 
         state.current_playing_file = file_path
         state.stop_requested = False
+        status_publisher.notify()
 
         # Reset LED idle timeout activity time when pattern starts
         import time as time_module
@@ -722,7 +960,10 @@ async def run_theta_rho_file(file_path, is_playlist=False):
 
         logger.info(f"Starting pattern execution: {file_path}")
         logger.info(f"t: {state.current_theta}, r: {state.current_rho}")
-        await reset_theta()
+        if continuing:
+            normalize_theta()
+        else:
+            await reset_theta()
 
         start_time = time.time()
         total_pause_time = 0  # Track total time spent paused (manual + scheduled)
@@ -732,6 +973,31 @@ async def run_theta_rho_file(file_path, is_playlist=False):
             # Cancel idle timeout when playing starts
             idle_timeout_manager.cancel_timeout()
 
+        # Expected run time from the pattern's geometry and past runs, for the ETA
+        geometry = None
+        predicted_time = None
+        try:
+            from modules.core.cache_manager import get_pattern_geometry, get_execution_estimator
+            pattern_file = os.path.relpath(file_path, THETA_RHO_DIR).replace(os.sep, '/')
+            geometry = await asyncio.to_thread(get_pattern_geometry, pattern_file)
+            estimator = await asyncio.to_thread(get_execution_estimator)
+            start_speed = state.clear_pattern_speed if (is_clear_file and state.clear_pattern_speed is not None) else state.speed
+            predicted_time = estimator.predict(geometry, start_speed)
+            if predicted_time is not None:
+                logger.info(f"Predicted execution time: {predicted_time:.0f}s")
+        except Exception as e:
+            logger.warning(f"Could not predict execution time: {e}")
+
+        # With NumPy, every machine target is computed up front in one batch, along with
+        # which of them have to be sent (see segment_coalescer). Clear patterns reuse a
+        # plan computed once for the current settings (see clear_pattern_plans)
+        plan = None
+        if NUMPY_AVAILABLE:
+            if is_clear_file:
+                plan = _MotionPlan(0, *await asyncio.to_thread(clear_pattern_plans.plan, file_path, coordinates))
+            else:
+                plan = _MotionPlan(0, *await asyncio.to_thread(_plan_machine_targets, coordinates, 0))
+
         with tqdm(
             total=total_coordinates,
             unit="coords",
@@ -740,8 +1006,29 @@ async def run_theta_rho_file(file_path, is_playlist=False):
             disable=False,
             mininterval=1.0
         ) as pbar:
-            for i, coordinate in enumerate(coordinates):
-                theta, rho = coordinate
+            # The motion thread works through chunks of moves; up to MOTION_BATCHES_IN_FLIGHT
+            # are queued so it never waits for the next one. Stop, skip and pause cancel the
+            # queued chunks, which end after the move in progress.
+            batches = deque()
+            next_index = 0  # First coordinate not handed to the motion thread yet
+            done = 0  # Coordinates executed (or coalesced away) by the motion thread
+            moves_sent = 0
+            while done < total_coordinates:
+                manual_pause = state.pause_requested
+                # Only check scheduled pause during pattern if "finish pattern first" is NOT enabled
+                scheduled_pause = is_in_scheduled_pause_period() if not state.scheduled_pause_finish_pattern else False
+
+                if state.stop_requested or state.skip_requested or manual_pause or scheduled_pause:
+                    for batch in batches:
+                        batch.cancelled = True
+                    await asyncio.gather(*(batch.future for batch in batches), return_exceptions=True)
+                    if batches:
+                        done = resume_index(batches)
+                        moves_sent += sum(batch.sent for batch in batches)
+                    batches.clear()
+                    next_index = done
+                    pbar.update(done - pbar.n)
+
                 if state.stop_requested:
                     logger.info("Execution stopped by user")
                     if state.led_controller:
@@ -751,6 +1038,7 @@ async def run_theta_rho_file(file_path, is_playlist=False):
 
                 if state.skip_requested:
                     logger.info("Skipping pattern...")
+                    await flush_motion_stream()
                     await connection_manager.check_idle_async()
                     if state.led_controller:
                         await state.led_controller.effect_idle_async(state.dw_led_idle_effect)
@@ -758,11 +1046,8 @@ async def run_theta_rho_file(file_path, is_playlist=False):
                     break
 
                 # Wait for resume if paused (manual or scheduled)
-                manual_pause = state.pause_requested
-                # Only check scheduled pause during pattern if "finish pattern first" is NOT enabled
-                scheduled_pause = is_in_scheduled_pause_period() if not state.scheduled_pause_finish_pattern else False
-
                 if manual_pause or scheduled_pause:
+                    paused_position = (state.current_theta, state.current_rho, state.machine_x, state.machine_y)
                     pause_start = time.time()  # Track when pause started
                     if manual_pause and scheduled_pause:
                         logger.info("Execution paused (manual + scheduled pause active)...")
@@ -785,11 +1070,12 @@ async def run_theta_rho_file(file_path, is_playlist=False):
                     wled_was_off_for_scheduled = scheduled_pause and state.scheduled_pause_control_wled and not manual_pause
 
                     # Wait until both manual pause is released AND we're outside scheduled pause period
-                    while state.pause_requested or is_in_scheduled_pause_period():
-                        await asyncio.sleep(1)  # Check every second
-                        # Also wait for the pause event in case of manual pause
+                    while (state.pause_requested or is_in_scheduled_pause_period()) and not state.stop_requested:
                         if state.pause_requested:
+                            await asyncio.sleep(1)
                             await pause_event.wait()
+                        else:
+                            await wait_for_pause_schedule_change()
 
                     total_pause_time += time.time() - pause_start  # Add pause duration
                     logger.info("Execution resumed...")
@@ -805,30 +1091,58 @@ async def run_theta_rho_file(file_path, is_playlist=False):
                         # Cancel idle timeout when resuming from pause
                         idle_timeout_manager.cancel_timeout()
 
-                # Dynamically determine the speed for each movement
-                # Use clear_pattern_speed if it's set and this is a clear file, otherwise use state.speed
-                if is_clear_file and state.clear_pattern_speed is not None:
-                    current_speed = state.clear_pattern_speed
-                else:
-                    current_speed = state.speed
-                    
-                await move_polar(theta, rho, current_speed)
-                
+                    if plan and (state.current_theta, state.current_rho, state.machine_x, state.machine_y) != paused_position:
+                        # Position changed while paused (e.g. a manual move) - replan the rest
+                        logger.info(f"Table position changed during pattern, replanning from coordinate {done}")
+                        plan = _MotionPlan(done, *await asyncio.to_thread(_plan_machine_targets, coordinates, done))
+                    continue
+
+                while next_index < total_coordinates and len(batches) < MOTION_BATCHES_IN_FLIGHT:
+                    # Speed is picked up per chunk, so a speed change applies within a chunk or two
+                    # Use clear_pattern_speed if it's set and this is a clear file, otherwise use state.speed
+                    if is_clear_file and state.clear_pattern_speed is not None:
+                        current_speed = state.clear_pattern_speed
+                    else:
+                        current_speed = state.speed
+                    moves, end = _next_motion_chunk(coordinates, next_index, plan)
+                    batches.append(submit_motion_batch(moves, next_index, end, current_speed, stream=state.gcode_streaming))
+                    next_index = end
+
+                # Wait for the oldest chunk, waking up regularly to report progress and check for interruptions
+                batch = batches[0]
+                await asyncio.wait([batch.future], timeout=MOTION_POLL_INTERVAL)
+                if batch.future.done():
+                    batches.popleft()
+                    moves_sent += batch.sent
+                    if batch.future.exception():
+                        for pending in batches:
+                            pending.cancelled = True
+                        raise batch.future.exception()
+                done = batch.position
+
                 # Update progress for all coordinates including the first one
-                pbar.update(1)
+                pbar.update(done - pbar.n)
                 elapsed_time = time.time() - start_time
-                estimated_remaining_time = (total_coordinates - (i + 1)) / pbar.format_dict['rate'] if pbar.format_dict['rate'] and total_coordinates else 0
-                state.execution_progress = (i + 1, total_coordinates, estimated_remaining_time, elapsed_time)
-                
-                # Add a small delay to allow other async operations
-                await asyncio.sleep(0.001)
+                estimated_remaining_time = _estimate_remaining_time(
+                    done, total_coordinates, pbar.format_dict['rate'], predicted_time, elapsed_time - total_pause_time
+                )
+                state.execution_progress = (done, total_coordinates, estimated_remaining_time, elapsed_time)
+
+        coalesced_moves = done - moves_sent
+        if coalesced_moves:
+            logger.info(f"Coalesced {coalesced_moves} of {total_coordinates} moves, "
+                        f"saving {coalesced_moves} G-code lines")
+
+        # Wait for the controller to accept every streamed line before measuring completion
+        await flush_motion_stream()
 
         # Update progress one last time to show 100%
         elapsed_time = time.time() - start_time
         actual_execution_time = elapsed_time - total_pause_time
         state.execution_progress = (total_coordinates, total_coordinates, 0, elapsed_time)
-        # Give WebSocket a chance to send the final update
-        await asyncio.sleep(0.1)
+        if not seamless:
+            # Give WebSocket a chance to send the final update
+            await asyncio.sleep(0.1)
 
         # Log execution time (only for completed patterns, not stopped/skipped)
         was_completed = not state.stop_requested and not state.skip_requested
@@ -840,17 +1154,24 @@ async def run_theta_rho_file(file_path, is_playlist=False):
             speed=effective_speed,
             actual_time=actual_execution_time,
             total_coordinates=total_coordinates,
-            was_completed=was_completed
+            was_completed=was_completed,
+            geometry=geometry,
+            coalesced_moves=coalesced_moves if plan else None
         )
 
         if not state.conn:
             logger.error("Device is not connected. Stopping pattern execution.")
             return
-            
-        await connection_manager.check_idle_async()
-        
-        # Set LED back to idle when pattern completes normally (not stopped early)
-        if state.led_controller and not state.stop_requested:
+
+        if seamless and not state.stop_requested:
+            # The table keeps moving into the next pattern
+            _seamless_continuation = True
+            _save_position_periodically()
+        else:
+            await connection_manager.check_idle_async()
+
+        # Set LED back to idle when pattern completes normally (not stopped early or continuing seamlessly)
+        if state.led_controller and not state.stop_requested and not seamless:
             logger.info(f"Setting LED to idle effect: {state.dw_led_idle_effect}")
             await state.led_controller.effect_idle_async(state.dw_led_idle_effect)
             start_idle_led_timeout()
@@ -863,16 +1184,52 @@ async def run_theta_rho_file(file_path, is_playlist=False):
             logger.info("Pattern execution completed and state cleared")
         else:
             logger.info("Pattern execution completed, maintaining state for playlist")
-        
-        # Only cancel progress update task if not part of a playlist
-        if not is_playlist and progress_update_task:
-            progress_update_task.cancel()
-            try:
-                await progress_update_task
-            except asyncio.CancelledError:
-                pass
-            progress_update_task = None
-            
+        status_publisher.notify()
+
+
+# Background preparation of the next playlist patterns; kept referenced while it runs
+_prefetch_task = None
+
+# Seconds between position saves while a seamless playlist keeps the table moving
+SEAMLESS_POSITION_SAVE_INTERVAL = 60
+_last_position_save = 0.0
+# Set when a pattern ended without waiting for the table to stop
+_seamless_continuation = False
+
+def _prefetch_patterns(file_paths):
+    """
+    Prepare upcoming playlist patterns: compile them and read them into the page
+    cache, and plan clear patterns for the current settings (see clear_pattern_plans).
+    """
+    from modules.core.compiled_patterns import prefetch
+
+    for file_path in file_paths:
+        # stop_requested is also set briefly at every pattern start; a stop clears the playlist
+        if state.current_playlist is None:
+            return
+        try:
+            started = time.perf_counter()
+            coordinates = prefetch(file_path)
+            if NUMPY_AVAILABLE and is_clear_pattern(file_path):
+                clear_pattern_plans.warm(file_path, coordinates)
+            logger.debug(f"Prefetched {os.path.basename(file_path)} in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            logger.warning(f"Could not prefetch {file_path}: {e}")
+
+async def _countdown_pause(pause_time):
+    """Wait pause_time seconds between patterns, updating state.pause_time_remaining."""
+    pause_start = time.time()
+    while True:
+        remaining = pause_start + pause_time - time.time()
+        if remaining <= 0:
+            break
+        state.pause_time_remaining = remaining
+        if state.skip_requested:
+            logger.info("Pause interrupted by stop/skip request")
+            break
+        # Sleep to the end exactly instead of up to a second past it
+        await asyncio.sleep(min(1.0, remaining))
+    state.pause_time_remaining = 0
 
 async def run_theta_rho_files(file_paths, pause_time=0, clear_pattern=None, run_mode="single", shuffle=False):
     """Run multiple .thr files in sequence with options."""
@@ -885,16 +1242,13 @@ async def run_theta_rho_files(file_paths, pause_time=0, clear_pattern=None, run_
     # Set initial playlist state
     state.playlist_mode = run_mode
     state.current_playlist_index = 0
-    # Start progress update task for the playlist
-    global progress_update_task
-    if not progress_update_task:
-        progress_update_task = asyncio.create_task(broadcast_progress())
-    
-    
+    status_publisher.notify()
+
     if shuffle:
         random.shuffle(file_paths)
         logger.info("Playlist shuffled")
 
+    global _prefetch_task
     try:
         while True:
             # Load metadata cache once for all patterns (significant performance improvement)
@@ -948,6 +1302,8 @@ async def run_theta_rho_files(file_paths, pause_time=0, clear_pattern=None, run_
                     if state.patterns_since_last_home >= state.auto_home_after_patterns:
                         logger.info(f"Auto-homing triggered after {state.patterns_since_last_home} patterns")
                         try:
+                            if state.seamless_playlist:
+                                await _settle_motion()
                             # Perform homing using connection_manager
                             success = await asyncio.to_thread(connection_manager.home)
                             if success:
@@ -961,6 +1317,14 @@ async def run_theta_rho_files(file_paths, pause_time=0, clear_pattern=None, run_
                 # Update state for main patterns only
                 logger.info(f"Running pattern {file_path}")
 
+                # Prepare the next patterns (a clear pattern and the pattern after it)
+                # in the background while this one draws
+                upcoming = pattern_sequence[idx + 1:idx + 3]
+                if run_mode == "indefinite" and not shuffle:
+                    upcoming += pattern_sequence[:max(0, idx + 3 - len(pattern_sequence))]
+                if upcoming and (_prefetch_task is None or _prefetch_task.done()):
+                    _prefetch_task = asyncio.create_task(asyncio.to_thread(_prefetch_patterns, upcoming))
+
                 # Execute the pattern
                 await run_theta_rho_file(file_path, is_playlist=True)
 
@@ -972,6 +1336,8 @@ async def run_theta_rho_files(file_paths, pause_time=0, clear_pattern=None, run_
                 # Check for scheduled pause after pattern completes (when "finish pattern first" is enabled)
                 if state.scheduled_pause_finish_pattern and is_in_scheduled_pause_period() and not state.stop_requested:
                     logger.info("Pattern completed. Entering Still Sands period (finish pattern first mode)...")
+                    if state.seamless_playlist:
+                        await _settle_motion()
 
                     # Turn off LED controller if control_wled is enabled
                     wled_was_off_for_scheduled = False
@@ -985,7 +1351,7 @@ async def run_theta_rho_files(file_paths, pause_time=0, clear_pattern=None, run_
 
                     # Wait until we're outside the scheduled pause period
                     while is_in_scheduled_pause_period() and not state.stop_requested:
-                        await asyncio.sleep(1)
+                        await wait_for_pause_schedule_change()
 
                     if not state.stop_requested:
                         logger.info("Still Sands period ended. Resuming playlist...")
@@ -1005,14 +1371,10 @@ async def run_theta_rho_files(file_paths, pause_time=0, clear_pattern=None, run_
                     else:
                         logger.info(f"Pausing for {pause_time} seconds")
                         state.original_pause_time = pause_time
-                        pause_start = time.time()
-                        while time.time() - pause_start < pause_time:
-                            state.pause_time_remaining = pause_start + pause_time - time.time()
-                            if state.skip_requested:
-                                logger.info("Pause interrupted by stop/skip request")
-                                break
-                            await asyncio.sleep(1)
-                        state.pause_time_remaining = 0
+                        if state.seamless_playlist:
+                            # The pause starts once the table has stopped
+                            await _settle_motion()
+                        await _countdown_pause(pause_time)
 
                 state.skip_requested = False
 
@@ -1020,29 +1382,23 @@ async def run_theta_rho_files(file_paths, pause_time=0, clear_pattern=None, run_
                 logger.info("Playlist completed. Restarting as per 'indefinite' run mode")
                 if pause_time > 0:
                     logger.debug(f"Pausing for {pause_time} seconds before restarting")
-                    pause_start = time.time()
-                    while time.time() - pause_start < pause_time:
-                        state.pause_time_remaining = pause_start + pause_time - time.time()
-                        if state.skip_requested:
-                            logger.info("Pause interrupted by stop/skip request")
-                            break
-                        await asyncio.sleep(1)
-                    state.pause_time_remaining = 0
+                    if state.seamless_playlist:
+                        await _settle_motion()
+                    await _countdown_pause(pause_time)
                 continue
             else:
                 logger.info("Playlist completed")
                 break
 
     finally:
-        # Clean up progress update task
-        if progress_update_task:
-            progress_update_task.cancel()
+        if state.seamless_playlist:
+            # Let the last pattern finish and store where the table really is
             try:
-                await progress_update_task
-            except asyncio.CancelledError:
-                pass
-            progress_update_task = None
-            
+                await _settle_motion()
+                await connection_manager.update_machine_position()
+            except Exception as e:
+                logger.error(f"Error finishing seamless playlist: {e}")
+
         # Clear all state variables
         state.current_playing_file = None
         state.execution_progress = None
@@ -1057,13 +1413,15 @@ async def run_theta_rho_files(file_paths, pause_time=0, clear_pattern=None, run_
 
         logger.info("All requested patterns completed (or stopped) and state cleared")
 
-async def stop_actions(clear_playlist = True, wait_for_lock = True):
+async def stop_actions(clear_playlist = True, wait_for_lock = True, drain = True):
     """Stop all current actions and wait for pattern to fully release.
 
     Args:
         clear_playlist: Whether to clear playlist state
         wait_for_lock: Whether to wait for pattern_lock to be released. Set to False when
                       called from within pattern execution to avoid deadlock.
+        drain: Whether to wait for streamed moves and re-read the machine position.
+               Seamless playlists skip this between patterns to keep the planner full.
     """
     try:
         with state.pause_condition:
@@ -1080,12 +1438,9 @@ async def stop_actions(clear_playlist = True, wait_for_lock = True):
                 state.playlist_mode = None
                 state.pause_time_remaining = 0
 
-                # Cancel progress update task if we're clearing the playlist
-                global progress_update_task
-                if progress_update_task and not progress_update_task.done():
-                    progress_update_task.cancel()
-
             state.pause_condition.notify_all()
+        _pause_schedule_changed.set()
+        status_publisher.notify()
 
         # Wait for the pattern lock to be released before continuing
         # This ensures that when stop_actions completes, the pattern has fully stopped
@@ -1096,6 +1451,12 @@ async def stop_actions(clear_playlist = True, wait_for_lock = True):
             async with pattern_lock:
                 logger.info("Pattern lock acquired - pattern has fully stopped")
 
+        if not drain:
+            return
+
+        # Let the controller accept every streamed line before recording the position
+        await flush_motion_stream()
+
         # Call async function directly since we're in async context
         await connection_manager.update_machine_position()
     except Exception as e:
@@ -1106,7 +1467,79 @@ async def stop_actions(clear_playlist = True, wait_for_lock = True):
         except Exception as update_err:
             logger.error(f"Error updating machine position on error: {update_err}")
 
-async def move_polar(theta, rho, speed=None):
+def _plan_machine_targets(coordinates, start_index):
+    """
+    Batch-compute machine targets for coordinates[start_index:] from the current position.
+
+    Returns (x, y, send_flags), send_flags marking the targets that coalesce_moves keeps.
+    """
+    x, y = theta_rho_engine.compute_machine_targets(
+        theta_rho_engine.as_array(coordinates)[start_index:],
+        state.current_theta, state.current_rho, state.machine_x, state.machine_y,
+        state.table_type, state.x_steps_per_mm, state.y_steps_per_mm, state.gear_ratio
+    )
+    send_flags = coalesce_moves(
+        x.tolist(), y.tolist(), state.machine_x, state.machine_y,
+        state.x_steps_per_mm, state.y_steps_per_mm, state.coalesce_tolerance_steps
+    )
+    return x, y, send_flags
+
+def _next_motion_chunk(coordinates, start, plan):
+    """
+    Moves for the next MotionBatch, starting at coordinates[start].
+
+    Coordinates that the plan coalesced away are covered without a move.
+    Returns (moves, end), the chunk covering coordinates[start:end].
+    """
+    moves = []
+    index = start
+    total = len(coordinates)
+    while index < total and len(moves) < MOTION_BATCH_SIZE:
+        theta, rho = coordinates[index]
+        if plan is None:
+            moves.append((index, theta, rho, None, None))
+        elif plan.send_flags[index - plan.start]:
+            offset = index - plan.start
+            moves.append((index, theta, rho, float(plan.x[offset]), float(plan.y[offset])))
+        index += 1
+    return moves, index
+
+def resume_index(batches):
+    """
+    First coordinate not executed yet by a run of consecutive, finished or cancelled batches.
+
+    Batches run in order, so that is the position of the first one that did not
+    reach its end. A cancelled batch that never started is still at its start.
+    """
+    for batch in batches:
+        if batch.position < batch.end:
+            return batch.position
+    return batches[-1].end
+
+def submit_motion_batch(moves, start, end, speed, stream=False):
+    """
+    Queue a chunk of pattern moves on the motion control thread without waiting for it.
+
+    Args:
+        moves: [(coordinate index, theta, rho, x, y)] with x/y the precomputed machine
+               target or None
+        start, end: Range of coordinates the chunk covers
+        speed: Speed for every move of the chunk
+        stream: Stream the moves with the character-counting protocol
+
+    Returns:
+        MotionBatch; await its future, or poll its position for progress
+    """
+    if not motion_controller.running:
+        motion_controller.start()
+
+    future = asyncio.get_event_loop().create_future()
+    batch = MotionBatch(moves, start, end, speed, stream, future)
+    motion_controller.command_queue.put(MotionCommand(command_type='batch', batch=batch))
+    logger.debug(f"Queued motion batch of {len(moves)} moves for coordinates {start}-{end}")
+    return batch
+
+async def move_polar(theta, rho, speed=None, stream=False, machine_target=None):
     """
     Queue a motion command to be executed in the dedicated motion control thread.
     This makes motion control non-blocking for API endpoints.
@@ -1115,6 +1548,11 @@ async def move_polar(theta, rho, speed=None):
         theta (float): Target theta coordinate
         rho (float): Target rho coordinate
         speed (int, optional): Speed override. If None, uses state.speed
+        stream (bool): Return once the line is in the controller's RX buffer instead of
+                       waiting for its 'ok'. Call flush_motion_stream() before relying on
+                       the machine position.
+        machine_target (tuple, optional): Precomputed absolute (x, y) machine position for
+                       this move, as produced by theta_rho_engine.compute_machine_targets
     """
     # Ensure motion control thread is running
     if not motion_controller.running:
@@ -1130,20 +1568,34 @@ async def move_polar(theta, rho, speed=None):
         theta=theta,
         rho=rho,
         speed=speed,
-        future=future
+        future=future,
+        stream=stream
     )
+    if machine_target is not None:
+        command.x, command.y = machine_target
 
     motion_controller.command_queue.put(command)
     logger.debug(f"Queued motion command: theta={theta}, rho={rho}, speed={speed}")
 
     # Wait for command completion
     await future
+
+async def flush_motion_stream():
+    """Wait until the controller has acknowledged every streamed motion command."""
+    if not motion_controller.running:
+        return
+
+    loop = asyncio.get_event_loop()
+    future = loop.create_future()
+    motion_controller.command_queue.put(MotionCommand(command_type='drain', future=future))
+    await future
     
 def pause_execution():
     """Pause pattern execution using asyncio Event."""
     logger.info("Pausing pattern execution")
     state.pause_requested = True
     pause_event.clear()  # Clear the event to pause execution
+    status_publisher.notify()
     return True
 
 def resume_execution():
@@ -1151,25 +1603,48 @@ def resume_execution():
     logger.info("Resuming pattern execution")
     state.pause_requested = False
     pause_event.set()  # Set the event to resume execution
+    status_publisher.notify()
     return True
     
+def normalize_theta():
+    """Wrap theta into [0, 2*pi). Only the polar bookkeeping changes; the machine doesn't move."""
+    state.current_theta = state.current_theta % (2 * pi)
+
 async def reset_theta():
     logger.info('Resetting Theta')
-    state.current_theta = state.current_theta % (2 * pi)
+    normalize_theta()
     # Call async function directly since we're in async context
     await connection_manager.update_machine_position()
 
+def _save_position_periodically():
+    """Persist the tracked position in the background, at most every SEAMLESS_POSITION_SAVE_INTERVAL."""
+    global _last_position_save
+    now = time.monotonic()
+    if now - _last_position_save >= SEAMLESS_POSITION_SAVE_INTERVAL:
+        _last_position_save = now
+        state.save_position(0)
+
+async def _settle_motion():
+    """Wait until streamed moves have finished and record the controller's position."""
+    global _seamless_continuation
+    _seamless_continuation = False
+    await flush_motion_stream()
+    if state.conn and state.conn.is_connected():
+        await connection_manager.check_idle_async()
+
 def set_speed(new_speed):
     state.speed = new_speed
     logger.info(f'Set new state.speed {new_speed}')
+    status_publisher.notify()
 
 def get_status():
     """Get the current status of pattern execution."""
+    scheduled_pause = is_in_scheduled_pause_period()
     status = {
         "current_file": state.current_playing_file,
-        "is_paused": state.pause_requested or is_in_scheduled_pause_period(),
+        "is_paused": state.pause_requested or scheduled_pause,
         "manual_pause": state.pause_requested,
-        "scheduled_pause": is_in_scheduled_pause_period(),
+        "scheduled_pause": scheduled_pause,
         "is_running": bool(state.current_playing_file and not state.stop_requested),
         "progress": None,
         "playlist": None,
@@ -1202,23 +1677,3 @@ def get_status():
         }
     
     return status
-
-async def broadcast_progress():
-    """Background task to broadcast progress updates."""
-    from main import broadcast_status_update
-    while True:
-        # Send status updates regardless of pattern_lock state
-        status = get_status()
-        
-        # Use the existing broadcast function from main.py
-        await broadcast_status_update(status)
-            
-        # Check if we should stop broadcasting
-        if not state.current_playlist:
-            # If no playlist, only stop if no pattern is being executed
-            if not pattern_lock.locked():
-                logger.info("No playlist or pattern running, stopping broadcast")
-                break
-        
-        # Wait before next update
-        await asyncio.sleep(1)
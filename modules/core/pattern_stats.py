@@ -0,0 +1,80 @@
+"""
+Table-independent pattern statistics.
+
+Computed once per pattern version alongside the rest of the metadata, so the
+pattern browser can sort and filter on them without reading any .thr file:
+
+    theta_travel        total angular travel (radians)
+    rho_travel          total radial travel
+    min_rho, max_rho    radial extent
+    revolutions         full turns between the first and the last point
+    radial_histogram    share of the drawn path in each of RADIAL_BINS rings,
+                        from the center outwards
+
+The machine-space distance depends on the table type and lives in the
+execution estimator's geometry instead.
+"""
+import math
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+RADIAL_BINS = 10
+
+# Stats the pattern list can sort and filter on (radial_histogram is not a scalar)
+SCALAR_STATS = ('theta_travel', 'rho_travel', 'min_rho', 'max_rho', 'revolutions')
+
+
+def _bin_index(rho):
+    return min(RADIAL_BINS - 1, max(0, int(rho * RADIAL_BINS)))
+
+
+def compute_pattern_stats(coordinates):
+    """Statistics of a coordinate sequence. Returns a dict with the fields listed above."""
+    if NUMPY_AVAILABLE:
+        from modules.core.theta_rho_engine import as_array
+        coordinates = as_array(coordinates)
+        theta = coordinates[:, 0]
+        rho = coordinates[:, 1]
+        delta_theta = np.diff(theta)
+        delta_rho = np.diff(rho)
+        mid_rho = (rho[1:] + rho[:-1]) / 2
+        # Segment length in the unit disk, with the arc measured at the segment's middle radius
+        lengths = np.hypot(mid_rho * delta_theta, delta_rho)
+        bins = np.clip((mid_rho * RADIAL_BINS).astype(np.int64), 0, RADIAL_BINS - 1)
+        histogram = np.bincount(bins, weights=lengths, minlength=RADIAL_BINS)
+        theta_travel = float(np.abs(delta_theta).sum())
+        rho_travel = float(np.abs(delta_rho).sum())
+        min_rho, max_rho = float(rho.min()), float(rho.max())
+        histogram = histogram.tolist()
+        first_theta, last_theta = float(theta[0]), float(theta[-1])
+    else:
+        theta_travel = rho_travel = 0.0
+        histogram = [0.0] * RADIAL_BINS
+        min_rho = min(rho for _, rho in coordinates)
+        max_rho = max(rho for _, rho in coordinates)
+        previous = None
+        for theta, rho in coordinates:
+            if previous is not None:
+                delta_theta = theta - previous[0]
+                delta_rho = rho - previous[1]
+                mid_rho = (rho + previous[1]) / 2
+                theta_travel += abs(delta_theta)
+                rho_travel += abs(delta_rho)
+                histogram[_bin_index(mid_rho)] += math.hypot(mid_rho * delta_theta, delta_rho)
+            previous = (theta, rho)
+        first_theta, last_theta = coordinates[0][0], coordinates[-1][0]
+
+    total = sum(histogram)
+    return {
+        'theta_travel': theta_travel,
+        'rho_travel': rho_travel,
+        'min_rho': min_rho,
+        'max_rho': max_rho,
+        'revolutions': int(abs(last_theta - first_theta) // (2 * math.pi)),
+        'radial_histogram': [round(value / total, 4) if total else 0.0 for value in histogram]
+    }
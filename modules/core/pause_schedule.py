@@ -0,0 +1,139 @@
+"""
+Compiled Still Sands schedule.
+
+The scheduled pause time slots are compiled once into a weekly timeline: sorted,
+merged [start, end) intervals in seconds since Monday 00:00, local time in the
+configured zone. A slot applies to the days it lists. A slot that spans midnight
+pauses from its start to midnight and from midnight to its end on the same day,
+as the per-call check always did.
+
+is_paused() caches its answer until the next transition, so the per-coordinate
+check in the motion loop is a clock read and a comparison. next_transition()
+tells pause loops how long they can sleep.
+"""
+import bisect
+import logging
+import time
+from datetime import datetime, timedelta, time as datetime_time
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 3600
+WEEK = 7 * DAY
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+_DAY_SETS = {
+    'daily': frozenset(WEEKDAYS),
+    'weekdays': frozenset(WEEKDAYS[:5]),
+    'weekends': frozenset(WEEKDAYS[5:]),
+}
+
+
+def _seconds(value: datetime_time) -> float:
+    return value.hour * 3600 + value.minute * 60 + value.second + value.microsecond / 1e6
+
+
+def compile_intervals(slots) -> List[Tuple[float, float]]:
+    """Merged, sorted [start, end) pause intervals in seconds of the week."""
+    intervals = []
+    for slot in slots or []:
+        try:
+            start = _seconds(datetime_time.fromisoformat(slot['start_time']))
+            end = _seconds(datetime_time.fromisoformat(slot['end_time']))
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Invalid time format in scheduled pause slot: {slot}")
+            continue
+        days_setting = slot.get('days', 'daily')
+        if days_setting == 'custom':
+            days = set(slot.get('custom_days') or [])
+        else:
+            days = _DAY_SETS.get(days_setting, ())
+
+        for index, weekday in enumerate(WEEKDAYS):
+            if weekday not in days:
+                continue
+            day_start = index * DAY
+            if start <= end:
+                intervals.append((day_start + start, day_start + end))
+            else:
+                # Spans midnight: both ends of the same day
+                intervals.append((day_start, day_start + end))
+                intervals.append((day_start + start, day_start + DAY))
+
+    merged = []
+    for start, end in sorted(interval for interval in intervals if interval[1] > interval[0]):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class PauseSchedule:
+    """Answers "paused now?" and "next change at?" for one set of time slots and zone."""
+
+    def __init__(self, slots, tz_info=None):
+        """
+        Args:
+            slots: state.scheduled_pause_time_slots; kept to detect replacement
+            tz_info: ZoneInfo of the schedule, or None for the system local time
+        """
+        self.slots = slots
+        self.tz_info = tz_info
+        self.intervals = compile_intervals(slots)
+        self._starts = [start for start, _ in self.intervals]
+        self._paused = False
+        self._valid_from = 0.0
+        self._valid_until = 0.0  # Epoch seconds of the next transition
+
+    def _now(self) -> datetime:
+        try:
+            return datetime.now(self.tz_info) if self.tz_info else datetime.now()
+        except Exception as e:
+            logger.warning(f"Error getting current time: {e}")
+            return datetime.now()
+
+    def _locate(self, second: float) -> Tuple[bool, Optional[float]]:
+        """(paused, seconds until the state changes) at a second of the week."""
+        if not self.intervals:
+            return False, None
+        index = bisect.bisect_right(self._starts, second) - 1
+        if index >= 0 and second < self.intervals[index][1]:
+            end = self.intervals[index][1]
+            if end >= WEEK and self.intervals[0][0] == 0:
+                # Runs on past Sunday midnight into Monday's first interval
+                if self.intervals[0][1] >= WEEK:
+                    return True, None  # Paused all week
+                end = WEEK + self.intervals[0][1]
+            return True, end - second
+        if index + 1 < len(self.intervals):
+            return False, self.intervals[index + 1][0] - second
+        return False, WEEK + self.intervals[0][0] - second
+
+    def _evaluate(self):
+        now = self._now()
+        second = now.weekday() * DAY + _seconds(now.time())
+        paused, remaining = self._locate(second)
+        now_epoch = now.timestamp()
+        if remaining is None:
+            until = float('inf')
+        else:
+            # Wall clock arithmetic, so a DST change in between is accounted for
+            wall = now.replace(tzinfo=None) + timedelta(seconds=remaining)
+            until = (wall.replace(tzinfo=self.tz_info) if self.tz_info else wall).timestamp()
+        self._paused = paused
+        self._valid_from = now_epoch
+        self._valid_until = max(until, now_epoch)
+
+    def is_paused(self) -> bool:
+        """Whether the current time is inside a pause interval."""
+        now = time.time()
+        if not self._valid_from <= now < self._valid_until:
+            self._evaluate()
+        return self._paused
+
+    def next_transition(self) -> Optional[float]:
+        """Epoch seconds at which is_paused() changes, or None if it never does."""
+        self.is_paused()
+        return None if self._valid_until == float('inf') else self._valid_until
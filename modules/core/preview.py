@@ -1,21 +1,97 @@
 """Preview module for generating image previews of patterns."""
 import os
 import math
-import asyncio
 from io import BytesIO
 from PIL import Image, ImageDraw
-from modules.core.pattern_manager import parse_theta_rho_file, THETA_RHO_DIR
+from modules.core.pattern_manager import THETA_RHO_DIR
+from modules.core.compiled_patterns import load_coordinates
+from modules.core.theta_rho_engine import NUMPY_AVAILABLE, compute_preview_points, decimate_points_array
 
-async def generate_preview_image(pattern_file, format='WEBP'):
-    """Generate a preview for a pattern file, optimized for a 300x300 view."""
+async def generate_preview_image(pattern_file, format='WEBP', priority=None):
+    """Generate a preview for a pattern file, optimized for a 300x300 view.
+
+    Rendering runs in the preview worker pool; on-demand requests (the default
+    priority) are served before background backfill.
+    """
+    from modules.core.preview_renderer import preview_renderer, PRIORITY_ON_DEMAND
+    if priority is None:
+        priority = PRIORITY_ON_DEMAND
+    return await preview_renderer.render(pattern_file, format=format, priority=priority)
+
+# Final display size
+DISPLAY_SIZE = 512
+# Lines are drawn at this multiple of the display size and box-filtered down, since
+# PIL draws lines without antialiasing
+SUPERSAMPLE = 2
+# Blank border around the table, as a fraction of the image size
+MARGIN_FRACTION = 10.0 / 2048
+LINE_COLOR = "black"
+
+
+def decimate_points(points_to_draw, cell_size=1.0):
+    """
+    Pixel-bucket decimation of a flat [x0, y0, x1, y1, ...] polyline.
+
+    Points that fall into the same cell_size pixel as the point before them are
+    dropped, so a dense pattern is drawn with at most a few segments per pixel.
+    The first and last point are always kept.
+    """
+    if len(points_to_draw) <= 4:
+        return points_to_draw
+    if NUMPY_AVAILABLE:
+        return decimate_points_array(points_to_draw, cell_size)
+
+    decimated = [points_to_draw[0], points_to_draw[1]]
+    last_cell = (math.floor(points_to_draw[0] / cell_size), math.floor(points_to_draw[1] / cell_size))
+    for i in range(2, len(points_to_draw) - 2, 2):
+        cell = (math.floor(points_to_draw[i] / cell_size), math.floor(points_to_draw[i + 1] / cell_size))
+        if cell != last_cell:
+            decimated.append(points_to_draw[i])
+            decimated.append(points_to_draw[i + 1])
+        last_cell = cell
+    decimated.append(points_to_draw[-2])
+    decimated.append(points_to_draw[-1])
+    return decimated
+
+
+def draw_preview(coordinates):
+    """Draw the preview of a coordinate sequence at display size. Returns an RGBA image."""
+    render_size = DISPLAY_SIZE * SUPERSAMPLE
+    img = Image.new('RGBA', (render_size, render_size), (255, 255, 255, 0)) # Transparent background
+    draw = ImageDraw.Draw(img)
+
+    center = render_size / 2.0
+    scale_factor = center - MARGIN_FRACTION * render_size
+
+    # Points are mirrored through the center (x = center + ...) so the image comes out
+    # rotated 180 degrees, matching the table's orientation
+    if NUMPY_AVAILABLE:
+        # Flat [x0, y0, x1, y1, ...] list computed in one batch
+        points_to_draw = compute_preview_points(coordinates, center, -scale_factor)
+    else:
+        points_to_draw = []
+        for theta, rho in coordinates:
+            points_to_draw.append(center + rho * scale_factor * math.cos(theta))
+            points_to_draw.append(center + rho * scale_factor * math.sin(theta))
+
+    # Drop segments that would not change a single supersampled pixel
+    points_to_draw = decimate_points(points_to_draw)
+
+    if len(points_to_draw) > 2:
+        draw.line(points_to_draw, fill=LINE_COLOR, width=1)
+    elif len(points_to_draw) == 2:
+        r = SUPERSAMPLE  # Single point stays visible after downsampling
+        x, y = points_to_draw
+        draw.ellipse([(x-r, y-r), (x+r, y+r)], fill=LINE_COLOR)
+
+    # Box-filter down to display size, which antialiases the lines
+    return img.reduce(SUPERSAMPLE)
+
+
+def render_preview_image(pattern_file, format='WEBP'):
+    """Render a preview synchronously. Runs in a preview worker process."""
     file_path = os.path.join(THETA_RHO_DIR, pattern_file)
-    # Use asyncio.to_thread to prevent blocking the event loop
-    coordinates = await asyncio.to_thread(parse_theta_rho_file, file_path)
-    
-    # Use 1000x1000 for high quality rendering
-    RENDER_SIZE = 2048
-    # Final display size
-    DISPLAY_SIZE = 512
+    coordinates = load_coordinates(file_path)
     
     if not coordinates:
         # Create an image with "No pattern data" text
@@ -38,35 +114,9 @@ async def generate_preview_image(pattern_file, format='WEBP'):
         img_byte_arr.seek(0)
         return img_byte_arr.getvalue()
 
-    # Image drawing parameters
-    img = Image.new('RGBA', (RENDER_SIZE, RENDER_SIZE), (255, 255, 255, 0)) # Transparent background
-    draw = ImageDraw.Draw(img)
-    
-    CENTER = RENDER_SIZE / 2.0
-    SCALE_FACTOR = (RENDER_SIZE / 2.0) - 10.0 
-    LINE_COLOR = "black" 
-    STROKE_WIDTH = 2  # Increased stroke width for better visibility after scaling
-
-    points_to_draw = []
-    for theta, rho in coordinates:
-        x = CENTER - rho * SCALE_FACTOR * math.cos(theta)
-        y = CENTER - rho * SCALE_FACTOR * math.sin(theta)
-        points_to_draw.append((x, y))
-    
-    if len(points_to_draw) > 1:
-        draw.line(points_to_draw, fill=LINE_COLOR, width=STROKE_WIDTH, joint="curve")
-    elif len(points_to_draw) == 1:
-        r = 4  # Larger radius for single point to remain visible after scaling
-        x, y = points_to_draw[0]
-        draw.ellipse([(x-r, y-r), (x+r, y+r)], fill=LINE_COLOR)
-
-    # Scale down to display size with high-quality resampling
-    img = img.resize((DISPLAY_SIZE, DISPLAY_SIZE), Image.Resampling.LANCZOS)
-    
-    # Rotate the image 180 degrees
-    img = img.rotate(180)
+    img = draw_preview(coordinates)
 
     img_byte_arr = BytesIO()
     img.save(img_byte_arr, format=format, lossless=False, alpha_quality=20, method=0)
     img_byte_arr.seek(0)
-    return img_byte_arr.getvalue()
\ No newline at end of file
+    return img_byte_arr.getvalue()
@@ -0,0 +1,173 @@
+"""
+Preview rendering worker pool.
+
+Rendering a preview is CPU-bound PIL work (2048x2048 drawing plus a LANCZOS
+downscale), so it runs in a dedicated process pool instead of the event loop.
+Jobs wait in a priority queue: previews a user is waiting for jump ahead of the
+background backfill. Requests for a preview that is already queued or rendering
+share the same job.
+
+This is the application's only process pool. PREVIEW_RENDER_CONCURRENCY sets
+the number of worker processes (default: one less than the number of cores, at
+most 2, and 1 on devices with less than LOW_MEMORY_BYTES of RAM such as a Pi
+Zero 2 W).
+"""
+import os
+import asyncio
+import itertools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from modules.core.preview import render_preview_image
+from modules.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Lower values are rendered first
+PRIORITY_ON_DEMAND = 0
+PRIORITY_BACKFILL = 10
+
+# Below this much physical memory only one worker process is started by default
+LOW_MEMORY_BYTES = 1024 * 1024 * 1024
+
+RENDER_SECONDS = metrics.histogram('dune_weaver_preview_render_seconds', 'Preview render time',
+                                   buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+
+
+def _physical_memory():
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None  # Not available on this platform
+
+
+def _default_concurrency():
+    memory = _physical_memory()
+    if memory is not None and memory < LOW_MEMORY_BYTES:
+        return 1
+    return min(2, max(1, multiprocessing.cpu_count() - 1))
+
+
+def _get_concurrency():
+    value = os.getenv('PREVIEW_RENDER_CONCURRENCY')
+    if value:
+        try:
+            return max(1, int(value))
+        except ValueError:
+            logger.warning(f"Invalid PREVIEW_RENDER_CONCURRENCY '{value}', using default")
+    return _default_concurrency()
+
+
+class PreviewRenderer:
+    """Renders previews in worker processes, highest priority first."""
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self._executor = None
+        self._queue = None
+        self._loop = None
+        self._workers = []
+        self._jobs = {}  # (pattern_file, format) -> [asyncio.Future shared by all requesters, priority]
+        self._rendering = set()  # Keys a worker has picked up
+        self._sequence = itertools.count()  # FIFO order within a priority
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._workers:
+            return
+        # First use, or a new event loop: the old queue and workers belong to the old loop
+        self._loop = loop
+        self._queue = asyncio.PriorityQueue()
+        self._jobs = {}
+        self._rendering = set()
+        self._workers = [loop.create_task(self._worker()) for _ in range(self.concurrency)]
+        logger.info(f"Preview renderer started with {self.concurrency} worker processes")
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.concurrency)
+        return self._executor
+
+    async def render(self, pattern_file, format='WEBP', priority=PRIORITY_ON_DEMAND):
+        """Render a preview and return the image bytes."""
+        self._ensure_started()
+        key = (pattern_file, format)
+        entry = self._jobs.get(key)
+        if entry is None:
+            job = self._loop.create_future()
+            self._jobs[key] = [job, priority]
+            self._queue.put_nowait((priority, next(self._sequence), key, job))
+        else:
+            job, queued_priority = entry
+            if priority < queued_priority and key not in self._rendering:
+                # Queue it again at the higher priority; whichever entry a worker
+                # picks up first renders it and the other one is skipped
+                entry[1] = priority
+                self._queue.put_nowait((priority, next(self._sequence), key, job))
+        # A cancelled requester must not cancel the job other requesters are waiting for
+        return await asyncio.shield(job)
+
+    async def _worker(self):
+        while True:
+            priority, _, key, job = await self._queue.get()
+            try:
+                if job.done() or key in self._rendering:
+                    continue
+                self._rendering.add(key)
+                pattern_file, format = key
+                try:
+                    result = await self._run(pattern_file, format)
+                    if not job.done():
+                        job.set_result(result)
+                except Exception as e:
+                    if not job.done():
+                        job.set_exception(e)
+                    # Nobody may be waiting any more; don't warn about an unretrieved exception
+                    if not job.cancelled():
+                        job.exception()
+                finally:
+                    self._rendering.discard(key)
+                    self._jobs.pop(key, None)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, pattern_file, format):
+        with RENDER_SECONDS.time():
+            executor = self._get_executor()
+            try:
+                return await self._loop.run_in_executor(executor, render_preview_image, pattern_file, format)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory) - start a fresh pool and render in a thread this time
+                if self._executor is executor:
+                    logger.warning(f"Preview worker pool broke while rendering {pattern_file}, restarting it")
+                    self._executor = None
+                    # Releases the dead pool's processes, pipes and semaphores
+                    executor.shutdown(wait=False, cancel_futures=True)
+                return await asyncio.to_thread(render_preview_image, pattern_file, format)
+
+    def queue_size(self):
+        """Number of jobs waiting for a worker."""
+        return self._queue.qsize() if self._queue else 0
+
+    def shutdown(self):
+        """Stop the worker processes. Queued jobs are dropped."""
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        for job, _ in self._jobs.values():
+            if not job.done():
+                job.cancel()
+        self._jobs = {}
+        self._rendering = set()
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Preview renderer stopped")
+
+
+preview_renderer = PreviewRenderer(_get_concurrency())
+
+metrics.gauge('dune_weaver_preview_queue_size', 'Preview jobs waiting for a worker',
+              function=preview_renderer.queue_size)
@@ -0,0 +1,96 @@
+"""
+Coalescing of pattern moves before they reach the motion thread.
+
+Patterns are sampled densely, so long stretches of consecutive machine targets
+lie on one straight line (pure theta moves are straight in machine space) or a
+fraction of a step apart. Every one of them still costs a G-code line and its
+round trip. coalesce_moves picks the targets that actually need to be sent:
+a target is dropped when the straight move from the last sent position to a
+later target passes within the tolerance of it, measured in motor steps.
+
+The fit is a cone intersection (sleeve fitting): each pending target narrows
+the range of directions the next move may take from the anchor, which keeps
+the work per target constant instead of rechecking the whole run.
+"""
+import math
+
+# Upper bound on targets merged into one move, so pauses and stops still take
+# effect within a short distance
+MAX_COALESCED_MOVES = 64
+
+
+def _relative_angle(angle, reference):
+    """angle - reference, wrapped to (-pi, pi]."""
+    delta = (angle - reference) % (2 * math.pi)
+    return delta - 2 * math.pi if delta > math.pi else delta
+
+
+def coalesce_moves(x, y, start_x, start_y, x_steps_per_mm, y_steps_per_mm, tolerance_steps,
+                   max_run=MAX_COALESCED_MOVES):
+    """
+    Choose the machine targets to send.
+
+    x, y are sequences of absolute machine targets and (start_x, start_y) the
+    position before the first one. Every dropped target lies within
+    tolerance_steps of the path through the sent ones, so repeated targets are
+    dropped too. The last target is always sent. A tolerance of 0 or less
+    disables coalescing.
+
+    Returns a bytearray with 1 for each target to send.
+    """
+    count = len(x)
+    if tolerance_steps <= 0 or not x_steps_per_mm or not y_steps_per_mm:
+        return bytearray(b'\x01' * count)
+    keep = bytearray(count)
+    if not count:
+        return keep
+
+    # Work in step space so the tolerance means the same on both axes
+    anchor_x, anchor_y = start_x * x_steps_per_mm, start_y * y_steps_per_mm
+    previous_x, previous_y = anchor_x, anchor_y
+    reference = None  # Direction the cone is measured from
+    low = high = 0.0  # Allowed directions, relative to reference
+    max_distance = 0.0  # Farthest pending target from the anchor
+    pending = 0
+
+    for i in range(count):
+        point_x = x[i] * x_steps_per_mm
+        point_y = y[i] * y_steps_per_mm
+        dx = point_x - anchor_x
+        dy = point_y - anchor_y
+        distance = math.hypot(dx, dy)
+
+        if pending:
+            # A move from the anchor to this target must pass every pending target
+            # and must not stop short of the farthest one
+            fits = pending < max_run and distance >= max_distance
+            if fits and reference is not None:
+                fits = low <= _relative_angle(math.atan2(dy, dx), reference) <= high
+            if not fits:
+                # The previous target ends the run and becomes the new anchor
+                keep[i - 1] = 1
+                anchor_x, anchor_y = previous_x, previous_y
+                dx = point_x - anchor_x
+                dy = point_y - anchor_y
+                distance = math.hypot(dx, dy)
+                reference = None
+                max_distance = 0.0
+                pending = 0
+
+        # Targets within the tolerance of the anchor constrain nothing
+        if distance > tolerance_steps:
+            angle = math.atan2(dy, dx)
+            half_width = math.asin(tolerance_steps / distance)
+            if reference is None:
+                reference = angle
+                low, high = -half_width, half_width
+            else:
+                relative = _relative_angle(angle, reference)
+                low = max(low, relative - half_width)
+                high = min(high, relative + half_width)
+        max_distance = max(max_distance, distance)
+        pending += 1
+        previous_x, previous_y = point_x, point_y
+
+    keep[count - 1] = 1
+    return keep
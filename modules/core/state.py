@@ -1,14 +1,21 @@
 # state.py
+import atexit
 import threading
 import json
 import os
 import logging
 
+from modules.core.state_store import StateStore, POSITION_KEYS
+
 logger = logging.getLogger(__name__)
 
-# Debounce timer for state saves (reduces SD card wear on Pi)
-_save_timer = None
-_save_lock = threading.Lock()
+# Seconds a save() waits so that saves of one request or loop become one write
+SAVE_DELAY = 0.5
+# Seconds a save_position() waits; the table often stops several times in a row
+POSITION_SAVE_DELAY = 1.0
+
+# Writes state.json and state_position.json in the background (reduces SD card wear on Pi)
+_store = StateStore()
 
 class AppState:
     def __init__(self):
@@ -55,7 +62,23 @@ class AppState:
         self.auto_home_after_patterns = 5  # Number of patterns after which to auto-home
         self.patterns_since_last_home = 0  # Counter for patterns played since last home
 
+        # G-code streaming settings
+        # When enabled, pattern moves are streamed with the GRBL character-counting protocol
+        # instead of waiting for each line's 'ok', keeping the controller's planner full
+        self.gcode_streaming = False
+        self.grbl_rx_buffer_size = 127  # Controller serial RX buffer size in bytes (GRBL default 128, minus one)
+        # Pattern moves that stay within this many motor steps of a longer straight move
+        # are merged into it (0 disables coalescing)
+        self.coalesce_tolerance_steps = 0.5
+        # Seconds between '?' status queries to the controller
+        self.status_poll_interval = 0.25
+        # Keep streaming across pattern boundaries in playlists instead of waiting for
+        # the table to stop and re-reading its position before every pattern
+        self.seamless_playlist = False
+
         self.STATE_FILE = "state.json"
+        # Hot runtime fields (machine position), written on their own
+        self.POSITION_FILE = "state_position.json"
         self.mqtt_handler = None  # Will be set by the MQTT handler
         self.conn = None
         self.port = None
@@ -129,6 +152,8 @@ class AppState:
         self.mqtt_device_id = "dune_weaver"  # Device ID for Home Assistant
         self.mqtt_device_name = "Dune Weaver"  # Device display name
 
+        _store.register("state", lambda: self.STATE_FILE, self.to_dict)
+        _store.register("position", lambda: self.POSITION_FILE, self.position_dict)
         self.load()
 
     @property
@@ -245,6 +270,11 @@ class AppState:
             "angular_homing_offset_degrees": self.angular_homing_offset_degrees,
             "auto_home_enabled": self.auto_home_enabled,
             "auto_home_after_patterns": self.auto_home_after_patterns,
+            "gcode_streaming": self.gcode_streaming,
+            "grbl_rx_buffer_size": self.grbl_rx_buffer_size,
+            "coalesce_tolerance_steps": self.coalesce_tolerance_steps,
+            "status_poll_interval": self.status_poll_interval,
+            "seamless_playlist": self.seamless_playlist,
             "current_playlist": self._current_playlist,
             "current_playlist_name": self._current_playlist_name,
             "current_playlist_index": self.current_playlist_index,
@@ -316,6 +346,11 @@ class AppState:
         self.angular_homing_offset_degrees = data.get('angular_homing_offset_degrees', 0.0)
         self.auto_home_enabled = data.get('auto_home_enabled', False)
         self.auto_home_after_patterns = data.get('auto_home_after_patterns', 5)
+        self.gcode_streaming = data.get('gcode_streaming', False)
+        self.grbl_rx_buffer_size = data.get('grbl_rx_buffer_size', 127)
+        self.coalesce_tolerance_steps = data.get('coalesce_tolerance_steps', 0.5)
+        self.status_poll_interval = data.get('status_poll_interval', 0.25)
+        self.seamless_playlist = data.get('seamless_playlist', False)
         self._current_playlist = data.get("current_playlist", None)
         self._current_playlist_name = data.get("current_playlist_name", None)
         self.current_playlist_index = data.get("current_playlist_index", None)
@@ -385,45 +420,45 @@ class AppState:
         self.mqtt_device_id = data.get("mqtt_device_id", "dune_weaver")
         self.mqtt_device_name = data.get("mqtt_device_name", "Dune Weaver")
 
+    def position_dict(self):
+        """Return the hot runtime fields saved to POSITION_FILE."""
+        return {key: getattr(self, key) for key in POSITION_KEYS}
+
     def save(self):
-        """Save the current state to a JSON file."""
-        try:
-            with open(self.STATE_FILE, "w") as f:
-                json.dump(self.to_dict(), f)
-        except Exception as e:
-            print(f"Error saving state to {self.STATE_FILE}: {e}")
+        """
+        Save the full state to the JSON files.
+
+        The write happens on the state writer thread within SAVE_DELAY seconds,
+        together with any other saves in the meantime. Use flush() to write now.
+        """
+        self.save_debounced(SAVE_DELAY)
 
     def save_debounced(self, delay: float = 2.0):
         """
-        Schedule a state save after a delay, coalescing multiple rapid saves.
+        Save the full state within delay seconds, coalescing multiple rapid saves.
         This reduces SD card writes on Raspberry Pi.
 
         Args:
-            delay: Seconds to wait before saving (default 2.0)
+            delay: Seconds the write may wait (default 2.0, at most the store's MAX_LATENCY)
         """
-        global _save_timer
-        with _save_lock:
-            # Cancel any pending save
-            if _save_timer is not None:
-                _save_timer.cancel()
-            # Schedule new save
-            _save_timer = threading.Timer(delay, self._do_debounced_save)
-            _save_timer.daemon = True  # Don't block shutdown
-            _save_timer.start()
-
-    def _do_debounced_save(self):
-        """Internal method called by debounce timer."""
-        global _save_timer
-        with _save_lock:
-            _save_timer = None
-        self.save()
-        logger.debug("Debounced state save completed")
+        # The position is part of state.json too; keep both files in step
+        _store.mark_dirty("state", delay)
+        _store.mark_dirty("position", delay)
+
+    def save_position(self, delay: float = POSITION_SAVE_DELAY):
+        """Save only machine_x/machine_y and theta/rho, a few dozen bytes, within delay seconds."""
+        _store.mark_dirty("position", delay)
+
+    def flush(self):
+        """Write pending saves now. Blocks until they are on disk."""
+        _store.flush()
 
     def load(self):
-        """Load state from a JSON file. If the file doesn't exist, create it with default values."""
+        """Load state from the JSON files. If state.json doesn't exist, create it with default values."""
         if not os.path.exists(self.STATE_FILE):
             # File doesn't exist: create one with the current (default) state.
             self.save()
+            self.flush()
             return
         try:
             with open(self.STATE_FILE, "r") as f:
@@ -431,6 +466,16 @@ class AppState:
             self.from_dict(data)
         except Exception as e:
             print(f"Error loading state from {self.STATE_FILE}: {e}")
+        if os.path.exists(self.POSITION_FILE):
+            # Newer than the position in state.json, which is only written with the full state
+            try:
+                with open(self.POSITION_FILE, "r") as f:
+                    position = json.load(f)
+                for key in POSITION_KEYS:
+                    if key in position:
+                        setattr(self, key, position[key])
+            except Exception as e:
+                print(f"Error loading state from {self.POSITION_FILE}: {e}")
 
     def update_steps_per_mm(self, x_steps, y_steps):
         """Update and save steps per mm values."""
@@ -445,4 +490,6 @@ class AppState:
 
 
 # Create a singleton instance that you can import elsewhere:
-state = AppState()
\ No newline at end of file
+state = AppState()
+# Pending saves are written before the interpreter exits
+atexit.register(state.flush)
@@ -0,0 +1,152 @@
+"""
+Background persistence of AppState.
+
+State is kept in two JSON files:
+
+- state.json: the full state, mostly settings that change when a user saves them
+- state_position.json: the hot runtime fields (POSITION_KEYS), rewritten
+  whenever the table stops, a few dozen bytes each time
+
+Saving only marks a section dirty with a deadline. One writer thread writes each
+dirty section once its deadline is reached, so a burst of saves becomes a single
+write and no save waits on the SD card. A deadline is never pushed back by later
+saves and never lies more than MAX_LATENCY seconds out.
+
+Files are written atomically: the JSON goes to a temporary file in the same
+directory, which is flushed, fsynced and renamed over the old file. A power cut
+leaves either the old or the new file, never a truncated one. A section is not
+rewritten when its serialized content did not change.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Upper bound in seconds between a save and its write
+MAX_LATENCY = 5.0
+# Fields of the position section
+POSITION_KEYS = ("machine_x", "machine_y", "current_theta", "current_rho")
+
+
+def atomic_write_json(path, data):
+    """Replace path with data serialized as JSON, atomically."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        # mkstemp creates the file private; keep the mode the file had, as open() would
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except OSError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        with os.fdopen(fd, "w") as f:
+            f.write(data if isinstance(data, str) else json.dumps(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    try:
+        # Persist the rename itself
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass  # Not supported on every platform and filesystem
+
+
+class _Section:
+    def __init__(self, path, snapshot):
+        self.path = path  # Callable returning the file path
+        self.snapshot = snapshot  # Callable returning the dict to write
+        self.due = None  # Monotonic deadline of a pending write
+        self.last_written = None  # Serialized content of the last write
+
+
+class StateStore:
+    """Writes named state sections to JSON files from one background thread."""
+
+    def __init__(self, max_latency=MAX_LATENCY):
+        self.max_latency = max_latency
+        self._sections = {}  # name -> _Section
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()  # Serializes writes of the thread and flush()
+        self._thread = None
+
+    def register(self, name, path, snapshot):
+        """
+        Add a section.
+
+        Args:
+            name: Section name used with mark_dirty() and flush()
+            path: Callable returning the file path, read at every write
+            snapshot: Callable returning the dict to write
+        """
+        with self._cond:
+            self._sections[name] = _Section(path, snapshot)
+
+    def mark_dirty(self, name, delay=0.0):
+        """Write the section within delay seconds (at most max_latency). Never blocks on I/O."""
+        due = time.monotonic() + min(max(delay, 0.0), self.max_latency)
+        with self._cond:
+            section = self._sections[name]
+            if section.due is None or due < section.due:
+                section.due = due
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="state-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self, names=None):
+        """Write pending sections now, or the given sections whether pending or not."""
+        with self._cond:
+            if names is None:
+                names = [name for name, section in self._sections.items() if section.due is not None]
+            for name in names:
+                self._sections[name].due = None
+        for name in names:
+            self._write(name)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    pending = [section.due for section in self._sections.values() if section.due is not None]
+                    due_names = [name for name, section in self._sections.items()
+                                 if section.due is not None and section.due <= now]
+                    if due_names:
+                        for name in due_names:
+                            self._sections[name].due = None
+                        break
+                    self._cond.wait(min(pending) - now if pending else None)
+            for name in due_names:
+                self._write(name)
+
+    def _write(self, name):
+        section = self._sections[name]
+        retry = False
+        with self._write_lock:
+            path = section.path()
+            try:
+                data = json.dumps(section.snapshot())
+                if data == section.last_written:
+                    return
+                atomic_write_json(path, data)
+                section.last_written = data
+            except Exception as e:
+                logger.error(f"Error saving state to {path}: {e}")
+                retry = True
+        if retry:
+            # E.g. a settings list changed while it was serialized; try again later
+            self.mark_dirty(name, self.max_latency)
@@ -0,0 +1,193 @@
+"""
+Status push for /ws/status.
+
+One publisher task takes a status snapshot (pattern_manager.get_status) once per
+tick, or right away when notify() reports a state change, and serializes it
+once. Every subscriber gets the same text. Nothing is sent while the status is
+unchanged.
+
+Messages:
+    {"type": "status_update", "data": {...}}   the full status
+    {"type": "status_delta", "data": {...}}    only the changed keys, all of them
+                                               in DELTA_KEYS (progress, position)
+
+Deltas are opt-in (/ws/status?deltas=1) so older clients keep getting full
+updates. A client merges a delta into the last full update it received.
+
+Backpressure: every subscriber has its own small queue and writer task. When a
+subscriber's queue is full, its queued messages are replaced with the latest
+full update, since missed deltas can't be replayed. A send that takes longer
+than SEND_TIMEOUT disconnects the subscriber.
+"""
+import asyncio
+import json
+import logging
+import time
+
+from modules.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds between snapshots when nothing calls notify()
+TICK_INTERVAL = 1.0
+# Status keys that change on every tick while a pattern runs
+DELTA_KEYS = frozenset(("progress", "current_theta", "current_rho", "pause_time_remaining"))
+# Messages a subscriber may have queued before it is resynchronized with a full update
+MAX_PENDING = 4
+# Seconds a single send may take before the subscriber is dropped
+SEND_TIMEOUT = 10.0
+
+PUBLISH_SECONDS = metrics.histogram('dune_weaver_status_broadcast_seconds',
+                                    'Time to snapshot, serialize and queue one status update for all clients')
+DROPPED_MESSAGES = metrics.counter('dune_weaver_status_dropped_messages_total',
+                                   'Status messages replaced by a full update because a client fell behind')
+
+
+def _dumps(message):
+    # Same separators as WebSocket.send_json
+    return json.dumps(message, separators=(",", ":"))
+
+
+class _Subscriber:
+    def __init__(self, send, deltas):
+        self.send = send
+        self.deltas = deltas
+        self.queue = asyncio.Queue(maxsize=MAX_PENDING)
+        self.task = None
+
+
+class StatusPublisher:
+    """Computes the status once and fans it out to every /ws/status client."""
+
+    def __init__(self, snapshot=None, interval=TICK_INTERVAL):
+        """
+        Args:
+            snapshot: Returns the status dict; defaults to pattern_manager.get_status
+            interval: Seconds between snapshots without notify()
+        """
+        self._snapshot = snapshot
+        self.interval = interval
+        self._subscribers = {}  # key -> _Subscriber
+        self._last_status = None
+        self._last_full = None  # Serialized full update of _last_status
+        self._loop = None
+        self._wake = None
+        self._task = None
+
+    def _take_snapshot(self):
+        if self._snapshot is None:
+            # Import locally to avoid circular import
+            from modules.core.pattern_manager import get_status
+            self._snapshot = get_status
+        return self._snapshot()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, key, send, deltas=False):
+        """
+        Start pushing status messages to send(text), a coroutine function.
+
+        Must be called from the event loop. The subscriber gets the current full
+        update first.
+        """
+        self._loop = asyncio.get_running_loop()
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        subscriber = _Subscriber(send, deltas)
+        self._subscribers[key] = subscriber
+        subscriber.task = asyncio.create_task(self._write(key, subscriber))
+        if self._task is None or self._task.done():
+            # Starting from scratch: the first publish goes to everyone
+            self._last_status = None
+            self._last_full = None
+            self._task = asyncio.create_task(self._run())
+        elif self._last_full is not None:
+            subscriber.queue.put_nowait(self._last_full)
+        return subscriber.task
+
+    def unsubscribe(self, key):
+        subscriber = self._subscribers.pop(key, None)
+        if subscriber and subscriber.task and subscriber.task is not asyncio.current_task():
+            subscriber.task.cancel()
+
+    def notify(self):
+        """Publish as soon as possible. Safe to call from any thread."""
+        loop, wake = self._loop, self._wake
+        if loop is None or wake is None or not self._subscribers:
+            return
+        try:
+            if loop.is_running() and not loop.is_closed():
+                loop.call_soon_threadsafe(wake.set)
+        except RuntimeError:
+            # Event loop closed during shutdown
+            pass
+
+    async def _run(self):
+        try:
+            while self._subscribers:
+                try:
+                    self.publish()
+                except Exception as e:
+                    logger.error(f"Error publishing status: {e}")
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+        finally:
+            self._task = None
+
+    def publish(self):
+        """Snapshot the status and queue it for every subscriber if it changed."""
+        started = time.perf_counter()
+        status = self._take_snapshot()
+        previous = self._last_status
+        if status == previous:
+            return
+        changed = None
+        if previous is not None and previous.keys() == status.keys():
+            changed = {key: value for key, value in status.items() if previous.get(key) != value}
+            if not changed.keys() <= DELTA_KEYS:
+                changed = None
+
+        full = _dumps({"type": "status_update", "data": status})
+        delta = _dumps({"type": "status_delta", "data": changed}) if changed is not None else None
+        self._last_status = status
+        self._last_full = full
+
+        for subscriber in list(self._subscribers.values()):
+            message = delta if (delta is not None and subscriber.deltas) else full
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Behind: replace everything queued with the latest full update
+                dropped = 0
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                    dropped += 1
+                DROPPED_MESSAGES.inc(dropped)
+                subscriber.queue.put_nowait(full)
+        PUBLISH_SECONDS.observe(time.perf_counter() - started)
+
+    async def _write(self, key, subscriber):
+        try:
+            while True:
+                message = await subscriber.queue.get()
+                await asyncio.wait_for(subscriber.send(message), SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"Status client too slow, disconnecting after {SEND_TIMEOUT:.0f}s")
+        except Exception as e:
+            logger.debug(f"Status client send failed: {e}")
+        finally:
+            if self._subscribers.get(key) is subscriber:
+                del self._subscribers[key]
+
+
+status_publisher = StatusPublisher()
+
+metrics.gauge('dune_weaver_status_clients', 'Connected /ws/status clients',
+              function=lambda: status_publisher.subscriber_count)
@@ -0,0 +1,178 @@
+"""
+Vectorized theta-rho engine.
+
+Batched NumPy versions of the per-point hot loops: parsing a .thr file, converting
+polar coordinates to machine positions and drawing-space points. The machine
+transform performs exactly the same floating point operations, in the same order,
+as MotionControlThread._move_polar_sync, so the G-code it produces is identical.
+
+NumPy is optional; callers check NUMPY_AVAILABLE and keep the per-point path otherwise.
+"""
+import logging
+import warnings
+from math import pi
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    # NumPy missing - callers fall back to the pure Python path
+    np = None
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def get_scaling_factors(table_type):
+    """Return the (x, y) scaling factors used to convert polar deltas to machine units."""
+    if table_type == 'dune_weaver_mini':
+        return 2, 3.7
+    return 2, 5
+
+
+def parse_theta_rho_array(file_path):
+    """
+    Parse a theta-rho file into an (N, 2) float64 array in one call.
+
+    Files with anything the fast path can't represent exactly like the line parser
+    (inline comments, malformed lines) are handed to parse_theta_rho_file instead.
+    """
+    from modules.core.pattern_manager import parse_theta_rho_file
+
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+
+        if '#' in text and any('#' in line and not line.lstrip().startswith('#') for line in text.splitlines()):
+            raise ValueError("inline comment")
+
+        # loadtxt skips blank and comment lines itself
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)  # "input contained no data"
+            coordinates = np.loadtxt(text.splitlines(), dtype=np.float64, comments='#', ndmin=2)
+        if coordinates.size == 0:
+            return np.empty((0, 2), dtype=np.float64)
+        if coordinates.shape[1] != 2:
+            raise ValueError(f"expected 2 columns, found {coordinates.shape[1]}")
+        return coordinates
+    except Exception as e:
+        logger.debug(f"Vectorized parse of {file_path} not possible ({e}), using line parser")
+        return as_array(parse_theta_rho_file(file_path))
+
+
+def as_array(coordinates):
+    """
+    View a coordinate sequence as an (N, 2) float64 array.
+
+    Compiled patterns are wrapped without copying; lists of tuples are converted.
+    """
+    from modules.core.compiled_patterns import CompiledCoordinates
+
+    if isinstance(coordinates, np.ndarray):
+        return coordinates
+    if isinstance(coordinates, CompiledCoordinates):
+        values = np.frombuffer(coordinates.values, dtype=np.dtype(coordinates.values.format))
+        return values.astype(np.float64, copy=False).reshape(-1, 2)
+    if not coordinates:
+        return np.empty((0, 2), dtype=np.float64)
+    return np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+
+
+def compute_machine_increments(coordinates, start_theta, start_rho,
+                               table_type, x_steps_per_mm, y_steps_per_mm, gear_ratio):
+    """
+    Compute the machine move of every coordinate of a pattern.
+
+    Only the first increment depends on the start position; the others are the
+    moves between consecutive coordinates.
+
+    Returns:
+        (x_increment, y_increment) float64 arrays
+    """
+    coordinates = as_array(coordinates)
+    theta = coordinates[:, 0]
+    rho = coordinates[:, 1]
+
+    x_scaling_factor, y_scaling_factor = get_scaling_factors(table_type)
+
+    # Deltas from the previous point (the first point moves from the start position)
+    delta_theta = np.empty_like(theta)
+    delta_theta[:1] = theta[:1] - start_theta
+    np.subtract(theta[1:], theta[:-1], out=delta_theta[1:])
+    delta_rho = np.empty_like(rho)
+    delta_rho[:1] = rho[:1] - start_rho
+    np.subtract(rho[1:], rho[:-1], out=delta_rho[1:])
+
+    x_increment = delta_theta * 100 / (2 * pi * x_scaling_factor)
+    y_increment = delta_rho * 100 / y_scaling_factor
+
+    x_total_steps = x_steps_per_mm * (100/x_scaling_factor)
+    y_total_steps = y_steps_per_mm * (100/y_scaling_factor)
+
+    offset = x_increment * (x_total_steps * x_scaling_factor / (gear_ratio * y_total_steps * y_scaling_factor))
+
+    if table_type == 'dune_weaver_mini' or y_steps_per_mm == 546:
+        y_increment -= offset
+    else:
+        y_increment += offset
+    return x_increment, y_increment
+
+
+def accumulate_increments(x_increment, y_increment, start_x, start_y):
+    """Absolute positions reached by applying the increments in order from (start_x, start_y)."""
+    # Positions accumulate move by move; add.accumulate sums strictly left to right
+    x = np.add.accumulate(np.concatenate(([start_x], x_increment)))[1:]
+    y = np.add.accumulate(np.concatenate(([start_y], y_increment)))[1:]
+    return x, y
+
+
+def compute_machine_targets(coordinates, start_theta, start_rho, start_x, start_y,
+                            table_type, x_steps_per_mm, y_steps_per_mm, gear_ratio):
+    """
+    Compute absolute machine positions for every coordinate of a pattern.
+
+    Equivalent to calling MotionControlThread._move_polar_sync for each point in
+    order, starting from the given polar and machine position.
+
+    Returns:
+        (x, y) float64 arrays of unrounded absolute machine positions
+    """
+    x_increment, y_increment = compute_machine_increments(
+        coordinates, start_theta, start_rho, table_type, x_steps_per_mm, y_steps_per_mm, gear_ratio)
+    return accumulate_increments(x_increment, y_increment, start_x, start_y)
+
+
+def iter_machine_targets(coordinates, x, y, chunk_size=4096):
+    """Yield (theta, rho, x, y) as Python floats, converting one chunk at a time."""
+    coordinates = as_array(coordinates)
+    for start in range(0, len(coordinates), chunk_size):
+        end = start + chunk_size
+        yield from zip(coordinates[start:end, 0].tolist(), coordinates[start:end, 1].tolist(),
+                       x[start:end].tolist(), y[start:end].tolist())
+
+
+def format_gcode(x, y, speed):
+    """Format G1 lines for machine targets, rounded like the motion thread."""
+    return [f"G1 X{round(xi, 3)} Y{round(yi, 3)} F{speed}" for xi, yi in zip(x.tolist(), y.tolist())]
+
+
+def compute_preview_points(coordinates, center, scale):
+    """Convert polar coordinates to preview image points as a flat [x0, y0, x1, y1, ...] list."""
+    coordinates = as_array(coordinates)
+    theta = coordinates[:, 0]
+    rho = coordinates[:, 1] * scale
+    points = np.empty((len(coordinates), 2), dtype=np.float64)
+    points[:, 0] = center - rho * np.cos(theta)
+    points[:, 1] = center - rho * np.sin(theta)
+    return points.ravel().tolist()
+
+
+def decimate_points_array(points, cell_size=1.0):
+    """Vectorized preview.decimate_points for a flat [x0, y0, x1, y1, ...] list."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    cells = np.floor(points / cell_size)
+    keep = np.empty(len(points), dtype=bool)
+    keep[0] = True
+    np.any(cells[1:] != cells[:-1], axis=1, out=keep[1:])
+    keep[-1] = True
+    return points[keep].ravel().tolist()
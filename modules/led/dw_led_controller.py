@@ -10,9 +10,13 @@ from .dw_leds.segment import Segment
 from .dw_leds.effects.basic_effects import get_effect, get_all_effects, FRAMETIME
 from .dw_leds.utils.palettes import get_palette_name, PALETTE_NAMES
 from .dw_leds.utils.colors import rgb_to_color
+from modules.core.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+FRAME_SECONDS = metrics.histogram('dune_weaver_led_frame_seconds', 'LED effect frame time (effect + show)',
+                                  buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.015, 0.02, 0.05, 0.1))
+
 
 class _DualWS2811RGBCCTProxy:
     """
@@ -339,10 +343,12 @@ class DWLEDController:
                         effect_func = get_effect(self._current_effect_id)
 
                         # Run effect and get delay
+                        frame_started = time.perf_counter()
                         delay_ms = effect_func(self._segment)
 
                         # Update pixels
                         self._pixels.show()
+                        FRAME_SECONDS.observe(time.perf_counter() - frame_started)
 
                         # Increment call counter
                         self._segment.call += 1
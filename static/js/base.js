@@ -98,6 +98,67 @@ function invalidatePatternFilesCache() {
     }
 }
 
+// Load previews from the streaming endpoint. onPreview(pattern, data) is called for
+// each pattern as soon as its preview is ready, in completion order. data has the
+// batch format, except that image_data holds the preview URL instead of a data URL.
+async function fetchPreviewStream(fileNames, onPreview) {
+    const response = await fetch('/preview_thr_stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ file_names: fileNames })
+    });
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const handleLine = async (line) => {
+        if (!line.trim()) return;
+        const { file_name, ...data } = JSON.parse(line);
+        if (data.preview_url) {
+            data.image_data = data.preview_url;
+        }
+        await onPreview(file_name, data);
+    };
+
+    // One JSON object per line; a chunk may end mid-line
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let newline;
+        while ((newline = buffer.indexOf('\n')) >= 0) {
+            const line = buffer.slice(0, newline);
+            buffer = buffer.slice(newline + 1);
+            await handleLine(line);
+        }
+    }
+    await handleLine(buffer + decoder.decode());
+}
+
+// Read a preview image into a data URL, so a cached preview doesn't depend on the
+// server. Right after the image was shown this is served from the HTTP cache.
+// Returns { dataUrl, size } with size the image's size in bytes.
+async function fetchPreviewDataUrl(url) {
+    if (url.startsWith('data:')) {
+        return { dataUrl: url, size: url.length };
+    }
+    const response = await fetch(url);
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const blob = await response.blob();
+    const dataUrl = await new Promise((resolve, reject) => {
+        const reader = new FileReader();
+        reader.onload = () => resolve(reader.result);
+        reader.onerror = () => reject(reader.error);
+        reader.readAsDataURL(blob);
+    });
+    return { dataUrl, size: blob.size };
+}
+
 // Helper function to normalize file paths for cross-platform compatibility
 function normalizeFilePath(filePath) {
     if (!filePath) return '';
@@ -123,6 +184,8 @@ let isEditingSpeed = false; // Track if user is editing speed
 // WebSocket UI update throttling for Pi performance
 let lastUIUpdate = 0;
 const UI_UPDATE_INTERVAL = 100; // Minimum ms between UI updates (10 updates/sec max)
+let pendingUIUpdate = null; // Trailing UI update scheduled while throttled
+let lastStatus = null; // Last status from the server, with deltas merged in
 let playerPreviewData = null; // Store the current pattern's preview data for modal
 let playerPreviewCtx = null; // Store the canvas context for modal preview
 let playerAnimationId = null; // Store animation frame ID for modal
@@ -166,7 +229,7 @@ function connectWebSocket() {
         ws.close();
     }
 
-    ws = new WebSocket(`ws://${window.location.host}/ws/status`);
+    ws = new WebSocket(`ws://${window.location.host}/ws/status?deltas=1`);
     
     ws.onopen = function() {
         console.log("WebSocket connection established");
@@ -189,80 +252,98 @@ function connectWebSocket() {
         try {
             const data = JSON.parse(event.data);
             if (data.type === 'status_update') {
-                // Always update global playback status (not throttled)
-                // This ensures play button always has current state
-                window.currentPlaybackStatus = {
-                    is_running: data.data.is_running || false,
-                    current_file: data.data.current_file || null
-                };
-
-                // Throttle UI updates for better Pi performance
-                const now = Date.now();
-                if (now - lastUIUpdate < UI_UPDATE_INTERVAL) {
-                    return; // Skip this update, too soon
-                }
-                lastUIUpdate = now;
-
-                // Update modal status with the full data
-                syncModalControls(data.data);
-                
-                // Update speed input field on table control page if it exists
-                if (data.data && data.data.speed) {
-                    const currentSpeedDisplay = document.getElementById('currentSpeedDisplay');
-                    if (currentSpeedDisplay) {
-                        currentSpeedDisplay.textContent = `${data.data.speed} mm/s`;
-                    }
-                }
-                
-                // Update connection status dot using 'connection_status' or fallback to 'connected'
-                if (data.data.hasOwnProperty('connection_status')) {
-                    updateConnectionStatus(data.data.connection_status);
-                }
-                
-                // Check if current file has changed and reload preview data if needed
-                if (data.data.current_file) {
-                    const newFile = normalizeFilePath(data.data.current_file);
-                    if (newFile !== currentPreviewFile) {
-                        currentPreviewFile = newFile;
-
-                        // Only preload if we're on the browse page (index.html)
-                        // Other pages (playlists, table_control, LED, settings) will load on-demand
-                        const modal = document.getElementById('playerPreviewModal');
-                        const browsePage = document.getElementById('browseSortFieldSelect');
-
-                        if (modal && browsePage) {
-                            // We're on the browse page with the modal - preload coordinates
-                            loadPlayerPreviewData(data.data.current_file);
-                        }
-                    }
-                } else {
-                    currentPreviewFile = null;
-                    playerPreviewData = null;
-                }
-                
-                // Update progress for modal animation with smooth interpolation
-                if (playerPreviewData && data.data.progress && data.data.progress.percentage !== null) {
-                    const newProgress = data.data.progress.percentage / 100;
-                    targetProgress = newProgress;
-                    
-                    // Update modal if open with smooth animation
-                    const modal = document.getElementById('playerPreviewModal');
-                    if (modal && !modal.classList.contains('hidden')) {
-                        updateModalPreviewSmooth(newProgress);
-                    }
-                }
-                
-                // Reset userDismissedModal flag if no pattern is playing
-                if (!data.data.current_file || !data.data.is_running) {
-                    userDismissedModal = false;
+                lastStatus = data.data;
+            } else if (data.type === 'status_delta' && lastStatus) {
+                // Only the changed keys; merge them into the last full update
+                lastStatus = { ...lastStatus, ...data.data };
+            } else {
+                return;
+            }
+
+            // Always update global playback status (not throttled)
+            // This ensures play button always has current state
+            window.currentPlaybackStatus = {
+                is_running: lastStatus.is_running || false,
+                current_file: lastStatus.current_file || null
+            };
+
+            // Throttle UI updates for better Pi performance. Updates are only pushed
+            // when the status changes, so a skipped one is applied once the interval is up
+            const now = Date.now();
+            if (now - lastUIUpdate < UI_UPDATE_INTERVAL) {
+                if (!pendingUIUpdate) {
+                    pendingUIUpdate = setTimeout(() => {
+                        pendingUIUpdate = null;
+                        lastUIUpdate = Date.now();
+                        updateStatusUI(lastStatus);
+                    }, UI_UPDATE_INTERVAL - (now - lastUIUpdate));
                 }
+                return;
             }
+            lastUIUpdate = now;
+            updateStatusUI(lastStatus);
         } catch (error) {
             console.error("Error processing WebSocket message:", error);
         }
     };
 }
 
+function updateStatusUI(status) {
+    // Update modal status with the full data
+    syncModalControls(status);
+    
+    // Update speed input field on table control page if it exists
+    if (status && status.speed) {
+        const currentSpeedDisplay = document.getElementById('currentSpeedDisplay');
+        if (currentSpeedDisplay) {
+            currentSpeedDisplay.textContent = `${status.speed} mm/s`;
+        }
+    }
+    
+    // Update connection status dot using 'connection_status' or fallback to 'connected'
+    if (status.hasOwnProperty('connection_status')) {
+        updateConnectionStatus(status.connection_status);
+    }
+    
+    // Check if current file has changed and reload preview data if needed
+    if (status.current_file) {
+        const newFile = normalizeFilePath(status.current_file);
+        if (newFile !== currentPreviewFile) {
+            currentPreviewFile = newFile;
+
+            // Only preload if we're on the browse page (index.html)
+            // Other pages (playlists, table_control, LED, settings) will load on-demand
+            const modal = document.getElementById('playerPreviewModal');
+            const browsePage = document.getElementById('browseSortFieldSelect');
+
+            if (modal && browsePage) {
+                // We're on the browse page with the modal - preload coordinates
+                loadPlayerPreviewData(status.current_file);
+            }
+        }
+    } else {
+        currentPreviewFile = null;
+        playerPreviewData = null;
+    }
+    
+    // Update progress for modal animation with smooth interpolation
+    if (playerPreviewData && status.progress && status.progress.percentage !== null) {
+        const newProgress = status.progress.percentage / 100;
+        targetProgress = newProgress;
+        
+        // Update modal if open with smooth animation
+        const modal = document.getElementById('playerPreviewModal');
+        if (modal && !modal.classList.contains('hidden')) {
+            updateModalPreviewSmooth(newProgress);
+        }
+    }
+    
+    // Reset userDismissedModal flag if no pattern is playing
+    if (!status.current_file || !status.is_running) {
+        userDismissedModal = false;
+    }
+}
+
 function updateConnectionStatus(isConnected) {
     const statusDot = document.getElementById("connectionStatusDot");
     if (statusDot) {
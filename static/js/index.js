@@ -202,17 +202,15 @@ async function savePreviewToCache(pattern, previewData) {
             return;
         }
         
-        // Convert preview URL to blob for size calculation
-        const response = await fetch(previewData.image_data);
-        const blob = await response.blob();
-        const size = blob.size;
+        // Store the image itself rather than its URL, so cached previews work offline
+        const { dataUrl, size } = await fetchPreviewDataUrl(previewData.image_data);
         
         // Check if we need to free up space
         await managePreviewCacheSize(size);
         
         const cacheEntry = {
             pattern: pattern,
-            data: previewData,
+            data: { ...previewData, image_data: dataUrl },
             size: size,
             lastAccessed: Date.now(),
             created: Date.now()
@@ -458,46 +456,37 @@ async function processPendingBatch() {
     try {
         logMessage(`Loading batch of ${patternsToLoad.length} pattern previews`, LOG_TYPE.DEBUG);
         
-        const response = await fetch('/preview_thr_batch', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ file_names: patternsToLoad })
-        });
-
-        if (response.ok) {
-            const results = await response.json();
+        // Each preview is shown as soon as the server has it ready
+        await fetchPreviewStream(patternsToLoad, async (pattern, data) => {
+            const element = currentBatch.get(pattern);
+            currentBatch.delete(pattern);
             
-            // Process all results
-            for (const [pattern, data] of Object.entries(results)) {
-                const element = currentBatch.get(pattern);
+            if (data && !data.error && data.image_data) {
+                // Show first, then cache
+                if (element) {
+                    updatePreviewElement(element, data.image_data);
+                }
                 
-                if (data && !data.error && data.image_data) {
-                    // Cache in memory with size limit
-                    if (previewCache.size > 100) { // Limit cache size
-                        const oldestKey = previewCache.keys().next().value;
-                        previewCache.delete(oldestKey);
-                    }
-                    previewCache.set(pattern, data);
-                    
-                    // Save to IndexedDB cache for persistence
-                    await savePreviewToCache(pattern, data);
-                    
-                    if (element) {
-                        updatePreviewElement(element, data.image_data);
-                    }
-                } else {
-                    handleLoadError(pattern, element, data?.error || 'Failed to load preview');
+                // Cache in memory with size limit
+                if (previewCache.size > 100) { // Limit cache size
+                    const oldestKey = previewCache.keys().next().value;
+                    previewCache.delete(oldestKey);
                 }
+                previewCache.set(pattern, data);
+                
+                // Save to IndexedDB cache for persistence, without holding up the stream
+                savePreviewToCache(pattern, data);
+            } else {
+                handleLoadError(pattern, element, data?.error || 'Failed to load preview');
             }
-        }
+        });
     } catch (error) {
         logMessage(`Error loading preview batch: ${error.message}`, LOG_TYPE.ERROR);
-        
-        // Handle error for each pattern in batch
-        for (const pattern of patternsToLoad) {
-            const element = currentBatch.get(pattern);
-            handleLoadError(pattern, element, error.message);
-        }
+    }
+    
+    // Patterns the stream never answered (request failed or was cut off)
+    for (const [pattern, element] of currentBatch) {
+        handleLoadError(pattern, element, 'Failed to load preview');
     }
 }
 
@@ -535,37 +524,27 @@ async function loadIndividualPreview(pattern, element) {
     try {
         logMessage(`Loading individual preview for ${pattern}`, LOG_TYPE.DEBUG);
         
-        const response = await fetch('/preview_thr_batch', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ file_names: [pattern] })
-        });
+        let data = null;
+        await fetchPreviewStream([pattern], (_, result) => { data = result; });
 
-        if (response.ok) {
-            const results = await response.json();
-            const data = results[pattern];
+        if (data && !data.error && data.image_data) {
+            // Cache in memory with size limit
+            if (previewCache.size > 100) { // Limit cache size
+                const oldestKey = previewCache.keys().next().value;
+                previewCache.delete(oldestKey);
+            }
+            previewCache.set(pattern, data);
             
-            if (data && !data.error && data.image_data) {
-                // Cache in memory with size limit
-                if (previewCache.size > 100) { // Limit cache size
-                    const oldestKey = previewCache.keys().next().value;
-                    previewCache.delete(oldestKey);
-                }
-                previewCache.set(pattern, data);
-                
-                // Save to IndexedDB cache for persistence
-                await savePreviewToCache(pattern, data);
-                
-                if (element) {
-                    updatePreviewElement(element, data.image_data);
-                }
-                
-                logMessage(`Individual preview loaded successfully for ${pattern}`, LOG_TYPE.DEBUG);
-            } else {
-                throw new Error(data?.error || 'Failed to load preview data');
+            // Save to IndexedDB cache for persistence in the background
+            savePreviewToCache(pattern, data);
+            
+            if (element) {
+                updatePreviewElement(element, data.image_data);
             }
+            
+            logMessage(`Individual preview loaded successfully for ${pattern}`, LOG_TYPE.DEBUG);
         } else {
-            throw new Error(`HTTP error! status: ${response.status}`);
+            throw new Error(data?.error || 'Failed to load preview data');
         }
     } catch (error) {
         logMessage(`Error loading individual preview for ${pattern}: ${error.message}`, LOG_TYPE.ERROR);
@@ -880,18 +859,7 @@ async function showPatternPreview(pattern) {
         
         // If not in cache, fetch it
         if (!data) {
-            const response = await fetch('/preview_thr_batch', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ file_names: [pattern] })
-            });
-
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-            }
-
-            const results = await response.json();
-            data = results[pattern];
+            await fetchPreviewStream([pattern], (_, result) => { data = result; });
             if (data && !data.error) {
                 // Cache in memory
                 previewCache.set(pattern, data);
@@ -1231,6 +1199,14 @@ function sortPatterns(patterns, sortField, sortDirection) {
                 aVal = a.coordinates_count;
                 bVal = b.coordinates_count;
                 break;
+            case 'duration':
+                aVal = a.estimated_seconds ?? 0;
+                bVal = b.estimated_seconds ?? 0;
+                break;
+            case 'revolutions':
+                aVal = a.revolutions ?? 0;
+                bVal = b.revolutions ?? 0;
+                break;
             case 'favorite':
                 // Sort by favorite status first, then by name as secondary sort
                 const aIsFavorite = favoritePatterns.has(a.path);
@@ -1851,27 +1827,19 @@ async function cacheAllPreviews() {
             `;
 
             try {
-                const response = await fetch('/preview_thr_batch', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ file_names: batchPatterns })
-                });
-
-                if (response.ok) {
-                    const results = await response.json();
-                    
-                    // Cache each preview
-                    for (const [pattern, data] of Object.entries(results)) {
-                        if (data && !data.error && data.image_data) {
-                            previewCache.set(pattern, data);
-                            await savePreviewToCache(pattern, data);
-                            
+                // Cache each preview as it arrives; the saves run while the stream is read
+                const saves = [];
+                await fetchPreviewStream(batchPatterns, (pattern, data) => {
+                    if (data && !data.error && data.image_data) {
+                        previewCache.set(pattern, data);
+                        saves.push(savePreviewToCache(pattern, data).then(() => {
                             // Save progress after each successful pattern
                             localStorage.setItem(CACHE_PROGRESS_KEY, pattern);
                             localStorage.setItem(CACHE_TIMESTAMP_KEY, Date.now().toString());
-                        }
+                        }));
                     }
-                }
+                });
+                await Promise.all(saves);
             } catch (error) {
                 logMessage(`Error caching batch ${i + 1}: ${error.message}`, LOG_TYPE.ERROR);
                 // Don't clear progress on error - allows resuming from last successful pattern
@@ -212,17 +212,15 @@ async function savePreviewToCache(pattern, previewData) {
             return;
         }
         
-        // Convert preview URL to blob for size calculation
-        const response = await fetch(previewData.image_data);
-        const blob = await response.blob();
-        const size = blob.size;
+        // Store the image itself rather than its URL, so cached previews work offline
+        const { dataUrl, size } = await fetchPreviewDataUrl(previewData.image_data);
         
         // Check if we need to free up space
         await managePreviewCacheSize(size);
         
         const cacheEntry = {
             pattern: pattern,
-            data: previewData,
+            data: { ...previewData, image_data: dataUrl },
             size: size,
             lastAccessed: Date.now(),
             created: Date.now()
@@ -449,42 +447,32 @@ async function processPendingBatch() {
     try {
         logMessage(`Loading ${patternsToLoad.length} pattern previews`, LOG_TYPE.DEBUG);
         
-        const response = await fetch('/preview_thr_batch', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ file_names: patternsToLoad })
-        });
-
-        if (response.ok) {
-            const results = await response.json();
+        // Each preview is shown as soon as the server has it ready
+        await fetchPreviewStream(patternsToLoad, async (pattern, data) => {
+            const element = currentBatch.get(pattern);
+            currentBatch.delete(pattern);
+            const previewContainer = element?.querySelector('.pattern-preview');
             
-            // Process all results
-            for (const [pattern, data] of Object.entries(results)) {
-                const element = currentBatch.get(pattern);
-                const previewContainer = element?.querySelector('.pattern-preview');
-                
-                if (data && !data.error && data.image_data) {
-                    // Cache both in memory and IndexedDB
-                    previewCache.set(pattern, data);
-                    await savePreviewToCache(pattern, data);
-                    
-                    if (previewContainer) {
-                        previewContainer.innerHTML = ''; // Remove loading indicator
-                        previewContainer.innerHTML = `<img src="${data.image_data}" alt="Pattern Preview" class="w-full h-full object-cover rounded-full" />`;
-                    }
-                } else {
-                    previewCache.set(pattern, { error: true });
+            if (data && !data.error && data.image_data) {
+                if (previewContainer) {
+                    previewContainer.innerHTML = ''; // Remove loading indicator
+                    previewContainer.innerHTML = `<img src="${data.image_data}" alt="Pattern Preview" class="w-full h-full object-cover rounded-full" />`;
                 }
+                
+                // Cache both in memory and IndexedDB, without holding up the stream
+                previewCache.set(pattern, data);
+                savePreviewToCache(pattern, data);
+            } else {
+                previewCache.set(pattern, { error: true });
             }
-        } else {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
+        });
     } catch (error) {
         logMessage(`Error loading pattern preview batch: ${error.message}`, LOG_TYPE.ERROR);
-        // Mark as error in cache
-        for (const pattern of patternsToLoad) {
-            previewCache.set(pattern, { error: true });
-        }
+    }
+    
+    // Mark patterns the stream never answered as errors in cache
+    for (const pattern of currentBatch.keys()) {
+        previewCache.set(pattern, { error: true });
     }
 
     // After processing, check for any visible loading previews and request them
@@ -795,6 +783,14 @@ function sortPatterns(patterns, sortField, sortDirection) {
                 aVal = a.coordinates_count;
                 bVal = b.coordinates_count;
                 break;
+            case 'duration':
+                aVal = a.estimated_seconds ?? 0;
+                bVal = b.estimated_seconds ?? 0;
+                break;
+            case 'revolutions':
+                aVal = a.revolutions ?? 0;
+                bVal = b.revolutions ?? 0;
+                break;
             case 'favorite':
                 // Check if patterns are in favorites (access global favoritePatterns)
                 const aIsFavorite = window.favoritePatterns ? window.favoritePatterns.has(a.path) : false;
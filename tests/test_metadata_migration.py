@@ -0,0 +1,21 @@
+import json
+
+
+def test_legacy_v1_cache_is_migrated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from modules.core import cache_manager
+    from modules.core.metadata_store import MetadataStore, MetadataCache
+
+    coordinate = {'x': 0.0, 'y': 1.0}
+    legacy = tmp_path / 'metadata_cache.json'
+    legacy.write_text(json.dumps({'version': 1, 'data': {
+        'a.thr': {'mtime': 1.5, 'metadata': {'first_coordinate': coordinate, 'last_coordinate': coordinate,
+                                             'total_coordinates': 10}},
+        'malformed.thr': {'mtime': 2.0, 'metadata': {'total_coordinates': 5}},
+    }}))
+    cache = MetadataCache(MetadataStore(str(tmp_path / 'metadata.db'), cache_manager.CACHE_SCHEMA_VERSION))
+
+    assert cache.migrate_from_json(str(legacy), cache_manager.validate_cache_schema) == 1
+    assert cache.paths() == {'a.thr'}
+    assert cache.get('a.thr')['metadata']['total_coordinates'] == 10
+    assert not legacy.exists()
@@ -0,0 +1,44 @@
+import asyncio
+import threading
+
+
+def test_resume_index_after_pause_mid_chunk(tmp_path, monkeypatch):
+    # state.json is created in the working directory on import
+    monkeypatch.chdir(tmp_path)
+    from modules.core import pattern_manager
+
+    controller = pattern_manager.motion_controller
+    executed = []
+    ninth_move = threading.Event()
+    resume = threading.Event()
+
+    def fake_move(theta, rho, x, y, speed, stream=False):
+        executed.append(theta)
+        if len(executed) == 9:
+            ninth_move.set()
+            resume.wait(5)
+
+    monkeypatch.setattr(controller, '_move_machine_sync', fake_move)
+
+    async def run():
+        size = pattern_manager.MOTION_BATCH_SIZE
+        batches = []
+        for start in (0, size):
+            moves = [(index, float(index), 0.5, 0.0, 0.0) for index in range(start, start + size)]
+            batches.append(pattern_manager.submit_motion_batch(moves, start, start + size, 100))
+        await asyncio.get_running_loop().run_in_executor(None, ninth_move.wait, 5)
+        # What a pause does: cancel every queued batch and wait for them
+        for batch in batches:
+            batch.cancelled = True
+        resume.set()
+        await asyncio.gather(*(batch.future for batch in batches), return_exceptions=True)
+        return batches
+
+    try:
+        batches = asyncio.run(run())
+    finally:
+        controller.stop()
+
+    assert len(executed) == 9
+    assert [batch.position for batch in batches] == [9, pattern_manager.MOTION_BATCH_SIZE]
+    assert pattern_manager.resume_index(batches) == 9
@@ -0,0 +1,66 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from modules.core.pause_schedule import DAY, WEEK, PauseSchedule, compile_intervals
+
+HOUR = 3600
+UTC = ZoneInfo('UTC')
+# 2026-03-23 is a Monday
+MONDAY = datetime(2026, 3, 23)
+
+
+class _FixedClockSchedule(PauseSchedule):
+    def __init__(self, slots, tz_info, now):
+        super().__init__(slots, tz_info)
+        self.now = now
+
+    def _now(self):
+        return self.now
+
+
+def _at(schedule, day, hour, minute=0):
+    schedule.now = MONDAY.replace(day=MONDAY.day + day, hour=hour, minute=minute, tzinfo=schedule.tz_info)
+    return schedule
+
+
+def test_slot_across_midnight_merges_with_the_next_day():
+    intervals = compile_intervals([{'start_time': '22:00', 'end_time': '02:00', 'days': 'daily'}])
+    # Monday 00:00-02:00, each evening 22:00 to 02:00 the next day, Sunday 22:00 to the end of the week
+    assert intervals[0] == (0, 2 * HOUR)
+    assert intervals[1] == (22 * HOUR, DAY + 2 * HOUR)
+    assert intervals[-1] == (6 * DAY + 22 * HOUR, WEEK)
+    assert len(intervals) == 8
+
+
+def test_slot_across_midnight_only_covers_its_own_day():
+    # Only Sunday: the early hours of Monday are not paused
+    intervals = compile_intervals([{'start_time': '22:00', 'end_time': '02:00', 'days': 'custom',
+                                    'custom_days': ['sunday']}])
+    assert intervals == [(6 * DAY, 6 * DAY + 2 * HOUR), (6 * DAY + 22 * HOUR, WEEK)]
+
+
+def test_paused_across_the_week_boundary():
+    schedule = _FixedClockSchedule([{'start_time': '22:00', 'end_time': '02:00', 'days': 'daily'}], UTC, None)
+    _at(schedule, 6, 23)  # Sunday 23:00
+    assert schedule.is_paused()
+    # Runs on into Monday's first interval
+    assert schedule.next_transition() == datetime(2026, 3, 30, 2, tzinfo=UTC).timestamp()
+
+    _at(schedule, 0, 12)  # Monday noon
+    assert not schedule.is_paused()
+    assert schedule.next_transition() == datetime(2026, 3, 23, 22, tzinfo=UTC).timestamp()
+
+
+def test_next_transition_accounts_for_dst():
+    berlin = ZoneInfo('Europe/Berlin')
+    schedule = _FixedClockSchedule([{'start_time': '01:00', 'end_time': '04:00', 'days': 'weekends'}], berlin, None)
+    # Clocks go from 02:00 to 03:00 on Sunday 2026-03-29
+    _at(schedule, 6, 1, 30)
+    assert schedule.is_paused()
+    assert schedule.next_transition() - schedule.now.timestamp() == 1.5 * HOUR
+
+
+def test_empty_schedule_never_pauses():
+    schedule = _FixedClockSchedule([], UTC, MONDAY.replace(tzinfo=UTC))
+    assert not schedule.is_paused()
+    assert schedule.next_transition() is None
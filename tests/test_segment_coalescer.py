@@ -0,0 +1,66 @@
+import math
+import random
+
+from modules.core.segment_coalescer import coalesce_moves
+
+
+def _distance_to_segment(px, py, ax, ay, bx, by):
+    dx, dy = bx - ax, by - ay
+    length_squared = dx * dx + dy * dy
+    t = 0.0 if length_squared == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length_squared))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def _spiral(count, seed=1):
+    rng = random.Random(seed)
+    x, y = [], []
+    for i in range(count):
+        angle = i * 0.01
+        radius = 50 + 40 * i / count
+        x.append(radius * math.cos(angle) + rng.uniform(-0.002, 0.002))
+        y.append(radius * math.sin(angle) + rng.uniform(-0.002, 0.002))
+    return x, y
+
+
+def test_dropped_targets_stay_within_tolerance():
+    x_steps, y_steps, tolerance = 256.0, 180.0, 0.5
+    x, y = _spiral(5000)
+    keep = coalesce_moves(x, y, 0.0, 0.0, x_steps, y_steps, tolerance)
+
+    assert 0 < sum(keep) < len(x)
+    anchor = (0.0, 0.0)
+    dropped = []
+    for i, sent in enumerate(keep):
+        if not sent:
+            dropped.append(i)
+            continue
+        end = (x[i] * x_steps, y[i] * y_steps)
+        for j in dropped:
+            point = (x[j] * x_steps, y[j] * y_steps)
+            assert _distance_to_segment(*point, *anchor, *end) <= tolerance + 1e-9
+        anchor, dropped = end, []
+
+
+def test_last_target_is_always_sent():
+    # Collinear targets: everything but the last one can be dropped
+    x = [i * 0.1 for i in range(1, 20)]
+    y = [0.0] * len(x)
+    keep = coalesce_moves(x, y, 0.0, 0.0, 100.0, 100.0, 0.5)
+    assert list(keep) == [0] * (len(x) - 1) + [1]
+
+    # Even when the last target repeats the one before it
+    keep = coalesce_moves([1.0, 1.0], [2.0, 2.0], 0.0, 0.0, 100.0, 100.0, 0.5)
+    assert keep[-1] == 1
+
+
+def test_runs_are_bounded():
+    x = [i * 0.1 for i in range(1, 200)]
+    y = [0.0] * len(x)
+    keep = coalesce_moves(x, y, 0.0, 0.0, 100.0, 100.0, 0.5, max_run=16)
+    sent = [i for i, flag in enumerate(keep) if flag]
+    assert all(later - earlier <= 16 for earlier, later in zip([-1] + sent, sent))
+
+
+def test_zero_tolerance_sends_everything():
+    x, y = _spiral(100)
+    assert list(coalesce_moves(x, y, 0.0, 0.0, 256.0, 180.0, 0)) == [1] * 100
@@ -0,0 +1,89 @@
+import json
+import os
+import stat
+import time
+
+import pytest
+
+from modules.core import state_store
+from modules.core.state_store import StateStore, atomic_write_json
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_failed_write_keeps_old_file(tmp_path, monkeypatch):
+    path = tmp_path / 'state.json'
+    atomic_write_json(str(path), {'speed': 100})
+
+    def failing_fsync(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(state_store.os, 'fsync', failing_fsync)
+    with pytest.raises(OSError):
+        atomic_write_json(str(path), {'speed': 200})
+
+    assert json.loads(path.read_text()) == {'speed': 100}
+    assert os.listdir(tmp_path) == ['state.json']  # No temporary file left behind
+
+
+def test_write_keeps_file_mode(tmp_path):
+    path = tmp_path / 'state.json'
+    path.write_text('{}')
+    path.chmod(0o640)
+    atomic_write_json(str(path), {'speed': 100})
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
+
+
+def _store_with_counter(tmp_path, monkeypatch, data, max_latency=5.0):
+    writes = []
+    original = state_store.atomic_write_json
+
+    def counting_write(path, content):
+        writes.append(content)
+        original(path, content)
+
+    monkeypatch.setattr(state_store, 'atomic_write_json', counting_write)
+    store = StateStore(max_latency=max_latency)
+    path = tmp_path / 'state.json'
+    store.register('state', lambda: str(path), lambda: dict(data))
+    return store, path, writes
+
+
+def test_saves_are_coalesced(tmp_path, monkeypatch):
+    data = {'speed': 0}
+    store, path, writes = _store_with_counter(tmp_path, monkeypatch, data)
+    for speed in range(100):
+        data['speed'] = speed
+        store.mark_dirty('state', 0.1)
+    _wait_for(lambda: writes)
+    time.sleep(0.2)
+    assert len(writes) == 1
+    assert json.loads(path.read_text()) == {'speed': 99}
+
+
+def test_unchanged_content_is_not_rewritten(tmp_path, monkeypatch):
+    store, path, writes = _store_with_counter(tmp_path, monkeypatch, {'speed': 100})
+    store.flush(['state'])
+    store.flush(['state'])
+    store.mark_dirty('state')
+    time.sleep(0.1)
+    assert len(writes) == 1
+
+
+def test_delay_is_bounded_by_max_latency(tmp_path, monkeypatch):
+    store, path, writes = _store_with_counter(tmp_path, monkeypatch, {'speed': 100}, max_latency=0.1)
+    store.mark_dirty('state', 60)
+    _wait_for(lambda: writes, timeout=1.0)
+
+
+def test_flush_writes_pending_sections_now(tmp_path, monkeypatch):
+    store, path, writes = _store_with_counter(tmp_path, monkeypatch, {'speed': 100})
+    store.mark_dirty('state', 5)
+    store.flush()
+    assert json.loads(path.read_text()) == {'speed': 100}
+    assert len(writes) == 1
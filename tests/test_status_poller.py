@@ -0,0 +1,41 @@
+import threading
+
+from modules.connection.status_poller import StatusPoller
+
+
+class _SlowQueryConnection:
+    """Answers '?' queries only when the test releases them, with the state set at send time."""
+
+    def __init__(self):
+        self.state = 'Idle'
+        self.sent = threading.Event()
+        self.release = threading.Event()
+
+    def query_status(self, timeout=None):
+        report = f"<{self.state}|MPos:0.000,0.000,0.000>"  # State when the query reached the controller
+        self.sent.set()
+        self.release.wait(timeout)
+        self.release.clear()
+        return report
+
+
+def test_fresh_wait_ignores_reply_to_earlier_query():
+    conn = _SlowQueryConnection()
+    poller = StatusPoller(conn, interval=lambda: 0.02)
+    try:
+        assert conn.sent.wait(1)
+        # A move is queued while that query is in flight; its reply still says Idle
+        conn.state = 'Run'
+        result = {}
+        waiter = threading.Thread(target=lambda: result.update(status=poller.wait_for(lambda s: True, timeout=2)))
+        waiter.start()
+        conn.sent.clear()
+        conn.release.set()
+        assert conn.sent.wait(1)  # The next query went out after the wait started
+        conn.release.set()
+        waiter.join(2)
+        assert result['status'].state == 'Run'
+    finally:
+        poller.stop()
+        conn.release.set()
+        poller.join()